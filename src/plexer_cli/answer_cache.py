@@ -0,0 +1,235 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Answer Cache - remember metadata provided by the user and reuse it for similar artifacts
+"""
+
+import json
+import os
+import re
+
+from logzero import logger
+from prompt_toolkit import PromptSession
+
+from . import events, metrics, progress
+from .const import (
+    ANSWER_CACHE_FORMAT_VERSION,
+    ANSWER_CACHE_KEY_STOP_PATTERN,
+    ANSWER_CACHE_PART_MARKER_PATTERN,
+)
+from .metadata import Metadata
+
+PART_MARKER_REGEX = re.compile(ANSWER_CACHE_PART_MARKER_PATTERN, re.IGNORECASE)
+
+
+class AnswerCache:
+    """
+    Cache of metadata corrections given by the user, keyed by the normalized name prefix of the artifact
+
+    Artifacts from the same series of releases (e.g. `Some.Collection.Part.1...`, `Some.Collection.Part.2...`)
+    share a key, so the user only needs to answer once per distinct title. Along with the answer itself, the cache
+    stores the pattern implied by it:
+        * if the answer kept the artifact's part marker (e.g. "Part 1"), siblings get their own part marker instead
+        * if the answer kept the release year found via heuristics, siblings keep their own heuristic release year
+    """
+
+    file_path = ""
+
+    def __init__(self, file_path="", read_only=False) -> None:
+        self.file_path = file_path
+        self.read_only = read_only
+
+        self.answers = {}
+        # per-run decisions on whether to auto-apply a cached answer to all siblings,
+        # keyed the same as answers
+        self.confirmed_keys = {}
+
+    @staticmethod
+    def generate_key(artifact_name: str) -> str:
+        """
+        Generate the cache key for the given artifact name
+
+        The key is the lowercased, scrubbed artifact name, cut off at the first token that distinguishes siblings
+        from each other (numbers, years, part markers, etc). An empty key means the artifact can't be cached.
+        """
+
+        key_tokens = []
+        for token in Metadata().scrub_artifact_name(artifact_name).lower().split():
+            if re.fullmatch(ANSWER_CACHE_KEY_STOP_PATTERN, token):
+                break
+
+            key_tokens.append(token)
+
+        return " ".join(key_tokens)
+
+    def load(self) -> None:
+        """
+        Read in previously cached answers, if any
+        """
+
+        if not self.file_path:
+            return
+
+        try:
+            with open(self.file_path, mode="r", encoding="utf-8") as cache_file:
+                cache_data = json.load(cache_file)
+        except FileNotFoundError:
+            logger.debug("no answer cache found @ %s", self.file_path)
+
+            return
+        except json.JSONDecodeError:
+            logger.warning("answer cache @ %s is corrupt; ignoring it", self.file_path)
+
+            return
+
+        if cache_data.get("version") != ANSWER_CACHE_FORMAT_VERSION:
+            logger.warning(
+                "answer cache @ %s uses an unsupported format; ignoring it",
+                self.file_path,
+            )
+
+            return
+
+        self.answers = cache_data.get("answers", {})
+
+        logger.debug(
+            "loaded %d cached answer(s) from %s", len(self.answers), self.file_path
+        )
+
+    def save(self) -> None:
+        """
+        Write all cached answers to disk
+        """
+
+        if not self.file_path or self.read_only:
+            return
+
+        cache_dir = os.path.dirname(self.file_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        tmp_file_path = f"{self.file_path}.tmp"
+        with open(tmp_file_path, mode="w", encoding="utf-8") as cache_file:
+            json.dump(
+                {"version": ANSWER_CACHE_FORMAT_VERSION, "answers": self.answers},
+                cache_file,
+            )
+        os.replace(tmp_file_path, self.file_path)
+
+    def remember(
+        self,
+        artifact_name: str,
+        heuristic_metadata: Metadata,
+        user_metadata: Metadata,
+    ) -> None:
+        """
+        Store the answer the user gave for the given artifact, along with the pattern it implies
+        """
+
+        key = self.generate_key(artifact_name)
+        if not key:
+            logger.debug("no usable cache key for artifact; not caching answer")
+
+            return
+
+        part_marker = PART_MARKER_REGEX.search(
+            Metadata().scrub_artifact_name(artifact_name)
+        )
+        keeps_part_marker = bool(
+            part_marker and part_marker.group(0).lower() in user_metadata.name.lower()
+        )
+
+        self.answers[key] = {
+            "name": user_metadata.name,
+            "release_year": user_metadata.release_year,
+            "part_marker": part_marker.group(0) if keeps_part_marker else "",
+            "keeps_heuristic_year": heuristic_metadata.metadata_found
+            and heuristic_metadata.release_year == user_metadata.release_year,
+        }
+        logger.debug("cached answer for key '%s': %s", key, self.answers[key])
+
+        self.save()
+
+    def generate_metadata(self, artifact_name: str, video_metadata: Metadata):
+        """
+        Generate metadata for the given artifact from its cached answer, if any
+
+        The given metadata object is expected to contain the results of heuristic analysis and isn't modified.
+        Returns None if there's no cached answer for the artifact.
+        """
+
+        answer = self.answers.get(self.generate_key(artifact_name))
+        if not answer:
+            return None
+
+        name = answer["name"]
+        if answer["part_marker"]:
+            part_marker = PART_MARKER_REGEX.search(
+                Metadata().scrub_artifact_name(artifact_name)
+            )
+            if part_marker:
+                name = re.sub(
+                    re.escape(answer["part_marker"]),
+                    lambda _: part_marker.group(0),
+                    name,
+                    count=1,
+                    flags=re.IGNORECASE,
+                )
+
+        release_year = answer["release_year"]
+        if answer["keeps_heuristic_year"] and video_metadata.metadata_found:
+            release_year = video_metadata.release_year
+
+        cached_metadata = Metadata(name=name, release_year=release_year)
+        cached_metadata.metadata_found = True
+
+        return cached_metadata
+
+    def confirm_key(self, key: str, artifact_name: str, cached_metadata: Metadata):
+        """
+        Ask the user once per run whether cached answers should be applied to all artifacts sharing the given key
+        """
+
+        if key not in self.confirmed_keys:
+            events.flush()
+            metrics.PROMPTS.inc()
+            prompt_sess = PromptSession()
+            with progress.paused():
+                user_answer = prompt_sess.prompt(
+                    f"Apply remembered answer to all artifacts like '{key}'? "
+                    f"(e.g. {artifact_name} -> {cached_metadata.name} ({cached_metadata.release_year})) [y/n]: ",
+                    default="y",
+                )
+
+            self.confirmed_keys[key] = user_answer.strip().lower().startswith("y")
+
+        return self.confirmed_keys[key]
+
+    def apply(self, artifact_name: str, video_metadata: Metadata, confirm=True) -> bool:
+        """
+        Update the given metadata using the cached answer for the artifact, if there is one
+
+        If confirmation is enabled, the user is asked once per key before answers are applied automatically.
+        Returns True if a cached answer was applied.
+        """
+
+        cached_metadata = self.generate_metadata(artifact_name, video_metadata)
+        if not cached_metadata:
+            return False
+
+        if confirm and not self.confirm_key(
+            self.generate_key(artifact_name), artifact_name, cached_metadata
+        ):
+            return False
+
+        logger.info(
+            "applying cached answer for artifact - name: %s, release_year: %d",
+            cached_metadata.name,
+            cached_metadata.release_year,
+        )
+
+        video_metadata.name = cached_metadata.name
+        video_metadata.release_year = cached_metadata.release_year
+        video_metadata.metadata_found = True
+
+        return True
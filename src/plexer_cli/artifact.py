@@ -13,8 +13,10 @@ class Artifact:
     name = ""
     absolute_path = ""
     mime_type = ""
+    device = None
 
-    def __init__(self, name: str, path: str, mime_type: str) -> None:
+    def __init__(self, name: str, path: str, mime_type: str, device=None) -> None:
         self.name = name
         self.absolute_path = path
         self.mime_type = mime_type
+        self.device = device
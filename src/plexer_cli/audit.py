@@ -0,0 +1,231 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Audit - read-only checks of an existing Plex library
+"""
+
+import json
+import os
+import re
+import time
+
+from logzero import logger
+
+from .concurrency import ConcurrencyController
+from .const import (
+    ARTIFACT_NAME_REGEX,
+    AUDIT_REPORT_FORMAT_VERSION,
+    AUDIT_SIDECAR_FILE_EXTENSIONS,
+    AUDIT_VIDEO_FILE_EXTENSIONS,
+    METADATA_FILE_NAME,
+)
+from .metadata import Metadata
+from .title_index import normalize_title
+
+ARTIFACT_NAME_PATTERN = re.compile(ARTIFACT_NAME_REGEX)
+
+# finding type -> description, in report order
+FINDING_TYPES = {
+    "invalid_name": "title directories not named in a valid format for Plex",
+    "name_mismatch": "video files not named after their title directory",
+    "empty_dir": "empty directories",
+    "duplicate_title": "title directories holding the same title",
+    "clutter": "files that are neither videos nor sidecar files (subtitles, artwork)",
+    "empty_file": "empty video files",
+}
+
+
+def scan_dir(dir_path: str) -> tuple:
+    """
+    List the subdirectories and files of the given directory
+
+    Only the file type reported by the directory listing is used, so this doesn't cost a stat() per entry on
+    most filesystems. Symlinked directories are listed as files, so they're never descended into.
+    """
+
+    subdir_names = []
+    file_entries = []
+    with os.scandir(dir_path) as sd_iter:
+        for dir_entry in sd_iter:
+            if dir_entry.is_dir(follow_symlinks=False):
+                subdir_names.append(dir_entry.name)
+            else:
+                file_entries.append(dir_entry)
+
+    return dir_path, subdir_names, file_entries
+
+
+class LibraryAuditor:
+    """
+    Walk a library and report anything that doesn't look the way Plex expects it to, without changing anything
+
+    Top-level directories of the library are treated as title directories. Directories are listed in parallel on
+    the I/O controller's worker pool, one level of the tree at a time, and files are classified by their extension
+    alone, with a stat() only for video files (to find empty ones). libmagic is never called.
+    """
+
+    library_dir = ""
+
+    def __init__(self, library_dir: str, io_controller=None) -> None:
+        self.library_dir = os.path.abspath(library_dir)
+        self.io_controller = io_controller if io_controller else ConcurrencyController()
+
+        self.findings = {finding_type: [] for finding_type in FINDING_TYPES}
+        self.totals = {"directories": 0, "files": 0, "videos": 0}
+        self.duration = 0.0
+        # duplicate key -> title directory paths
+        self._titles = {}
+
+    @staticmethod
+    def generate_title_key(dir_name: str):
+        """
+        Generate the key used to find title directories holding the same title, or None if it can't be determined
+        """
+
+        name_match = ARTIFACT_NAME_PATTERN.match(dir_name)
+        edition = name_match.group(3) if name_match and name_match.group(3) else ""
+
+        metadata = Metadata()
+        if not metadata.do_heuristic_analysis(file_name=dir_name):
+            return None
+
+        return normalize_title(metadata.name), metadata.release_year, edition.lower()
+
+    def check_title_dir(self, dir_path: str) -> None:
+        """
+        Check the name of the given title directory
+        """
+
+        dir_name = os.path.basename(dir_path)
+        if not ARTIFACT_NAME_PATTERN.match(dir_name):
+            self.findings["invalid_name"].append(dir_path)
+
+        title_key = self.generate_title_key(dir_name)
+        if title_key:
+            self._titles.setdefault(title_key, []).append(dir_path)
+
+    def check_file(self, dir_entry: os.DirEntry, title_dir_name: str) -> None:
+        """
+        Check the given file, found somewhere below the given title directory (if any)
+        """
+
+        # plexer's own files (metadata, checkpoints, digest manifests, etc)
+        if dir_entry.name.startswith(METADATA_FILE_NAME):
+            return
+
+        file_extension = os.path.splitext(dir_entry.name)[1].lower()
+        if file_extension in AUDIT_VIDEO_FILE_EXTENSIONS:
+            self.totals["videos"] += 1
+
+            if title_dir_name and not dir_entry.name.startswith(title_dir_name):
+                self.findings["name_mismatch"].append(dir_entry.path)
+            if dir_entry.stat(follow_symlinks=False).st_size == 0:
+                self.findings["empty_file"].append(dir_entry.path)
+        elif file_extension not in AUDIT_SIDECAR_FILE_EXTENSIONS:
+            self.findings["clutter"].append(dir_entry.path)
+
+    def run(self) -> dict:
+        """
+        Audit the library, returning the report
+        """
+
+        start_time = time.monotonic()
+
+        # (dir path, name of the title directory it's in)
+        pending_dirs = [(self.library_dir, "")]
+        while pending_dirs:
+            title_dir_names = dict(pending_dirs)
+            next_pending_dirs = []
+
+            for dir_path, subdir_names, file_entries in self.io_controller.map(
+                scan_dir,
+                [dir_path for dir_path, _ in pending_dirs],
+                operation="scan",
+            ):
+                title_dir_name = title_dir_names[dir_path]
+                self.totals["files"] += len(file_entries)
+
+                if dir_path != self.library_dir:
+                    self.totals["directories"] += 1
+                    if not subdir_names and not file_entries:
+                        self.findings["empty_dir"].append(dir_path)
+
+                for file_entry in file_entries:
+                    self.check_file(file_entry, title_dir_name=title_dir_name)
+
+                for subdir_name in subdir_names:
+                    if subdir_name.startswith(METADATA_FILE_NAME):
+                        continue
+
+                    subdir_path = os.path.join(dir_path, subdir_name)
+                    if dir_path == self.library_dir:
+                        self.check_title_dir(subdir_path)
+                        next_pending_dirs.append((subdir_path, subdir_name))
+                    else:
+                        next_pending_dirs.append((subdir_path, title_dir_name))
+
+            pending_dirs = next_pending_dirs
+
+        self.findings["duplicate_title"] = [
+            sorted(dir_paths)
+            for dir_paths in self._titles.values()
+            if len(dir_paths) > 1
+        ]
+        for finding_type in FINDING_TYPES:
+            self.findings[finding_type].sort()
+        self.duration = time.monotonic() - start_time
+
+        logger.info(
+            "audit of %s complete - %d director(ies), %d file(s), %d finding(s) in %.1fs",
+            self.library_dir,
+            self.totals["directories"],
+            self.totals["files"],
+            sum(len(findings) for findings in self.findings.values()),
+            self.duration,
+        )
+
+        return self.generate_report()
+
+    def generate_report(self) -> dict:
+        """
+        Generate the machine-readable report of the audit
+        """
+
+        return {
+            "version": AUDIT_REPORT_FORMAT_VERSION,
+            "library_dir": self.library_dir,
+            "duration": round(self.duration, 3),
+            "totals": dict(self.totals),
+            "findings": {
+                finding_type: list(findings)
+                for finding_type, findings in self.findings.items()
+            },
+        }
+
+    def generate_summary(self) -> str:
+        """
+        Generate a human-readable summary of the audit
+        """
+
+        lines = [
+            f"audited {self.library_dir}: {self.totals['directories']} director(ies), "
+            f"{self.totals['files']} file(s) ({self.totals['videos']} video(s)) in {self.duration:.1f}s"
+        ]
+        for finding_type, description in FINDING_TYPES.items():
+            lines.append(
+                f"  {finding_type}: {len(self.findings[finding_type])} ({description})"
+            )
+
+        return "\n".join(lines)
+
+    def save_report(self, file_path: str) -> None:
+        """
+        Write the report of the audit to the given file, as JSON
+        """
+
+        tmp_file_path = f"{file_path}.tmp"
+        with open(tmp_file_path, mode="w", encoding="utf-8") as report_file:
+            json.dump(self.generate_report(), report_file, indent=2)
+        os.replace(tmp_file_path, file_path)
+
+        logger.info("audit report saved to %s", file_path)
@@ -0,0 +1,171 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Checkpoint - track run progress so interrupted runs can be resumed
+"""
+
+import json
+import os
+
+from logzero import logger
+
+from .const import CHECKPOINT_FLUSH_INTERVAL, CHECKPOINT_FORMAT_VERSION
+
+
+class Checkpoint:
+    """
+    Record completed subtrees and pending work items of a run in a checkpoint file
+
+    Pending items are the directories queued for processing that aren't complete yet. When resuming, the pending
+    items directly within a source directory are used as its work queue, so the source directory isn't listed again.
+
+    Changes are kept in memory and written out in batches, every `flush_interval` updates, rather than per item.
+    Writes are atomic (write to temp file + replace) so a crash mid-flush never leaves a corrupt checkpoint behind.
+    """
+
+    file_path = ""
+
+    def __init__(
+        self, file_path: str, source_dir="", flush_interval=CHECKPOINT_FLUSH_INTERVAL
+    ) -> None:
+        self.file_path = file_path
+        self.source_dir = os.path.abspath(source_dir) if source_dir else ""
+        self.flush_interval = flush_interval
+
+        self.completed = set()
+        self.pending = set()
+        self._unflushed_updates = 0
+
+    def load(self) -> bool:
+        """
+        Read in the existing checkpoint file, if any
+
+        Returns True if a usable checkpoint was loaded.
+        """
+
+        try:
+            with open(self.file_path, mode="r", encoding="utf-8") as checkpoint_file:
+                checkpoint_data = json.load(checkpoint_file)
+        except FileNotFoundError:
+            logger.debug("no checkpoint file found @ %s", self.file_path)
+
+            return False
+        except json.JSONDecodeError:
+            logger.warning(
+                "checkpoint file @ %s is corrupt; ignoring it", self.file_path
+            )
+
+            return False
+
+        if checkpoint_data.get("version") != CHECKPOINT_FORMAT_VERSION:
+            logger.warning(
+                "checkpoint file @ %s uses an unsupported format; ignoring it",
+                self.file_path,
+            )
+
+            return False
+
+        if self.source_dir and checkpoint_data.get("source_dir") != self.source_dir:
+            logger.warning(
+                "checkpoint file @ %s was created for a different source directory (%s); ignoring it",
+                self.file_path,
+                checkpoint_data.get("source_dir"),
+            )
+
+            return False
+
+        self.completed = set(checkpoint_data.get("completed", []))
+        self.pending = set(checkpoint_data.get("pending", []))
+
+        logger.info(
+            "checkpoint loaded - %d completed subtree(s), %d pending item(s)",
+            len(self.completed),
+            len(self.pending),
+        )
+
+        return True
+
+    def flush(self) -> None:
+        """
+        Write the current checkpoint state to disk
+        """
+
+        checkpoint_data = {
+            "version": CHECKPOINT_FORMAT_VERSION,
+            "source_dir": self.source_dir,
+            "completed": sorted(self.completed),
+            "pending": sorted(self.pending),
+        }
+
+        tmp_file_path = f"{self.file_path}.tmp"
+        with open(tmp_file_path, mode="w", encoding="utf-8") as checkpoint_file:
+            json.dump(checkpoint_data, checkpoint_file)
+        os.replace(tmp_file_path, self.file_path)
+
+        logger.debug(
+            "checkpoint flushed to %s (%d completed, %d pending)",
+            self.file_path,
+            len(self.completed),
+            len(self.pending),
+        )
+
+        self._unflushed_updates = 0
+
+    def _record_update(self) -> None:
+        self._unflushed_updates += 1
+        if self._unflushed_updates >= self.flush_interval:
+            self.flush()
+
+    def add_pending(self, paths: list) -> None:
+        """
+        Add the given paths to the pending work queue
+        """
+
+        self.pending.update(paths)
+        self._record_update()
+
+    def get_pending(self, dir_path: str) -> list:
+        """
+        Fetch the pending items directly within the given directory, in sorted order
+        """
+
+        dir_path = os.path.normpath(dir_path)
+
+        return sorted(
+            path
+            for path in self.pending
+            if os.path.dirname(os.path.normpath(path)) == dir_path
+        )
+
+    def mark_complete(self, *paths: str) -> None:
+        """
+        Mark the subtree(s) at the given path(s) as fully processed
+
+        Multiple paths can be given for the same subtree, e.g. its paths from before and after a rename.
+        """
+
+        for path in paths:
+            self.pending.discard(path)
+            self.completed.add(path)
+
+        self._record_update()
+
+    def is_complete(self, path: str) -> bool:
+        """
+        Check if the subtree at the given path has already been processed
+        """
+
+        return path in self.completed
+
+    def clear(self) -> None:
+        """
+        Remove the checkpoint file, e.g. after a successful run
+        """
+
+        self.completed.clear()
+        self.pending.clear()
+
+        try:
+            os.remove(self.file_path)
+        except FileNotFoundError:
+            pass
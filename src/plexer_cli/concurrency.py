@@ -0,0 +1,331 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Concurrency - adaptive worker management for I/O-bound operations
+"""
+
+import threading
+import time
+
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from logzero import logger
+
+from .const import (
+    IO_CONCURRENCY_BASELINE_DECAY,
+    IO_CONCURRENCY_DECREASE_FACTOR,
+    IO_CONCURRENCY_DEVICE_MAX_WORKERS,
+    IO_CONCURRENCY_LATENCY_TOLERANCE,
+    IO_CONCURRENCY_MAX_WORKERS,
+    IO_CONCURRENCY_MIN_WORKERS,
+    IO_CONCURRENCY_SAMPLE_WINDOW,
+)
+
+
+class OperationWindow:
+    """
+    Latency and throughput stats of a single type of operation, collected one sample window at a time
+    """
+
+    def __init__(self) -> None:
+        self.latency = 0.0
+        self.num_bytes = 0
+        self.ops = 0
+        self.start = time.perf_counter()
+
+        # latency regarded as normal for the operation; see ConcurrencyController._adjust()
+        self.baseline_latency = None
+
+        self.avg_latency = 0.0
+        self.throughput = 0.0
+
+    def close(self) -> None:
+        """
+        Compute the stats of the current window and start a new one
+        """
+
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        self.avg_latency = self.latency / self.ops
+        # ops/s is used as throughput when the operations don't move any data
+        # (e.g. classification, renames)
+        self.throughput = (
+            self.num_bytes / elapsed if self.num_bytes else self.ops / elapsed
+        )
+
+        self.latency = 0.0
+        self.num_bytes = 0
+        self.ops = 0
+        self.start = time.perf_counter()
+
+
+class ConcurrencyController:
+    """
+    Adjust the number of concurrent I/O operations based on observed latency and throughput
+
+    Uses AIMD (additive increase, multiplicative decrease): the worker count grows by one after every
+    healthy sample window and is cut by a constant factor whenever the storage shows signs of congestion.
+    Congestion is detected by comparing the recent average latency against a baseline, which lets the same settings
+    work for both slow network shares and fast local disks. The baseline follows the lowest average seen, but
+    drifts back up towards the current latency every window, so a single unusually fast window doesn't pin the
+    worker count near the minimum for the rest of the run. Throughput is measured alongside latency for reporting.
+
+    Every type of operation (e.g. classification, renames, transfers) is measured in its own window, against its own
+    baseline, since their latencies have little to do with each other. Only operations run concurrently via map()
+    adjust the worker count; the others are tracked for their stats and device slots only.
+
+    All operations run on a single thread pool that's kept for the lifetime of the controller, so it can be shared
+    by everything in a run. Operations can be tagged with the device they hit; no more than `device_max_workers` of
+    them are then kept in flight per device, and the remaining slots go to other devices rather than queueing up on
+    a disk that's already busy. The per-device limit is shared by every tracked operation, not just those started
+    by the same map() call.
+    """
+
+    min_workers = IO_CONCURRENCY_MIN_WORKERS
+    max_workers = IO_CONCURRENCY_MAX_WORKERS
+    device_max_workers = IO_CONCURRENCY_DEVICE_MAX_WORKERS
+
+    def __init__(
+        self,
+        min_workers=IO_CONCURRENCY_MIN_WORKERS,
+        max_workers=IO_CONCURRENCY_MAX_WORKERS,
+        latency_tolerance=IO_CONCURRENCY_LATENCY_TOLERANCE,
+        decrease_factor=IO_CONCURRENCY_DECREASE_FACTOR,
+        sample_window=IO_CONCURRENCY_SAMPLE_WINDOW,
+        device_max_workers=IO_CONCURRENCY_DEVICE_MAX_WORKERS,
+        baseline_decay=IO_CONCURRENCY_BASELINE_DECAY,
+    ) -> None:
+        if min_workers < 1:
+            raise ValueError("minimum worker count must be at least 1")
+        if max_workers < min_workers:
+            raise ValueError("maximum worker count must be >= minimum worker count")
+        if device_max_workers < 1:
+            raise ValueError("per-device worker count must be at least 1")
+
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.device_max_workers = device_max_workers
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.sample_window = sample_window
+        self.baseline_decay = baseline_decay
+
+        self._workers = min_workers
+        self._lock = threading.Lock()
+        # operation -> OperationWindow
+        self.windows = {}
+
+        self.avg_latency = 0.0
+        self.throughput = 0.0
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        self._device_slots = {}
+        self._device_slots_lock = threading.Lock()
+
+    @property
+    def workers(self) -> int:
+        """Current number of operations allowed to run concurrently"""
+
+        return self._workers
+
+    def record(self, latency: float, num_bytes=0, operation="io", adjust=True) -> None:
+        """
+        Record the outcome of a single operation and close its sample window once it's full, adjusting the worker
+        count if requested
+        """
+
+        with self._lock:
+            window = self.windows.get(operation)
+            if not window:
+                window = self.windows[operation] = OperationWindow()
+            window.latency += latency
+            window.num_bytes += num_bytes
+            window.ops += 1
+
+            if window.ops >= self.sample_window:
+                self._adjust(operation=operation, window=window, adjust=adjust)
+
+    def get_device_slots(self, device) -> threading.BoundedSemaphore:
+        """
+        Fetch the semaphore limiting the number of operations in flight on the given device
+        """
+
+        with self._device_slots_lock:
+            if device not in self._device_slots:
+                self._device_slots[device] = threading.BoundedSemaphore(
+                    self.device_max_workers
+                )
+
+            return self._device_slots[device]
+
+    @contextmanager
+    def track(self, num_bytes=0, device=None, operation="io", adjust=False):
+        """
+        Time the wrapped operation and record it against the controller, under the given type of operation
+
+        If a device is given, the operation waits for one of that device's slots first (the wait isn't timed). The
+        worker count is only adjusted for operations that run concurrently under it, which is what `adjust` is for.
+        """
+
+        device_slots = self.get_device_slots(device) if device is not None else None
+        if device_slots:
+            device_slots.acquire()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(
+                latency=time.perf_counter() - start,
+                num_bytes=num_bytes,
+                operation=operation,
+                adjust=adjust,
+            )
+            if device_slots:
+                device_slots.release()
+
+    def _adjust(self, operation: str, window: OperationWindow, adjust=True) -> None:
+        """
+        Close the given operation's sample window and, if requested, apply AIMD to the worker count based on it
+
+        Must be called with the lock held.
+        """
+
+        window.close()
+        self.avg_latency = window.avg_latency
+        self.throughput = window.throughput
+
+        baseline_latency = window.baseline_latency
+        if baseline_latency is None or window.avg_latency < baseline_latency:
+            window.baseline_latency = window.avg_latency
+        else:
+            # forget about fast windows over time, so that a one-off can't hold the
+            # worker count down for good
+            window.baseline_latency += (
+                window.avg_latency - baseline_latency
+            ) * self.baseline_decay
+        congested = (
+            baseline_latency is not None
+            and window.avg_latency > baseline_latency * self.latency_tolerance
+        )
+
+        logger.debug(
+            "I/O window stats (%s) - workers: %d, avg latency: %.2fms, throughput: %.1f/s, congested: %s",
+            operation,
+            self._workers,
+            window.avg_latency * 1000,
+            window.throughput,
+            congested,
+        )
+        if not adjust:
+            return
+
+        prev_workers = self._workers
+        if congested:
+            self._workers = max(
+                self.min_workers, int(self._workers * self.decrease_factor)
+            )
+        else:
+            self._workers = min(self.max_workers, self._workers + 1)
+
+        if self._workers != prev_workers:
+            logger.info(
+                "I/O concurrency adjusted: %d -> %d worker(s) (%s avg latency: %.2fms)",
+                prev_workers,
+                self._workers,
+                operation,
+                window.avg_latency * 1000,
+            )
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        """
+        Fetch the controller's thread pool, starting it on first use
+        """
+
+        with self._executor_lock:
+            if not self._executor:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="plexer-io"
+                )
+
+            return self._executor
+
+    def close(self) -> None:
+        """
+        Shut down the controller's thread pool
+        """
+
+        with self._executor_lock:
+            if self._executor:
+                self._executor.shutdown()
+                self._executor = None
+
+    def map(self, func, items, device_key=None, operation="io") -> list:
+        """
+        Run the given function over all items, keeping at most `workers` calls in flight at once
+
+        Results are returned in the same order as the given items. Each call is timed and fed back into the
+        controller under the given type of operation, so the amount of concurrency used may change while the items
+        are being processed.
+
+        If given, `device_key` is called with each item to determine the device it hits; items are then started
+        round-robin across devices, with at most `device_max_workers` calls in flight per device.
+        """
+
+        items = list(items)
+        results = [None] * len(items)
+
+        def timed_call(item):
+            with self.track(
+                device=device_key(item) if device_key else None,
+                operation=operation,
+                adjust=True,
+            ):
+                return func(item)
+
+        if len(items) < 2:
+            # not worth handing off to the thread pool
+            return [timed_call(item) for item in items]
+
+        # device -> indexes of the items waiting to be started, in order
+        device_queues = defaultdict(deque)
+        for idx, item in enumerate(items):
+            device_queues[device_key(item) if device_key else None].append(idx)
+        device_limit = self.device_max_workers if device_key else len(items)
+
+        executor = self.get_executor()
+        in_flight = {}
+        device_in_flight = defaultdict(int)
+        try:
+            while device_queues or in_flight:
+                started = True
+                while started and device_queues and len(in_flight) < self._workers:
+                    started = False
+                    for device in list(device_queues):
+                        if len(in_flight) >= self._workers:
+                            break
+                        if device_in_flight[device] >= device_limit:
+                            continue
+
+                        idx = device_queues[device].popleft()
+                        if not device_queues[device]:
+                            del device_queues[device]
+                        in_flight[executor.submit(timed_call, items[idx])] = (
+                            idx,
+                            device,
+                        )
+                        device_in_flight[device] += 1
+                        started = True
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    idx, device = in_flight.pop(future)
+                    device_in_flight[device] -= 1
+                    results[idx] = future.result()
+        finally:
+            # don't leave calls running in the background if one of them failed
+            wait(in_flight)
+
+        return results
@@ -4,9 +4,156 @@ Plexer - Normalize media files for use with Plex Media Server
 Module: Const - collection of global variables used across the application
 """
 
+import os
+
 ARTIFACT_NAME_REGEX = r"^(.+) (\([\d]{4}\)) ?(\{edition-.+\})?$"
 ARTIFACT_HEURISTICS_PATTERNS = {
     "name": r"^(.+?)([\.\-\_\(\[][1|2])",  # anything before the first instance of commonly-used separators
     "release_year": r"(19|20)([0-9]{2})",  # any 4 digit number between 1900 and 2099
 }
+# resolutions, e.g. 1080p or 1920x1080; their numbers can look like years
+RESOLUTION_PATTERN = r"(?<![0-9])[0-9]{3,4}(?:[pPiI]|[xX][0-9]{3,4})(?![0-9A-Za-z])"
+# scrubbed name tokens that mark the end of a title: resolutions, sources, codecs, etc
+RELEASE_TAG_PATTERN = (
+    r"(?i)[0-9]{3,4}(?:[pi]|x[0-9]{3,4})|4k|uhd|hdr|[hx]26[45]|hevc|xvid|divx|bluray|blu"
+    r"|bdrip|brrip|dvdrip|webrip|web|hdtv|remux|proper|repack|aac|ac3|dts"
+)
 METADATA_FILE_NAME = ".plexer"
+# plexer's own files and dirs (checkpoints, leases, etc) start with this; never processed
+STATE_FILE_PREFIX = ".plexer-"
+
+# I/O concurrency (AIMD) controller defaults
+IO_CONCURRENCY_MIN_WORKERS = 1
+IO_CONCURRENCY_MAX_WORKERS = 16
+IO_CONCURRENCY_LATENCY_TOLERANCE = 2.0  # back off above this multiple of best latency
+IO_CONCURRENCY_DECREASE_FACTOR = 0.5
+IO_CONCURRENCY_SAMPLE_WINDOW = 8  # number of operations to observe before adjusting
+IO_CONCURRENCY_DEVICE_MAX_WORKERS = 8  # max operations in flight per device
+# fraction of the gap to the current latency the baseline closes every window
+IO_CONCURRENCY_BASELINE_DECAY = 0.1
+
+# checkpointing
+CHECKPOINT_FILE_NAME = ".plexer-checkpoint"
+CHECKPOINT_FORMAT_VERSION = 1
+CHECKPOINT_FLUSH_INTERVAL = 100  # updates batched up between checkpoint writes
+
+# answer cache
+ANSWER_CACHE_FILE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "plexer",
+    "answers.json",
+)
+ANSWER_CACHE_FORMAT_VERSION = 1
+# tokens that distinguish siblings
+ANSWER_CACHE_KEY_STOP_PATTERN = r"(part|pt|disc|disk|cd|vol|volume|chapter|.*\d.*)"
+ANSWER_CACHE_PART_MARKER_PATTERN = (
+    r"\b(part|pt|disc|disk|cd|vol|volume|chapter)\s*"
+    r"(\d+|[ivx]+|one|two|three|four|five|six|seven|eight|nine|ten)\b"
+)
+
+# offline title index
+TITLE_INDEX_FILE_EXTENSION = ".idx"
+TITLE_INDEX_FORMAT_VERSION = 2
+TITLE_INDEX_MIN_SCORE = 0.6  # min trigram similarity (Dice) of fuzzy title matches
+TITLE_INDEX_MIN_CORRECTION_SCORE = 0.8  # min similarity to correct heuristic names
+TITLE_INDEX_MIN_FUZZY_WORD_LENGTH = 3  # shorter words are only ever matched exactly
+TITLE_INDEX_MAX_WORD_MATCHES = 16  # max similar words used per misspelled word
+TITLE_INDEX_MAX_POSTINGS = 2000  # max postings scanned per fuzzy lookup
+TITLE_INDEX_MAX_CANDIDATES = 64  # max fuzzy match candidates scored in full
+TITLE_INDEX_MAX_PREFIX_TOKENS = 12  # longest name prefix (in words) matched exactly
+TITLE_INDEX_MIN_YEARLESS_TOKENS = 3  # shortest partial title matched without a year
+
+# metadata providers
+PROVIDER_CACHE_FILE_PATH = os.path.join(
+    os.path.dirname(ANSWER_CACHE_FILE_PATH), "provider_responses.json"
+)
+PROVIDER_CACHE_FORMAT_VERSION = 1
+PROVIDER_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+PROVIDER_MAX_CONNECTIONS = 8  # per provider
+PROVIDER_RATE_LIMIT = 0  # max requests per second per provider; 0 = unlimited
+PROVIDER_REQUEST_TIMEOUT = 10  # seconds
+
+# tv shows
+EPISODE_HEURISTICS_PATTERN = (
+    # S01E02, S01E02E03, S01E02-E03, S01E02-03
+    r"(?:^|[\s\.\-\_\(\[])[Ss](?P<se_season>\d{1,2})[\s\.\-\_]?[Ee](?P<se_episode>\d{1,3})"
+    r"(?P<se_extra>(?:(?:[\s\.\-\_]?[Ee]|-)\d{1,3})*)(?=$|[\s\.\-\_\)\]])"
+    # 1x02, 1x02-1x03, 1x02-03
+    r"|(?:^|[\s\.\-\_\(\[])(?P<x_season>\d{1,2})[xX](?P<x_episode>\d{2,3})"
+    r"(?P<x_extra>(?:-(?:\d{1,2}[xX])?\d{2,3})*)(?=$|[\s\.\-\_\)\]])"
+    # 2020-01-31, 2020.01.31, etc
+    r"|(?:^|[\s\.\-\_\(\[])(?P<date_year>(?:19|20)\d{2})[\.\-\_ ](?P<date_month>[01]\d)[\.\-\_ ](?P<date_day>[0-3]\d)"
+    r"(?=$|[\s\.\-\_\)\]])"
+)
+# show names ending in a year
+SHOW_YEAR_PATTERN = r"^(.+?)[\s\.\-\_\(\[]+((?:19|20)\d{2})[\)\]]?$"
+TV_BATCH_SIZE = 1000  # number of episode moves between transfer manifest saves
+
+# sharded runs
+SHARD_VIRTUAL_NODES = 64  # positions of each shard on the consistent hash ring
+LEASE_DIR_NAME = ".plexer-leases"
+LEASE_FILE_EXTENSION = ".lease"
+LEASE_TTL = 300  # seconds; held leases are renewed every third of this
+
+# file transfers
+# kept out of the library, one manifest per destination directory
+DIGEST_MANIFEST_DIR_PATH = os.path.join(
+    os.path.dirname(ANSWER_CACHE_FILE_PATH), "digests"
+)
+DIGEST_MANIFEST_FORMAT_VERSION = 1
+TRANSFER_CHUNK_SIZE = 4 * 1024 * 1024  # bytes
+TRANSFER_HASH_ALGORITHM = "blake2b"
+TRANSFER_HASH_WORKERS = 4
+TRANSFER_PARTIAL_FILE_EXTENSION = ".plexer-partial"
+TRANSFER_SAMPLE_BLOCKS = 8  # blocks compared between source and copy when sampling
+
+# progress display
+PROGRESS_REFRESH_INTERVAL = 0.25  # seconds between redraws
+PROGRESS_RATE_WINDOW = 10  # seconds of history used to calculate processing rates
+
+# metrics
+# histogram bucket bounds, in seconds
+METRICS_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, 120, 600)
+
+# snapshots
+SNAPSHOT_FORMAT_VERSION = 1
+
+# library audits
+AUDIT_REPORT_FORMAT_VERSION = 1
+AUDIT_VIDEO_FILE_EXTENSIONS = frozenset(
+    (
+        ".avi",
+        ".m2ts",
+        ".m4v",
+        ".mkv",
+        ".mov",
+        ".mp4",
+        ".mpeg",
+        ".mpg",
+        ".ts",
+        ".webm",
+        ".wmv",
+    )
+)
+# files Plex picks up alongside videos: subtitles and local artwork
+AUDIT_SIDECAR_FILE_EXTENSIONS = frozenset(
+    (
+        ".ass",
+        ".idx",
+        ".smi",
+        ".srt",
+        ".ssa",
+        ".sub",
+        ".vtt",
+        ".jpg",
+        ".jpeg",
+        ".png",
+        ".tbn",
+    )
+)
+
+# metadata manifests
+METADATA_MANIFEST_FORMAT_VERSION = 1
+
+# renames
+RENAME_MAX_OPEN_DIRS = 64  # parent directory file descriptors kept open for renames
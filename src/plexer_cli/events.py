@@ -0,0 +1,307 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Events - structured per-artifact event stream, written out in the background
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+
+import logzero
+
+from . import progress
+
+# event type -> (level, console message template)
+EVENT_TYPES = {
+    # artifact processing
+    "artifact_found": (
+        logging.INFO,
+        "processing artifact: [ FILE: {name} | PATH: {path} | FILE TYPE: {mime_type} ]",
+    ),
+    "artifact_valid": (
+        logging.DEBUG,
+        "artifact name is in a valid format for Plex: {name}",
+    ),
+    "artifact_invalid": (
+        logging.DEBUG,
+        "artifact name is NOT in a valid format for Plex: {name}",
+    ),
+    "artifact_skipped": (
+        logging.INFO,
+        "skipping directory artifact ({reason}): {path}",
+    ),
+    "artifact_renamed": (
+        logging.DEBUG,
+        "renaming artifact: [ OLD PATH: {src} ] to [ NEW PATH: {dst} ] (dry run: {dry_run})",
+    ),
+    "rename_collision": (
+        logging.WARNING,
+        "destination already exists; skipping rename: [ OLD PATH: {src} ] to [ NEW PATH: {dst} ]",
+    ),
+    "rename_skipped": (
+        logging.DEBUG,
+        "source and destination paths are identical; skipping rename operation: {path}",
+    ),
+    "file_found": (logging.DEBUG, "file artifact found: {path}"),
+    # metadata
+    "name_scrubbed": (
+        logging.DEBUG,
+        "artifact name post-scrubbing: {name} -> {scrubbed_name}",
+    ),
+    "heuristics_result": (
+        logging.DEBUG,
+        "heuristic analysis results for {file_name} - name: {name}, release_year: {release_year}, complete: {complete}",
+    ),
+    "title_index_miss": (logging.DEBUG, "title not found in title index: {file_name}"),
+    "title_index_corrected": (
+        logging.DEBUG,
+        "title index corrected metadata - name: {old_name} -> {name}, release_year: {old_release_year} -> {release_year}",
+    ),
+    "metadata_found": (
+        logging.INFO,
+        "metadata found via {source} - name: {name}, release_year: {release_year}",
+    ),
+    "metadata_not_found": (
+        logging.WARNING,
+        "no metadata found for directory after exhausting all methods; skipping renaming and subprocessing: {path}",
+    ),
+    "user_prompted": (logging.INFO, "prompting user for manual metadata input: {path}"),
+    # tv episodes
+    "episode_moved": (
+        logging.DEBUG,
+        "moving episode (dry run: {dry_run}): {src} -> {dst}",
+    ),
+    "episode_target_exists": (
+        logging.WARNING,
+        "target already exists for episode; skipping: {src} -> {dst}",
+    ),
+    "episode_unrecognized": (
+        logging.WARNING,
+        "could not determine episode info for file; skipping: {path}",
+    ),
+    "episode_duplicate": (logging.WARNING, "duplicate episode found; skipping: {path}"),
+    "episode_needs_review": (
+        logging.WARNING,
+        "could not determine season of date-based episode; needs review: {path}",
+    ),
+}
+
+OUTPUT_FORMATS = ("console", "jsonl")
+CONSOLE_FORMAT = (
+    "%(color)s[%(levelname)1.1s %(asctime)s %(event_type)s]%(end_color)s %(message)s"
+)
+
+
+class EventStream:
+    """
+    Route structured events through a queue to a background writer, as human-readable console lines or JSONL
+
+    Events below the stream's level are dropped before anything is formatted, so disabled events cost a dict lookup
+    and an int comparison. Enabled events are only queued on the calling thread; formatting and writing happen on
+    the writer thread, in batches.
+    """
+
+    level = logging.WARNING
+    output_format = "console"
+
+    def __init__(
+        self, level=logging.WARNING, output_format="console", stream=None
+    ) -> None:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(
+                f"output format must be one of: {', '.join(OUTPUT_FORMATS)}"
+            )
+
+        self.level = level
+        self.output_format = output_format
+        # resolved on write when not given, so redirecting stderr later on still works
+        self.stream = stream
+
+        self._formatter = logzero.LogFormatter(fmt=CONSOLE_FORMAT)
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def is_enabled(self, level: int) -> bool:
+        """
+        Check if events of the given level are written out
+        """
+
+        return level >= self.level
+
+    def emit(self, event_type: str, **fields) -> None:
+        """
+        Queue an event of the given type, if its level is enabled
+        """
+
+        if EVENT_TYPES[event_type][0] < self.level:
+            return
+
+        if not self._thread:
+            self.start()
+
+        self._queue.put((event_type, time.time(), fields))
+
+    def format_event(self, event_type: str, timestamp: float, fields: dict) -> str:
+        """
+        Format a single event as a line of output
+        """
+
+        level, message_template = EVENT_TYPES[event_type]
+
+        if self.output_format == "jsonl":
+            return json.dumps(
+                {
+                    "timestamp": timestamp,
+                    "level": logging.getLevelName(level).lower(),
+                    "event": event_type,
+                    **fields,
+                },
+                default=str,
+            )
+
+        record = logging.LogRecord(
+            name="plexer",
+            level=level,
+            pathname="",
+            lineno=0,
+            msg=message_template.format(**fields),
+            args=None,
+            exc_info=None,
+        )
+        record.created = timestamp
+        record.event_type = event_type
+
+        return self._formatter.format(record)
+
+    def _write_events(self) -> None:
+        while True:
+            events = [self._queue.get()]
+            # drain whatever else is queued up so it's written in one go
+            while True:
+                try:
+                    events.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            stop = False
+            for event in events:
+                if event is None:
+                    stop = True
+                elif isinstance(event, threading.Event):
+                    # flush marker; everything queued before it is in this batch
+                    continue
+                else:
+                    lines.append(self.format_event(*event))
+
+            stream = self.stream if self.stream else sys.stderr
+            if lines:
+                # keep event output from getting mixed into the live progress line
+                with progress.paused():
+                    stream.write("\n".join(lines) + "\n")
+                    stream.flush()
+
+            for event in events:
+                if isinstance(event, threading.Event):
+                    event.set()
+
+            if stop:
+                return
+
+    def start(self) -> None:
+        """
+        Start the background writer
+        """
+
+        with self._thread_lock:
+            if self._thread:
+                return
+
+            self._thread = threading.Thread(
+                target=self._write_events, name="plexer-events", daemon=True
+            )
+            self._thread.start()
+
+    def flush(self) -> None:
+        """
+        Wait until all events queued so far have been written out
+        """
+
+        if not self._thread:
+            return
+
+        flushed = threading.Event()
+        self._queue.put(flushed)
+        flushed.wait()
+
+    def close(self) -> None:
+        """
+        Write out all queued events and stop the background writer
+        """
+
+        with self._thread_lock:
+            if not self._thread:
+                return
+
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+_event_stream = EventStream()
+
+
+def configure(
+    level=logging.WARNING, output_format="console", stream=None
+) -> EventStream:
+    """
+    Replace the shared event stream with one using the given settings, writing out anything queued on the old one
+    """
+
+    global _event_stream
+
+    _event_stream.close()
+    _event_stream = EventStream(level=level, output_format=output_format, stream=stream)
+
+    return _event_stream
+
+
+def get_event_stream() -> EventStream:
+    """
+    Fetch the shared event stream
+    """
+
+    return _event_stream
+
+
+def emit(event_type: str, **fields) -> None:
+    """
+    Queue an event on the shared event stream
+    """
+
+    _event_stream.emit(event_type, **fields)
+
+
+def flush() -> None:
+    """
+    Wait until all events queued on the shared event stream so far have been written out
+    """
+
+    _event_stream.flush()
+
+
+def close() -> None:
+    """
+    Write out all queued events on the shared event stream and stop its background writer
+    """
+
+    _event_stream.close()
+
+
+atexit.register(close)
@@ -8,12 +8,25 @@ import os
 import re
 
 from pathlib import Path
-from magic import from_file
 from logzero import logger
 
+from . import events, metrics, progress
 from .artifact import Artifact
-from .const import ARTIFACT_NAME_REGEX, METADATA_FILE_NAME
+from .concurrency import ConcurrencyController
+from .const import (
+    ARTIFACT_NAME_REGEX,
+    METADATA_FILE_NAME,
+    STATE_FILE_PREFIX,
+    TRANSFER_PARTIAL_FILE_EXTENSION,
+    TV_BATCH_SIZE,
+)
+from .filesystem import LocalFilesystem
 from .metadata import Metadata
+from .rename import RenamePlan
+from .tv import EpisodeParser, ShowGrouper, is_season_dir
+
+
+ARTIFACT_NAME_PATTERN = re.compile(ARTIFACT_NAME_REGEX)
 
 
 class FileManager:
@@ -24,34 +37,178 @@ class FileManager:
     src_dir = ""
     dst_dir = ""
 
-    def __init__(self, src_dir, dst_dir) -> None:
+    def __init__(
+        self,
+        src_dir,
+        dst_dir,
+        io_controller=None,
+        checkpoint=None,
+        answer_cache=None,
+        title_index=None,
+        metadata_resolver=None,
+        shard=None,
+        transfer_manager=None,
+        filesystem=None,
+        metadata_manifest=None,
+    ) -> None:
         self.src_dir = src_dir
         self.dst_dir = dst_dir
+        self.io_controller = io_controller if io_controller else ConcurrencyController()
+        self.checkpoint = checkpoint
+        # directories left unfinished by a previous run may already have a valid name, but still need processing
+        self._resumed_paths = set(checkpoint.pending) if checkpoint else set()
+        self.answer_cache = answer_cache
+        self.title_index = title_index
+        self.metadata_resolver = metadata_resolver
+        self.shard = shard
+        self.transfer_manager = transfer_manager
+        self.filesystem = (
+            filesystem
+            if filesystem
+            else LocalFilesystem(transfer_manager=self.transfer_manager)
+        )
+        self.metadata_manifest = metadata_manifest
+        self.rename_plan = RenamePlan()
+
+    def classify_artifact(self, dir_entry: os.DirEntry, device=None) -> Artifact:
+        """
+        Generate an artifact object for the given directory entry, including its MIME type and the device it's on
+        """
+
+        if dir_entry.is_dir():
+            artifact_mime_type = "directory"
+        else:
+            artifact_mime_type = self.filesystem.get_mime_type(dir_entry.path)
+        progress.increment("classified")
+
+        return Artifact(
+            name=dir_entry.name,
+            path=dir_entry.path,
+            mime_type=artifact_mime_type,
+            device=device,
+        )
 
-    def get_artifacts(self, tgt_dir="") -> list:
+    def get_artifacts(self, tgt_dir="", device=None) -> list:
         """
         Gather the names of all files and directories in a given directory and return as list.
 
         Target directory is the source directory by default, but can be specified via parameter.
+
+        Classification (i.e. MIME type detection) is spread across worker threads by the I/O controller. If the device
+        of the directory is given (i.e. inherited from its source directory), classification counts against that
+        device's share of concurrent operations, and the artifacts carry it along.
         """
 
-        artifacts = []
         tgt_dir = tgt_dir if tgt_dir else self.src_dir
 
-        with os.scandir(tgt_dir) as sd_iter:
-            for dir_artifact in sd_iter:
-                try:
-                    artifact_mime_type = from_file(dir_artifact.path, mime=True)
-                except IsADirectoryError:
-                    artifact_mime_type = "directory"
-
-                artifacts.append(
-                    Artifact(
-                        name=dir_artifact.name,
-                        path=dir_artifact.path,
-                        mime_type=artifact_mime_type,
-                    )
+        return self.classify_artifacts(
+            dir_entries=self.scan_dir(tgt_dir), device=device
+        )
+
+    def scan_dir(self, dir_path: str) -> list:
+        """
+        List the entries of the given directory, leaving out plexer's own files and dirs (e.g. checkpoints, leases,
+        and partial copies), which may be kept within the library
+        """
+
+        dir_entries = [
+            dir_entry
+            for dir_entry in self.filesystem.scandir(dir_path)
+            if not dir_entry.name.startswith(STATE_FILE_PREFIX)
+            and not dir_entry.name.endswith(TRANSFER_PARTIAL_FILE_EXTENSION)
+        ]
+        progress.increment("scanned", len(dir_entries))
+
+        return dir_entries
+
+    def classify_artifacts(self, dir_entries: list, device=None) -> list:
+        """
+        Generate artifact objects for the given entries of a single directory, classifying them on the I/O controller
+        """
+
+        return self.io_controller.map(
+            lambda dir_entry: self.classify_artifact(dir_entry, device=device),
+            dir_entries,
+            device_key=(lambda _: device) if device is not None else None,
+            operation="classify",
+        )
+
+    def get_pending_artifacts(self, src_dirs=None) -> list:
+        """
+        Gather the artifacts of all given source directories (just the source directory by default) from the pending
+        items of the checkpoint, without listing the source directories
+
+        Pending items that no longer exist are left out.
+        """
+
+        src_dirs = src_dirs if src_dirs else [self.src_dir]
+
+        artifacts = []
+        for src_dir in src_dirs:
+            device = self.filesystem.get_device(src_dir)
+            root_artifacts = [
+                Artifact(
+                    name=os.path.basename(path),
+                    path=path,
+                    mime_type="directory",
+                    device=device,
                 )
+                for path in self.checkpoint.get_pending(src_dir)
+                if self.filesystem.exists(path)
+            ]
+            logger.info(
+                "%d pending artifact(s) found in checkpoint for source directory %s",
+                len(root_artifacts),
+                src_dir,
+            )
+            artifacts.extend(root_artifacts)
+
+        return artifacts
+
+    def get_root_artifacts(self, src_dirs=None) -> list:
+        """
+        Gather and prep the artifacts of all given source directories (just the source directory by default) in one go
+
+        Entries of all directories are classified together on the shared I/O worker pool, tagged with the device of
+        their source directory, so directories on different disks are worked on side by side without any one disk
+        getting more than its share of concurrent operations.
+        """
+
+        src_dirs = src_dirs if src_dirs else [self.src_dir]
+
+        dir_entries = []
+        entry_devices = []
+        root_sizes = []
+        for src_dir in src_dirs:
+            root_entries = self.scan_dir(src_dir)
+            device = self.filesystem.get_device(src_dir)
+
+            dir_entries.extend(root_entries)
+            entry_devices.extend([device] * len(root_entries))
+            root_sizes.append(len(root_entries))
+
+        # items are entry indexes, so each one's device can be looked up
+        classified_artifacts = self.io_controller.map(
+            lambda entry_idx: self.classify_artifact(
+                dir_entries[entry_idx], device=entry_devices[entry_idx]
+            ),
+            range(len(dir_entries)),
+            device_key=entry_devices.__getitem__,
+            operation="classify",
+        )
+
+        artifacts = []
+        for src_dir, root_size in zip(src_dirs, root_sizes):
+            root_artifacts, classified_artifacts = (
+                classified_artifacts[:root_size],
+                classified_artifacts[root_size:],
+            )
+            logger.info(
+                "%d artifact(s) found in source directory %s",
+                len(root_artifacts),
+                src_dir,
+            )
+            artifacts.extend(self.prep_artifacts(artifacts=root_artifacts))
 
         return artifacts
 
@@ -83,27 +240,78 @@ class FileManager:
 
         valid_artifact = False
 
-        artifact_name_reg = re.compile(ARTIFACT_NAME_REGEX)
-        if artifact_name_reg.match(artifact.name):
-            logger.debug(
-                "artifact name is in a valid format for Plex: %s", artifact.name
-            )
+        if ARTIFACT_NAME_PATTERN.match(artifact.name):
+            events.emit("artifact_valid", name=artifact.name)
 
             valid_artifact = True
         else:
-            logger.debug(
-                "artifact name is NOT in a valid format for Plex: %s", artifact.name
-            )
+            events.emit("artifact_invalid", name=artifact.name)
 
         return valid_artifact
 
+    def prefetch_provider_metadata(self, dir_artifacts: list) -> dict:
+        """
+        Resolve metadata for all directory artifacts that need it via the metadata providers, as a single batch
+
+        Returns a dict mapping artifact paths to the metadata found for them.
+        """
+
+        queries = {}
+        for artifact in dir_artifacts:
+            if (
+                artifact.mime_type != "directory"
+                or (
+                    self.checkpoint
+                    and self.checkpoint.is_complete(artifact.absolute_path)
+                )
+                or (self.shard and not self.shard.is_assigned(artifact.absolute_path))
+                or self.check_artifact(artifact=artifact)
+                or (
+                    self.metadata_manifest
+                    and self.metadata_manifest.lookup(artifact.absolute_path)
+                )
+                # a metadata file takes precedence over anything the providers return
+                or self.filesystem.exists(
+                    os.path.join(artifact.absolute_path, METADATA_FILE_NAME)
+                )
+            ):
+                continue
+
+            heuristic_metadata = Metadata()
+            if heuristic_metadata.do_heuristic_analysis(file_name=artifact.name):
+                queries[artifact.absolute_path] = (
+                    heuristic_metadata.name,
+                    heuristic_metadata.release_year,
+                )
+            else:
+                queries[artifact.absolute_path] = (
+                    heuristic_metadata.scrub_artifact_name(artifact.name),
+                    None,
+                )
+
+        if not queries:
+            return {}
+
+        logger.debug(
+            "resolving metadata for %d artifact(s) via providers", len(queries)
+        )
+        resolved_metadata = self.metadata_resolver.resolve_many(list(queries.values()))
+
+        return {
+            artifact_path: resolved_metadata[query]
+            for artifact_path, query in queries.items()
+            if resolved_metadata[query]
+        }
+
     def rename_artifact(
         self, artifact: Artifact, video_metadata: Metadata, dry_run=False
     ) -> Artifact:
         """
         Rename an artifact to the new name generated from the given metadata
 
-        Returns the new, updated artifact object
+        Returns the new, updated artifact object. If the destination already exists, nothing is renamed; the
+        collision is recorded in the rename plan and the artifact is returned unchanged. The rename counts against the
+        share of concurrent operations of the artifact's device.
         """
 
         new_artifact_name = f"{video_metadata.name} ({video_metadata.release_year})"
@@ -115,31 +323,311 @@ class FileManager:
             "" if artifact.mime_type == "directory" else artifact_file_path.suffix
         )
 
-        src_file = artifact_file_path.absolute()
+        src_file = str(artifact_file_path.absolute())
         dst_file = f"{artifact_parent_dir}/{new_artifact_name}{artifact_file_ext}"
 
-        logger.debug(
-            "renaming artifact: [ OLD PATH: %s ] to [ NEW PATH: %s ]",
-            src_file,
-            dst_file,
+        if src_file != dst_file:
+            if dry_run:
+                events.emit(
+                    "artifact_renamed", src=src_file, dst=dst_file, dry_run=dry_run
+                )
+                progress.increment("renamed")
+                self.rename_plan.add(src_file, dst_file, "dry_run")
+
+                return artifact
+
+            try:
+                with (
+                    self.io_controller.track(
+                        device=artifact.device, operation="rename"
+                    ),
+                    metrics.RENAME_DURATION.time(),
+                ):
+                    self.filesystem.rename(src_file, dst_file)
+            except FileExistsError:
+                events.emit("rename_collision", src=src_file, dst=dst_file)
+                progress.increment("skipped")
+                self.rename_plan.add(src_file, dst_file, "collision")
+
+                return artifact
+
+            events.emit("artifact_renamed", src=src_file, dst=dst_file, dry_run=dry_run)
+            progress.increment("renamed")
+            metrics.RENAMES.inc()
+            self.rename_plan.add(src_file, dst_file, "renamed")
+            artifact.name = new_artifact_name
+            artifact.absolute_path = dst_file
+        else:
+            events.emit("rename_skipped", path=dst_file)
+
+        return artifact
+
+    def process_episode_targets(self, targets: list, dry_run=False) -> None:
+        """
+        Move TV episode files to their generated target paths, creating show and season directories as needed
+
+        Files moved across filesystems are copied and verified by the transfer manager.
+        """
+
+        for src_file, dst_file in targets:
+            if src_file == dst_file:
+                continue
+
+            events.emit("episode_moved", src=src_file, dst=dst_file, dry_run=dry_run)
+            if dry_run:
+                progress.increment("renamed")
+
+                continue
+
+            if self.filesystem.exists(dst_file):
+                events.emit("episode_target_exists", src=src_file, dst=dst_file)
+                progress.increment("skipped")
+
+                continue
+
+            self.filesystem.makedirs(os.path.dirname(dst_file))
+            try:
+                with (
+                    self.io_controller.track(
+                        num_bytes=self.filesystem.get_size(src_file),
+                        operation="transfer",
+                    ),
+                    metrics.RENAME_DURATION.time(),
+                ):
+                    moved = self.filesystem.move(src_file, dst_file)
+            except FileExistsError:
+                # created by something else since the check above
+                events.emit("episode_target_exists", src=src_file, dst=dst_file)
+                progress.increment("skipped")
+
+                continue
+            if moved:
+                metrics.RENAMES.inc()
+            progress.increment("renamed" if moved else "skipped")
+
+        if not dry_run and self.transfer_manager and self.transfer_manager.manifest:
+            self.transfer_manager.manifest.save()
+
+    def process_tv_directory(self, dir_artifacts: list, dry_run=False) -> None:
+        """
+        Traverse the given directory artifacts, grouping all TV episode files found into shows and seasons, and move
+        them into the destination directory using Plex's naming conventions
+
+        All episodes are grouped before any are moved, so each show's directory name is settled up front, and every
+        episode of a show ends up in the same directory no matter where in the tree the show's year turns up. Memory
+        use grows with the number of episodes (not their size). Moves are processed in batches, and the transfer
+        manifest is saved after each one.
+        """
+
+        logger.debug("starting TV directory artifact processing")
+
+        episode_parser = EpisodeParser()
+        show_grouper = ShowGrouper()
+        num_skipped = 0
+
+        # walk the tree iteratively, tracking the nearest show directory name for
+        # episode files that omit it
+        pending_dirs = [(dir_artifacts, "")]
+        while pending_dirs:
+            artifacts, show_name = pending_dirs.pop()
+
+            for artifact in artifacts:
+                progress.increment("processed")
+                metrics.ARTIFACTS_PROCESSED.inc(type=artifact.mime_type.split("/")[0])
+
+                if artifact.mime_type == "directory":
+                    pending_dirs.append(
+                        (
+                            self.get_artifacts(
+                                tgt_dir=artifact.absolute_path, device=artifact.device
+                            ),
+                            show_name
+                            if is_season_dir(artifact.name)
+                            else artifact.name,
+                        )
+                    )
+
+                    continue
+
+                if not artifact.mime_type.startswith("video/"):
+                    continue
+
+                episode = episode_parser.parse(
+                    file_path=artifact.absolute_path, show_name=show_name
+                )
+                if not episode:
+                    events.emit("episode_unrecognized", path=artifact.absolute_path)
+                    progress.increment("skipped")
+                    num_skipped += 1
+
+                    continue
+
+                show_grouper.add(episode)
+
+        targets = show_grouper.generate_targets(dst_dir=self.dst_dir)
+        for batch_start in range(0, len(targets), TV_BATCH_SIZE):
+            self.process_episode_targets(
+                targets[batch_start : batch_start + TV_BATCH_SIZE], dry_run=dry_run
+            )
+
+        for duplicate_episode in show_grouper.duplicates:
+            events.emit("episode_duplicate", path=duplicate_episode.absolute_path)
+            progress.increment("skipped")
+        for review_episode in show_grouper.needs_review:
+            events.emit("episode_needs_review", path=review_episode.absolute_path)
+            progress.increment("skipped")
+
+        logger.info(
+            "TV processing complete - %d show(s), %d duplicate(s), %d unrecognized file(s), %d needing review",
+            len(show_grouper.shows),
+            len(show_grouper.duplicates),
+            num_skipped,
+            len(show_grouper.needs_review),
         )
 
-        if src_file != dst_file:
-            logger.debug(
-                "executing rename operation on filesystem: %s -> %s", src_file, dst_file
+    def find_override_metadata(self, dir_path: str, dir_entries: list):
+        """
+        Look up metadata set by the user for the given directory, if any
+
+        A metadata file within the directory takes precedence over the library's metadata manifest; whether there is
+        one is determined from the given entries of the directory, so directories without one are never opened. Returns
+        None if neither has an entry for the directory.
+        """
+
+        metadata_file_path = os.path.join(dir_path, METADATA_FILE_NAME)
+        override_metadata, source = Metadata(), "metadata file"
+        if any(dir_entry.name == METADATA_FILE_NAME for dir_entry in dir_entries):
+            try:
+                override_metadata.import_metadata_from_file(
+                    metadata_file_path, filesystem=self.filesystem
+                )
+            except (FileNotFoundError, NotADirectoryError):
+                # removed since the directory was listed
+                pass
+            except (ValueError, TypeError):
+                # TypeError: valid JSON, but not an object
+                logger.warning(
+                    "metadata file @ %s is corrupt; ignoring it", metadata_file_path
+                )
+            except OSError as e:
+                logger.warning(
+                    "metadata file @ %s can't be read (%s); ignoring it",
+                    metadata_file_path,
+                    e.strerror,
+                )
+
+        if not override_metadata.metadata_found:
+            if not self.metadata_manifest:
+                return None
+
+            override_metadata, source = (
+                self.metadata_manifest.lookup(dir_path),
+                "metadata manifest",
             )
-            if not dry_run:
-                os.rename(src_file, dst_file)
-                artifact.name = new_artifact_name
-                artifact.absolute_path = dst_file
-            else:
-                logger.debug("dry run enabled; skipping actual rename operation")
-        else:
-            logger.debug(
-                "source and destination paths are identical; skipping rename operation"
+            if not override_metadata:
+                return None
+
+        events.emit(
+            "metadata_found",
+            source=source,
+            name=override_metadata.name,
+            release_year=override_metadata.release_year,
+        )
+
+        return override_metadata
+
+    def find_metadata(
+        self, artifact: Artifact, provider_metadata: dict, prompt_behavior="default"
+    ) -> tuple:
+        """
+        Determine the metadata of the given directory artifact via heuristics, the title index, metadata providers,
+        cached answers, and finally the user, depending on the prompt behavior
+
+        Returns a (metadata, whether it was given by the user) tuple.
+        """
+
+        # use heuristics to attempt to determine metadata from directory name
+        video_metadata = Metadata()
+        video_metadata.metadata_found = False
+        user_answered = False
+        heuristic_hit = video_metadata.do_heuristic_analysis(file_name=artifact.name)
+        metrics.HEURISTIC_RESULTS.inc(result="hit" if heuristic_hit else "miss")
+        if heuristic_hit:
+            events.emit(
+                "metadata_found",
+                source="heuristics",
+                name=video_metadata.name,
+                release_year=video_metadata.release_year,
+            )
+            video_metadata.metadata_found = True
+
+        if self.title_index and video_metadata.do_title_index_verification(
+            file_name=artifact.name, title_index=self.title_index
+        ):
+            events.emit(
+                "metadata_found",
+                source="title index",
+                name=video_metadata.name,
+                release_year=video_metadata.release_year,
             )
 
-        return artifact
+        if artifact.absolute_path in provider_metadata:
+            video_metadata = provider_metadata[artifact.absolute_path]
+            events.emit(
+                "metadata_found",
+                source="metadata provider",
+                name=video_metadata.name,
+                release_year=video_metadata.release_year,
+            )
+
+        if prompt_behavior == "all" or (
+            prompt_behavior == "default" and not video_metadata.metadata_found
+        ):
+            # reuse answers given for similar artifacts before falling back to asking
+            # the user
+            if self.answer_cache and self.answer_cache.apply(
+                artifact_name=artifact.name, video_metadata=video_metadata
+            ):
+                events.emit(
+                    "metadata_found",
+                    source="answer cache",
+                    name=video_metadata.name,
+                    release_year=video_metadata.release_year,
+                )
+            else:
+                events.emit("user_prompted", path=artifact.absolute_path)
+                progress.increment("prompted")
+                metrics.PROMPTS.inc()
+                heuristic_metadata = Metadata(
+                    name=video_metadata.name,
+                    release_year=video_metadata.release_year,
+                )
+                heuristic_metadata.metadata_found = video_metadata.metadata_found
+
+                video_metadata.prompt_user_for_metadata()
+                user_answered = True
+
+                if self.answer_cache:
+                    self.answer_cache.remember(
+                        artifact_name=artifact.name,
+                        heuristic_metadata=heuristic_metadata,
+                        user_metadata=video_metadata,
+                    )
+        elif not video_metadata.metadata_found and self.answer_cache:
+            # prompts are disabled, but the user's past answers are still trustworthy
+            if self.answer_cache.apply(
+                artifact_name=artifact.name,
+                video_metadata=video_metadata,
+                confirm=False,
+            ):
+                events.emit(
+                    "metadata_found",
+                    source="answer cache",
+                    name=video_metadata.name,
+                    release_year=video_metadata.release_year,
+                )
+
+        return video_metadata, user_answered
 
     def process_directory(
         self,
@@ -148,72 +636,145 @@ class FileManager:
         prompt_behavior="default",
         rename_files=False,
         dry_run=False,
+        media_type="movie",
     ) -> None:
         """
         Traverse the given directory artifacts, rename the video files accordingly, and delete everything else
         """
 
+        if media_type == "tv":
+            self.process_tv_directory(dir_artifacts=dir_artifacts, dry_run=dry_run)
+
+            return
+
         logger.debug("starting directory artifact processing")
 
+        provider_metadata = (
+            self.prefetch_provider_metadata(dir_artifacts=dir_artifacts)
+            if self.metadata_resolver
+            else {}
+        )
+
+        if self.checkpoint:
+            self.checkpoint.add_pending(
+                [
+                    artifact.absolute_path
+                    for artifact in dir_artifacts
+                    if artifact.mime_type == "directory"
+                ]
+            )
+
         for artifact in dir_artifacts:
-            logger.info(
-                "processing artifact: [ FILE: %s | PATH: %s | FILE TYPE: %s ]",
-                artifact.name,
-                artifact.absolute_path,
-                artifact.mime_type,
+            progress.increment("processed")
+            metrics.ARTIFACTS_PROCESSED.inc(type=artifact.mime_type.split("/")[0])
+            events.emit(
+                "artifact_found",
+                name=artifact.name,
+                path=artifact.absolute_path,
+                mime_type=artifact.mime_type,
             )
 
             if artifact.mime_type == "directory":
-                logger.info("subdirectory found, processing")
-
                 # first, check if we even need to do anything at all
-                if self.check_artifact(artifact=artifact):
-                    logger.info(
-                        "directory artifact is already in a valid format for Plex; skipping subprocessing"
+                if self.checkpoint and self.checkpoint.is_complete(
+                    artifact.absolute_path
+                ):
+                    events.emit(
+                        "artifact_skipped",
+                        path=artifact.absolute_path,
+                        reason="completed in a previous run",
                     )
+                    progress.increment("skipped")
 
                     continue
 
-                # use heuristics to attempt to determine metadata from directory name
-                video_metadata = Metadata()
-                video_metadata.metadata_found = False
-                if video_metadata.do_heuristic_analysis(file_name=artifact.name):
-                    logger.info(
-                        "metadata found for directory via heuristics - name: %s, release_year: %d",
-                        video_metadata.name,
-                        video_metadata.release_year,
+                if (
+                    artifact.absolute_path not in self._resumed_paths
+                    and self.check_artifact(artifact=artifact)
+                ):
+                    events.emit(
+                        "artifact_skipped",
+                        path=artifact.absolute_path,
+                        reason="already in a valid format for Plex",
                     )
-                    video_metadata.metadata_found = True
+                    progress.increment("skipped")
 
-                if prompt_behavior == "all" or (
-                    prompt_behavior == "default" and not video_metadata.metadata_found
-                ):
-                    logger.info(
-                        "no metadata found for directory via heuristics; prompting user for manual input"
+                    if self.checkpoint:
+                        self.checkpoint.mark_complete(artifact.absolute_path)
+
+                    continue
+
+                if self.shard and not self.shard.claim(artifact.absolute_path):
+                    events.emit(
+                        "artifact_skipped",
+                        path=artifact.absolute_path,
+                        reason="assigned to another shard or leased by another worker",
+                    )
+                    progress.increment("skipped")
+
+                    continue
+                orig_artifact_path = artifact.absolute_path
+
+                # the directory is listed once: to look for a metadata file, then to
+                # process its contents
+                dir_entries = self.scan_dir(artifact.absolute_path)
+
+                user_answered = False
+                video_metadata = self.find_override_metadata(
+                    artifact.absolute_path, dir_entries=dir_entries
+                )
+                if not video_metadata:
+                    video_metadata, user_answered = self.find_metadata(
+                        artifact=artifact,
+                        provider_metadata=provider_metadata,
+                        prompt_behavior=prompt_behavior,
                     )
-                    video_metadata.prompt_user_for_metadata()
 
                 if video_metadata.metadata_found:
-                    logger.info("renaming artifact based on gathered metadata")
+                    # recorded under the directory's original path, since that's the
+                    # (invalid) name it's looked up by when the same release turns up
+                    # again; the new name is skipped as valid before any lookup
+                    if user_answered and self.metadata_manifest:
+                        self.metadata_manifest.record(
+                            orig_artifact_path, video_metadata
+                        )
+
+                    # classified while the entries' paths are still valid, and moved
+                    # along with the directory after
+                    new_dir_artifacts = self.classify_artifacts(
+                        dir_entries=dir_entries, device=artifact.device
+                    )
                     artifact = self.rename_artifact(
                         artifact=artifact,
                         video_metadata=video_metadata,
                         dry_run=dry_run,
                     )
+                    for new_dir_artifact in new_dir_artifacts:
+                        new_dir_artifact.absolute_path = os.path.join(
+                            artifact.absolute_path, new_dir_artifact.name
+                        )
+                    if self.checkpoint and artifact.absolute_path != orig_artifact_path:
+                        # the old path is gone, so a resumed run has to pick it up by its
+                        # new one
+                        self.checkpoint.add_pending([artifact.absolute_path])
 
                     # start recursive subprocessing
-                    new_dir_artifacts = self.get_artifacts(
-                        tgt_dir=artifact.absolute_path
-                    )
                     if new_dir_artifacts:
                         self.process_directory(
                             dir_artifacts=new_dir_artifacts,
                             dry_run=dry_run,
                         )
+
+                    if self.checkpoint:
+                        self.checkpoint.mark_complete(
+                            orig_artifact_path, artifact.absolute_path
+                        )
                 else:
-                    logger.warning(
-                        "no metadata found for directory after exhausting all methods; skipping renaming and subprocessing"
-                    )
+                    events.emit("metadata_not_found", path=artifact.absolute_path)
+                    progress.increment("skipped")
+
+                if self.shard:
+                    self.shard.release(orig_artifact_path)
             else:
-                logger.info("file artifact found, processing")
+                events.emit("file_found", path=artifact.absolute_path)
                 # TODO: implement file artifact processing (e.g., renaming, moving, etc.)
@@ -0,0 +1,370 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Filesystem - backends for the filesystem ops done while processing artifacts
+"""
+
+import errno
+import os
+import threading
+
+from magic import Magic
+
+from . import metrics
+from .rename import RenameExecutor
+from .transfer import TransferManager
+
+# libmagic handles are not thread-safe and python-magic serializes calls made through
+# its shared handle, so each worker thread gets its own
+_magic_local = threading.local()
+
+
+def get_mime_type(file_path: str) -> str:
+    """
+    Detect the MIME type of the given file using a libmagic handle local to the calling thread
+    """
+
+    if not hasattr(_magic_local, "handle"):
+        _magic_local.handle = Magic(mime=True)
+    metrics.MAGIC_CALLS.inc()
+
+    return _magic_local.handle.from_file(file_path)
+
+
+class LocalFilesystem:
+    """
+    Filesystem backend operating on the actual filesystem
+    """
+
+    virtual = False
+
+    def __init__(self, transfer_manager=None) -> None:
+        self.transfer_manager = transfer_manager
+        self.rename_executor = RenameExecutor()
+
+        # set when the transfer manager was started here on first use; close() owns it
+        self._owns_transfer_manager = False
+
+    def scandir(self, dir_path: str) -> list:
+        """
+        List the entries of the given directory
+        """
+
+        with os.scandir(dir_path) as sd_iter:
+            return list(sd_iter)
+
+    def get_mime_type(self, file_path: str) -> str:
+        """
+        Detect the MIME type of the given file
+        """
+
+        return get_mime_type(file_path)
+
+    def get_device(self, path: str) -> int:
+        """
+        Fetch the ID of the device the given path is stored on
+        """
+
+        return os.stat(path).st_dev
+
+    def get_size(self, file_path: str) -> int:
+        """
+        Fetch the size of the given file, in bytes
+        """
+
+        return os.path.getsize(file_path)
+
+    def read_text(self, file_path: str) -> str:
+        """
+        Read in the contents of the given text file
+        """
+
+        with open(file_path, mode="r", encoding="utf-8") as text_file:
+            return text_file.read()
+
+    def exists(self, path: str) -> bool:
+        """
+        Check if anything exists at the given path
+        """
+
+        return os.path.exists(path)
+
+    def makedirs(self, dir_path: str) -> None:
+        """
+        Create the given directory, along with any missing parents
+        """
+
+        os.makedirs(dir_path, exist_ok=True)
+
+    def rename(self, src_path: str, dst_path: str) -> None:
+        """
+        Rename the given file or directory; unlike os.rename(), existing destinations are never replaced
+        """
+
+        self.rename_executor.rename(src_path, dst_path)
+
+    def move(self, src_path: str, dst_path: str) -> bool:
+        """
+        Move the given file, possibly across filesystems (via the transfer manager, started on first use if not set)
+
+        Returns False if the file couldn't be moved safely. Raises FileExistsError if the destination already exists.
+        """
+
+        if not self.transfer_manager:
+            self.transfer_manager = TransferManager()
+            self._owns_transfer_manager = True
+
+        return self.transfer_manager.move(src_path, dst_path)
+
+    def close(self) -> None:
+        """
+        Release any resources held by the backend
+        """
+
+        self.rename_executor.close()
+        if self._owns_transfer_manager:
+            self.transfer_manager.close()
+            self.transfer_manager = None
+            self._owns_transfer_manager = False
+
+
+class VirtualDirEntry:
+    """
+    Node of a virtual filesystem, quacking like the os.DirEntry objects returned by os.scandir()
+    """
+
+    def __init__(
+        self, name: str, is_dir: bool, size=0, mime_type="", contents=None
+    ) -> None:
+        self.name = name
+        self.path = ""
+        self.size = size
+        self.mime_type = "directory" if is_dir else mime_type
+        self.children = {} if is_dir else None
+        # text of the file, if it was captured
+        self.contents = contents
+
+    def is_dir(self) -> bool:
+        """Check if the entry is a directory"""
+
+        return self.children is not None
+
+
+class VirtualFilesystem:
+    """
+    In-memory filesystem backend, e.g. for replaying a pipeline run against a captured snapshot of a source tree
+
+    MIME types come from the snapshot, so libmagic is never called. Renames only re-link a single node, so they're
+    O(1) regardless of how large the renamed subtree is. All changes are recorded in `operations`. Only files whose
+    contents were captured (e.g. metadata files) can be read.
+    """
+
+    virtual = True
+
+    def __init__(self) -> None:
+        self.root = VirtualDirEntry(name="", is_dir=True)
+        self.operations = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def split_path(path: str) -> list:
+        """
+        Split the given absolute path into its components
+        """
+
+        return [
+            component for component in os.path.abspath(path).split(os.sep) if component
+        ]
+
+    def get_entry(self, path: str):
+        """
+        Fetch the entry at the given path, or None if there isn't one
+        """
+
+        entry = self.root
+        for component in self.split_path(path):
+            if not entry.is_dir():
+                return None
+
+            entry = entry.children.get(component)
+            if entry is None:
+                return None
+
+        return entry
+
+    def _get_parent_dir(self, path: str) -> VirtualDirEntry:
+        parent_entry = self.get_entry(os.path.dirname(os.path.abspath(path)))
+        if parent_entry is None:
+            raise FileNotFoundError(f"no such directory: {os.path.dirname(path)}")
+        if not parent_entry.is_dir():
+            raise NotADirectoryError(f"not a directory: {os.path.dirname(path)}")
+
+        return parent_entry
+
+    def add_entry(
+        self, path: str, is_dir: bool, size=0, mime_type="", contents=None
+    ) -> VirtualDirEntry:
+        """
+        Create a file or directory at the given path; parent directories must already exist
+        """
+
+        name = os.path.basename(os.path.abspath(path))
+        with self._lock:
+            parent_entry = self._get_parent_dir(path)
+            if name in parent_entry.children:
+                raise FileExistsError(f"file exists: {path}")
+
+            entry = parent_entry.children[name] = VirtualDirEntry(
+                name=name,
+                is_dir=is_dir,
+                size=size,
+                mime_type=mime_type,
+                contents=contents,
+            )
+
+        return entry
+
+    def scandir(self, dir_path: str) -> list:
+        """
+        List the entries of the given directory
+        """
+
+        dir_path = os.path.abspath(dir_path)
+        with self._lock:
+            dir_entry = self.get_entry(dir_path)
+            if dir_entry is None:
+                raise FileNotFoundError(f"no such directory: {dir_path}")
+            if not dir_entry.is_dir():
+                raise NotADirectoryError(f"not a directory: {dir_path}")
+
+            entries = list(dir_entry.children.values())
+
+        for entry in entries:
+            entry.path = os.path.join(dir_path, entry.name)
+
+        return entries
+
+    def get_mime_type(self, file_path: str) -> str:
+        """
+        Look up the MIME type recorded for the given file
+        """
+
+        entry = self.get_entry(file_path)
+        if entry is None:
+            raise FileNotFoundError(f"no such file: {file_path}")
+
+        return entry.mime_type
+
+    def get_device(self, path: str) -> int:
+        """
+        Fetch the ID of the device the given path is stored on; everything in memory shares the same one
+        """
+
+        if self.get_entry(path) is None:
+            raise FileNotFoundError(f"no such file or directory: {path}")
+
+        return 0
+
+    def get_size(self, file_path: str) -> int:
+        """
+        Look up the size recorded for the given file, in bytes
+        """
+
+        entry = self.get_entry(file_path)
+        if entry is None:
+            raise FileNotFoundError(f"no such file: {file_path}")
+
+        return entry.size
+
+    def read_text(self, file_path: str) -> str:
+        """
+        Fetch the captured contents of the given text file
+        """
+
+        entry = self.get_entry(file_path)
+        if entry is None:
+            raise FileNotFoundError(f"no such file: {file_path}")
+        if entry.is_dir():
+            raise IsADirectoryError(f"is a directory: {file_path}")
+        if entry.contents is None:
+            raise OSError(errno.ENODATA, "contents weren't captured", file_path)
+
+        return entry.contents
+
+    def exists(self, path: str) -> bool:
+        """
+        Check if anything exists at the given path
+        """
+
+        return self.get_entry(path) is not None
+
+    def makedirs(self, dir_path: str) -> None:
+        """
+        Create the given directory, along with any missing parents
+        """
+
+        with self._lock:
+            entry = self.root
+            for component in self.split_path(dir_path):
+                if component not in entry.children:
+                    entry.children[component] = VirtualDirEntry(
+                        name=component, is_dir=True
+                    )
+                entry = entry.children[component]
+                if not entry.is_dir():
+                    raise NotADirectoryError(f"not a directory: {dir_path}")
+
+    def rename(self, src_path: str, dst_path: str) -> None:
+        """
+        Rename the given file or directory; unlike os.rename(), existing destinations are never replaced
+        """
+
+        src_path, dst_path = os.path.abspath(src_path), os.path.abspath(dst_path)
+        if src_path == dst_path:
+            return
+
+        src_name, dst_name = os.path.basename(src_path), os.path.basename(dst_path)
+        with self._lock:
+            src_parent_entry = self._get_parent_dir(src_path)
+            dst_parent_entry = self._get_parent_dir(dst_path)
+            if src_name not in src_parent_entry.children:
+                raise FileNotFoundError(f"no such file or directory: {src_path}")
+            if dst_name in dst_parent_entry.children:
+                raise FileExistsError(f"file exists: {dst_path}")
+
+            entry = src_parent_entry.children.pop(src_name)
+            entry.name = dst_name
+            dst_parent_entry.children[dst_name] = entry
+
+            self.operations.append(("rename", src_path, dst_path))
+
+    def move(self, src_path: str, dst_path: str) -> bool:
+        """
+        Move the given file
+        """
+
+        self.rename(src_path, dst_path)
+
+        return True
+
+    def close(self) -> None:
+        """
+        Release any resources held by the backend
+        """
+
+    def walk(self, dir_path="/") -> list:
+        """
+        List the paths of all entries below the given directory, depth-first
+        """
+
+        paths = []
+        pending = [(os.path.abspath(dir_path), self.get_entry(dir_path))]
+        while pending:
+            path, entry = pending.pop()
+            for child in entry.children.values():
+                child_path = os.path.join(path, child.name)
+                paths.append(child_path)
+                if child.is_dir():
+                    pending.append((child_path, child))
+
+        return paths
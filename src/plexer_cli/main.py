@@ -10,16 +10,45 @@ __version__ = "0.0.3-5"
 __license__ = "MIT"
 
 import argparse
+import logging
+import os
+import sys
+import time
+
 import logzero
 from logzero import logger
 # yes, docs suggest importing it twice:
 # https://logzero.readthedocs.io/en/latest/#advanced-usage-examples
 
+from plexer_cli import events, metrics, progress
+from plexer_cli.answer_cache import AnswerCache
+from plexer_cli.audit import LibraryAuditor
+from plexer_cli.checkpoint import Checkpoint
+from plexer_cli.concurrency import ConcurrencyController
+from plexer_cli.const import (
+    ANSWER_CACHE_FILE_PATH,
+    CHECKPOINT_FILE_NAME,
+    IO_CONCURRENCY_DEVICE_MAX_WORKERS,
+    IO_CONCURRENCY_MAX_WORKERS,
+    IO_CONCURRENCY_MIN_WORKERS,
+    LEASE_DIR_NAME,
+    LEASE_TTL,
+    METADATA_FILE_NAME,
+    PROVIDER_CACHE_FILE_PATH,
+    PROVIDER_RATE_LIMIT,
+)
 from plexer_cli.file_manager import FileManager
+from plexer_cli.filesystem import VirtualFilesystem
+from plexer_cli.manifest import MetadataManifest
+from plexer_cli.provider import HTTPMetadataProvider, ProviderCache, ProviderResolver
+from plexer_cli.shard import LeaseManager, Shard
+from plexer_cli.snapshot import Snapshot
+from plexer_cli.title_index import TitleIndex
+from plexer_cli.transfer import VERIFY_MODES, DigestManifest, TransferManager
 
 
-def fetch_cli_args() -> argparse.Namespace:
-    """Parse CLI arguments passed to the application during startup"""
+def fetch_cli_args(args=None) -> argparse.Namespace:
+    """Parse CLI arguments passed to the application during startup (or the given list of arguments)"""
 
     parser = argparse.ArgumentParser()
 
@@ -29,8 +58,33 @@ def fetch_cli_args() -> argparse.Namespace:
 
     parser.add_argument("--version", action="version", version=f"{__version__}")
 
-    parser.add_argument("-s", "--source-dir", action="store", required=True)
-    parser.add_argument("-d", "--destination-dir", action="store", required=True)
+    parser.add_argument(
+        "--log-format",
+        choices=events.OUTPUT_FORMATS,
+        default="console",
+        help="Format of log output. console = human-readable lines; jsonl = one JSON object per line, for log pipelines",
+    )
+
+    parser.add_argument(
+        "--no-progress",
+        action="store_true",
+        help="Toggle to hide the live progress line (shown by default when running in a terminal without -v)",
+    )
+
+    parser.add_argument(
+        "-s",
+        "--source-dir",
+        action="append",
+        help="Directory to process; can be given multiple times to process several directories (e.g. on different disks) in one run, sharing the same worker pool",
+    )
+    parser.add_argument("-d", "--destination-dir", action="store")
+
+    parser.add_argument(
+        "--media-type",
+        choices=["movie", "tv"],
+        default="movie",
+        help="Type of media in the source directory. movie = rename movie directories in place; tv = group episode files into shows and seasons within the destination directory",
+    )
 
     parser.add_argument(
         "--prompt",
@@ -51,43 +105,503 @@ def fetch_cli_args() -> argparse.Namespace:
         help="Perform a trial run with no changes made",
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--verify",
+        choices=VERIFY_MODES,
+        default="sample",
+        help="How to verify TV episode files copied to the destination directory across filesystems. none = trust the copy; sample = compare sizes and a sample of blocks; full = read the copy back and compare its digest against the one computed while copying",
+    )
+    parser.add_argument(
+        "--digest-manifest-file",
+        action="store",
+        help="Path of the manifest used to record digests of files copied to the destination directory (default: a file per destination directory, in the user's cache directory)",
+    )
 
+    parser.add_argument(
+        "--min-io-workers",
+        type=int,
+        default=IO_CONCURRENCY_MIN_WORKERS,
+        help="Minimum number of concurrent I/O operations (file classification, renames, etc)",
+    )
+    parser.add_argument(
+        "--max-io-workers",
+        type=int,
+        default=IO_CONCURRENCY_MAX_WORKERS,
+        help="Maximum number of concurrent I/O operations; concurrency is adjusted automatically within these bounds based on storage latency",
+    )
+    parser.add_argument(
+        "--max-io-workers-per-device",
+        type=int,
+        default=IO_CONCURRENCY_DEVICE_MAX_WORKERS,
+        help="Maximum number of concurrent I/O operations against any single device, so source directories on other devices get the remaining workers",
+    )
 
-def main():
-    """Main entry point of the app"""
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume an interrupted run, working only on the directories it left pending and skipping subtrees that were already completed (movie runs only)",
+    )
+    parser.add_argument(
+        "--checkpoint-file",
+        action="store",
+        help=f"Path of the checkpoint file used to track run progress (default: <SOURCE_DIR>/{CHECKPOINT_FILE_NAME}, in the first source directory given)",
+    )
+
+    parser.add_argument(
+        "--answer-cache-file",
+        action="store",
+        default=ANSWER_CACHE_FILE_PATH,
+        help="Path of the file used to remember metadata answers given at prompts across runs",
+    )
+    parser.add_argument(
+        "--disable-answer-cache",
+        action="store_true",
+        help="Toggle to skip reusing answers given at previous prompts for similar artifacts",
+    )
+
+    parser.add_argument(
+        "--metadata-manifest",
+        action="store",
+        help=f"Path of a library-level manifest mapping directory paths (relative to the manifest) or name patterns to metadata; answers given at prompts are added to it. {METADATA_FILE_NAME} files within directories take precedence over it",
+    )
+
+    parser.add_argument(
+        "--title-db",
+        action="store",
+        help="Path of a TSV file of known titles (title, release year, alternate titles) used to confirm and correct heuristic results; it is indexed on first use",
+    )
+
+    parser.add_argument(
+        "--metadata-provider-url",
+        action="append",
+        default=[],
+        help="URL of an HTTP metadata lookup service (queried as <URL>?name=<NAME>&year=<YEAR>); can be given multiple times, in order of preference",
+    )
+    parser.add_argument(
+        "--metadata-provider-rate-limit",
+        type=float,
+        default=PROVIDER_RATE_LIMIT,
+        help="Maximum number of requests per second sent to each metadata provider (0 = unlimited)",
+    )
+    parser.add_argument(
+        "--metadata-provider-cache-file",
+        action="store",
+        default=PROVIDER_CACHE_FILE_PATH,
+        help="Path of the file used to cache metadata provider responses across runs",
+    )
+
+    parser.add_argument(
+        "--metrics-textfile",
+        action="store",
+        help="Path of a file to write run metrics to when the run ends, in the Prometheus text format (e.g. for node_exporter's textfile collector)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve run metrics over HTTP on this port while the run is in progress, for Prometheus to scrape",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        action="store",
+        default="127.0.0.1",
+        help="Address to serve run metrics on, when --metrics-port is given",
+    )
+
+    parser.add_argument(
+        "--shard-count",
+        type=int,
+        default=1,
+        help="Number of workers (processes or hosts) splitting the source directory between them; top-level artifacts are assigned to workers by consistent hashing of their names",
+    )
+    parser.add_argument(
+        "--shard-index",
+        type=int,
+        default=0,
+        help="Index of this worker's shard, from 0 to <SHARD_COUNT> - 1",
+    )
+    parser.add_argument(
+        "--lease-dir",
+        action="store",
+        help=f"Directory shared by all workers of a sharded run, used to hold the lease files that keep workers from processing the same subtree (default: <SOURCE_DIR>/{LEASE_DIR_NAME})",
+    )
+    parser.add_argument(
+        "--lease-ttl",
+        type=int,
+        default=LEASE_TTL,
+        help="Number of seconds after which leases of workers that stopped renewing them (e.g. crashed) can be taken over",
+    )
+
+    parser.add_argument(
+        "--capture-snapshot",
+        action="store",
+        metavar="SNAPSHOT_FILE",
+        help="Capture a snapshot of the source directory (names, sizes, and file types) to the given file and exit, without processing anything",
+    )
+    parser.add_argument(
+        "--replay-snapshot",
+        action="store",
+        metavar="SNAPSHOT_FILE",
+        help="Run against the tree captured in the given snapshot file, mounted in memory at the source directory, instead of the actual files; the resulting operations are printed instead of being made",
+    )
+
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    add_audit_cli_args(
+        subparsers.add_parser(
+            "audit",
+            help="Check an existing library without changing anything; run `%(prog)s audit --help` for details",
+            description="Check an existing library for anything that doesn't follow Plex's naming conventions, without changing anything",
+        )
+    )
+
+    cli_args = parser.parse_args(args)
+
+    if cli_args.command == "audit":
+        return cli_args
+
+    if not cli_args.source_dir:
+        parser.error("the following arguments are required: -s/--source-dir")
+    if not cli_args.destination_dir and not cli_args.capture_snapshot:
+        parser.error("the following arguments are required: -d/--destination-dir")
+    if cli_args.capture_snapshot and cli_args.replay_snapshot:
+        parser.error("--capture-snapshot and --replay-snapshot can't be used together")
+    if cli_args.replay_snapshot and cli_args.shard_count > 1:
+        parser.error("sharded runs can't be replayed from a snapshot")
+    if len(cli_args.source_dir) > 1:
+        if cli_args.shard_count > 1:
+            parser.error("sharded runs only support a single source directory")
+        if cli_args.capture_snapshot or cli_args.replay_snapshot:
+            parser.error("snapshots only support a single source directory")
+
+    if not 0 <= cli_args.shard_index < cli_args.shard_count:
+        parser.error("--shard-index must be between 0 and --shard-count - 1")
+    if cli_args.shard_count > 1 and cli_args.media_type == "tv":
+        parser.error("sharded runs are only supported with --media-type movie")
+    if cli_args.resume and cli_args.media_type == "tv":
+        parser.error("--resume is only supported with --media-type movie")
+
+    return cli_args
+
+
+def add_audit_cli_args(parser: argparse.ArgumentParser) -> None:
+    """Add the CLI arguments of the audit subcommand to the given parser"""
+
+    # -v can also come before the subcommand, so here it's only set if given after it
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=argparse.SUPPRESS,
+        help="Verbosity (-v, -vv, etc)",
+    )
+
+    parser.add_argument(
+        "-s",
+        "--source-dir",
+        action="store",
+        required=True,
+        help="Library directory to audit; its top-level directories are treated as title directories",
+    )
+    parser.add_argument(
+        "--report-file",
+        action="store",
+        help="Path of a file to write the full audit report to, as JSON",
+    )
+
+    parser.add_argument(
+        "--min-io-workers",
+        type=int,
+        default=IO_CONCURRENCY_MIN_WORKERS,
+        help="Minimum number of concurrent directory listings",
+    )
+    parser.add_argument(
+        "--max-io-workers",
+        type=int,
+        default=IO_CONCURRENCY_MAX_WORKERS,
+        help="Maximum number of concurrent directory listings; concurrency is adjusted automatically within these bounds based on storage latency",
+    )
 
-    cli_args = fetch_cli_args()
+
+def get_log_level(verbose: int) -> int:
+    """Determine the log level to use for the given verbosity"""
+
+    if verbose == 1:
+        return logging.INFO
+    if verbose >= 2:
+        return logging.DEBUG
+
+    return logging.WARNING
+
+
+def audit(cli_args: argparse.Namespace) -> None:
+    """Entry point of the audit subcommand"""
+
+    logzero.loglevel(get_log_level(cli_args.verbose))
+
+    io_controller = ConcurrencyController(
+        min_workers=cli_args.min_io_workers, max_workers=cli_args.max_io_workers
+    )
+    auditor = LibraryAuditor(
+        library_dir=cli_args.source_dir, io_controller=io_controller
+    )
+    try:
+        auditor.run()
+    finally:
+        io_controller.close()
+
+    print(auditor.generate_summary())
+    if cli_args.report_file:
+        auditor.save_report(cli_args.report_file)
+
+
+def process(cli_args: argparse.Namespace) -> None:
+    """Entry point of the default command: process the source directories"""
+
+    run_start_time = time.monotonic()
 
     # logzero.logfile(None)
-    if cli_args.verbose == 1:
-        logzero.loglevel(logzero.INFO)
-    elif cli_args.verbose >= 2:
-        logzero.loglevel(logzero.DEBUG)
-    else:
-        logzero.loglevel(logzero.WARNING)
+    log_level = get_log_level(cli_args.verbose)
+    logzero.loglevel(log_level)
+    # per-artifact output goes through the event stream, everything else through logzero
+    events.configure(level=log_level, output_format=cli_args.log_format)
+    if cli_args.log_format == "jsonl":
+        logzero.json()
+    # log lines would scroll the live progress line away, so it's only shown when
+    # logging is quiet
+    progress.configure(
+        enabled=not cli_args.no_progress
+        and cli_args.verbose == 0
+        and sys.stderr.isatty()
+    )
 
     logger.info("starting Plexer")
     logger.debug("options: %s", cli_args)
     if cli_args.dry_run:
         logger.info("performing a dry run; NO CHANGES WILL BE MADE")
 
-    fm = FileManager(src_dir=cli_args.source_dir, dst_dir=cli_args.destination_dir)
+    io_controller = ConcurrencyController(
+        min_workers=cli_args.min_io_workers,
+        max_workers=cli_args.max_io_workers,
+        device_max_workers=cli_args.max_io_workers_per_device,
+    )
+
+    if cli_args.capture_snapshot:
+        Snapshot.capture(
+            root_dir=cli_args.source_dir[0], io_controller=io_controller
+        ).save(cli_args.capture_snapshot)
+        io_controller.close()
+
+        return
+
+    filesystem = None
+    if cli_args.replay_snapshot:
+        logger.info(
+            "replaying snapshot @ %s; NO CHANGES WILL BE MADE", cli_args.replay_snapshot
+        )
+        filesystem = VirtualFilesystem()
+        Snapshot.load(cli_args.replay_snapshot).mount(
+            filesystem, root_dir=cli_args.source_dir[0]
+        )
+        filesystem.makedirs(cli_args.destination_dir)
+    # replays leave all state on disk (checkpoints, cached answers, digests) untouched,
+    # just like dry runs
+    read_only = cli_args.dry_run or filesystem is not None
+
+    # checkpoints are only recorded for runs that actually change things, and TV runs
+    # don't use them
+    checkpoint = None
+    if not read_only and cli_args.media_type == "movie":
+        # each worker of a sharded run tracks its own progress
+        checkpoint_file_name = (
+            f"{CHECKPOINT_FILE_NAME}.{cli_args.shard_index}"
+            if cli_args.shard_count > 1
+            else CHECKPOINT_FILE_NAME
+        )
+        checkpoint = Checkpoint(
+            file_path=cli_args.checkpoint_file
+            if cli_args.checkpoint_file
+            else os.path.join(cli_args.source_dir[0], checkpoint_file_name),
+            source_dir=cli_args.source_dir[0],
+        )
+        if cli_args.resume:
+            logger.info("resuming from checkpoint @ %s", checkpoint.file_path)
+            checkpoint.load()
+    elif cli_args.resume:
+        logger.warning(
+            "checkpoints are not used during dry runs or replays; ignoring --resume"
+        )
+
+    answer_cache = None
+    if not cli_args.disable_answer_cache:
+        answer_cache = AnswerCache(
+            file_path=cli_args.answer_cache_file, read_only=read_only
+        )
+        answer_cache.load()
+
+    metadata_manifest = None
+    if cli_args.metadata_manifest:
+        metadata_manifest = MetadataManifest(
+            file_path=cli_args.metadata_manifest, read_only=read_only
+        )
+        metadata_manifest.load()
+
+    title_index = TitleIndex.open(cli_args.title_db) if cli_args.title_db else None
+
+    metadata_resolver = None
+    if cli_args.metadata_provider_url:
+        provider_cache = ProviderCache(
+            file_path=cli_args.metadata_provider_cache_file, read_only=read_only
+        )
+        provider_cache.load()
+        metadata_resolver = ProviderResolver(
+            providers=[
+                HTTPMetadataProvider(
+                    url=provider_url, rate_limit=cli_args.metadata_provider_rate_limit
+                )
+                for provider_url in cli_args.metadata_provider_url
+            ],
+            cache=provider_cache,
+        )
+
+    digest_manifest = None
+    if not read_only:
+        digest_manifest = DigestManifest(
+            file_path=cli_args.digest_manifest_file
+            if cli_args.digest_manifest_file
+            else DigestManifest.generate_file_path(cli_args.destination_dir),
+            root_dir=cli_args.destination_dir,
+        )
+        digest_manifest.load()
+    transfer_manager = TransferManager(verify=cli_args.verify, manifest=digest_manifest)
+
+    shard = None
+    if cli_args.shard_count > 1:
+        lease_manager = LeaseManager(
+            lease_dir=cli_args.lease_dir
+            if cli_args.lease_dir
+            else os.path.join(cli_args.source_dir[0], LEASE_DIR_NAME),
+            ttl=cli_args.lease_ttl,
+        )
+        lease_manager.start()
+        shard = Shard(
+            root_dir=cli_args.source_dir[0],
+            shard_index=cli_args.shard_index,
+            shard_count=cli_args.shard_count,
+            lease_manager=lease_manager,
+        )
+        logger.info(
+            "running as shard %d of %d (lease owner: %s)",
+            cli_args.shard_index,
+            cli_args.shard_count,
+            lease_manager.owner,
+        )
+
+    fm = FileManager(
+        src_dir=cli_args.source_dir[0],
+        dst_dir=cli_args.destination_dir,
+        io_controller=io_controller,
+        checkpoint=checkpoint,
+        answer_cache=answer_cache,
+        title_index=title_index,
+        metadata_resolver=metadata_resolver,
+        shard=shard,
+        transfer_manager=transfer_manager,
+        filesystem=filesystem,
+        metadata_manifest=metadata_manifest,
+    )
 
     # get and prep artifacts for processing
     logger.debug("prepping artifacts for processing")
-    artifacts = fm.prep_artifacts(artifacts=fm.get_artifacts())
-    logger.info("%d artifact(s) found in source directory", len(artifacts))
+    if checkpoint and checkpoint.pending:
+        artifacts = fm.get_pending_artifacts(src_dirs=cli_args.source_dir)
+    else:
+        artifacts = fm.get_root_artifacts(src_dirs=cli_args.source_dir)
+
+    metrics_server = None
+    if cli_args.metrics_port is not None:
+        metrics_server = metrics.MetricsServer(
+            registry=metrics.REGISTRY,
+            host=cli_args.metrics_host,
+            port=cli_args.metrics_port,
+        )
+        metrics_server.start()
 
     logger.info("processing artifacts")
-    fm.process_directory(
-        dir_artifacts=artifacts,
-        prompt_behavior=cli_args.prompt,
-        rename_files=not cli_args.disable_file_rename,
-        dry_run=cli_args.dry_run,
+    metrics.RUN_SUCCESS.set(0)
+    progress.get_reporter().start()
+    try:
+        fm.process_directory(
+            dir_artifacts=artifacts,
+            prompt_behavior=cli_args.prompt,
+            rename_files=not cli_args.disable_file_rename,
+            dry_run=cli_args.dry_run,
+            media_type=cli_args.media_type,
+        )
+        metrics.RUN_SUCCESS.set(1)
+    except BaseException:
+        if checkpoint:
+            # save whatever progress was made so the run can be resumed
+            checkpoint.flush()
+            logger.warning(
+                "run interrupted; progress saved to checkpoint @ %s (rerun with --resume to continue)",
+                checkpoint.file_path,
+            )
+
+        raise
+    finally:
+        if metadata_resolver:
+            metadata_resolver.close()
+        if shard:
+            shard.lease_manager.stop()
+        transfer_manager.close()
+        fm.filesystem.close()
+        io_controller.close()
+        events.close()
+        progress.get_reporter().stop()
+
+        metrics.RUN_DURATION.set(time.monotonic() - run_start_time)
+        metrics.RUN_END_TIME.set(time.time())
+        if cli_args.metrics_textfile:
+            metrics.REGISTRY.write_textfile(cli_args.metrics_textfile)
+        if metrics_server:
+            metrics_server.close()
+
+    if checkpoint:
+        checkpoint.clear()
+    collisions = fm.rename_plan.collisions
+    if collisions:
+        logger.warning(
+            "%d rename(s) skipped because their destination already exists:",
+            len(collisions),
+        )
+        for src_path, dst_path in collisions:
+            logger.warning("  %s -> %s", src_path, dst_path)
+    if filesystem:
+        for operation, src_path, dst_path in filesystem.operations:
+            print(f"{operation}: {src_path} -> {dst_path}")
+        logger.info(
+            "replay completed; %d operation(s) simulated", len(filesystem.operations)
+        )
+    logger.info(
+        "run summary - %d source dir(s), %d artifact(s) processed, %d renamed or moved, %d prompt(s), %s elapsed",
+        len(cli_args.source_dir),
+        metrics.ARTIFACTS_PROCESSED.get_total(),
+        metrics.RENAMES.get(),
+        metrics.PROMPTS.get(),
+        progress.format_duration(metrics.RUN_DURATION.get()),
     )
     logger.info("artifact processing completed successfully")
 
 
+def main():
+    """Main entry point of the app"""
+
+    cli_args = fetch_cli_args()
+
+    if cli_args.command == "audit":
+        audit(cli_args)
+    else:
+        process(cli_args)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,216 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Manifest - library-level metadata overrides, kept in a single file
+"""
+
+import fnmatch
+import json
+import os
+import re
+import threading
+
+from logzero import logger
+
+from .const import METADATA_MANIFEST_FORMAT_VERSION
+from .metadata import Metadata
+
+RECORD_TYPES = ("path", "pattern")
+
+
+class MetadataManifest:
+    """
+    Metadata for directories of a library, keyed by their path relative to the manifest or by name pattern
+
+    The manifest is a log of JSON lines: a header holding the format version, followed by one record per line,
+    either `["path", <relative path>, <name>, <release year>]` or `["pattern", <glob>, <name>, <release year>]`.
+    Later records replace earlier ones for the same path or pattern, so new answers are appended to the file rather
+    than rewriting it; the log is compacted on load once it's mostly made up of replaced records, or holds corrupt
+    ones (e.g. cut off by a crash).
+
+    The whole manifest is loaded into memory once. Path lookups are a single dict lookup; patterns are checked in
+    the order they were added, against the relative path if they contain a separator and the directory name if not.
+    """
+
+    file_path = ""
+
+    def __init__(self, file_path: str, read_only=False) -> None:
+        self.file_path = file_path
+        self.read_only = read_only
+
+        # key -> (name, release year)
+        self.paths = {}
+        self.patterns = {}
+        self._pattern_regexes = []
+        self._num_records = 0
+        self._lock = threading.Lock()
+
+    def generate_key(self, dir_path: str) -> str:
+        """
+        Generate the manifest key of the given directory: its path relative to the manifest's directory
+        """
+
+        return os.path.relpath(
+            dir_path, os.path.dirname(os.path.abspath(self.file_path))
+        )
+
+    def _compile_patterns(self) -> None:
+        self._pattern_regexes = [
+            (re.compile(fnmatch.translate(pattern)), os.sep in pattern, pattern)
+            for pattern in self.patterns
+        ]
+
+    def load(self) -> None:
+        """
+        Read in the manifest, if it exists
+        """
+
+        try:
+            with open(self.file_path, mode="r", encoding="utf-8") as manifest_file:
+                lines = manifest_file.read().splitlines()
+        except FileNotFoundError:
+            logger.debug("no metadata manifest found @ %s", self.file_path)
+
+            return
+
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except json.JSONDecodeError:
+            header = {}
+        if header.get("version") != METADATA_MANIFEST_FORMAT_VERSION:
+            logger.warning(
+                "metadata manifest @ %s uses an unsupported format; ignoring it",
+                self.file_path,
+            )
+
+            return
+
+        num_corrupt_records = 0
+        for line_num, line in enumerate(lines[1:], start=2):
+            if not line.strip():
+                continue
+
+            try:
+                record_type, key, name, release_year = json.loads(line)
+            except (json.JSONDecodeError, TypeError, ValueError):
+                record_type = None
+            if record_type not in RECORD_TYPES:
+                # most likely a record cut off by a crash mid-append
+                logger.warning(
+                    "skipping corrupt record on line %d of metadata manifest @ %s",
+                    line_num,
+                    self.file_path,
+                )
+                num_corrupt_records += 1
+
+                continue
+
+            records = self.patterns if record_type == "pattern" else self.paths
+            records[key] = (name, release_year)
+            self._num_records += 1
+        self._compile_patterns()
+
+        logger.debug(
+            "loaded metadata manifest @ %s - %d path(s), %d pattern(s)",
+            self.file_path,
+            len(self.paths),
+            len(self.patterns),
+        )
+
+        # corrupt records are dropped right away so new records don't get appended to a
+        # partial line
+        if num_corrupt_records or self._num_records > 2 * (
+            len(self.paths) + len(self.patterns)
+        ):
+            self.compact()
+
+    def lookup(self, dir_path: str):
+        """
+        Fetch the metadata recorded for the given directory, or None if there isn't any
+        """
+
+        key = self.generate_key(dir_path)
+        record = self.paths.get(key)
+        if not record:
+            dir_name = os.path.basename(key)
+            for pattern_regex, match_path, pattern in self._pattern_regexes:
+                if pattern_regex.match(key if match_path else dir_name):
+                    record = self.patterns[pattern]
+
+                    break
+
+        if not record:
+            return None
+
+        metadata = Metadata(name=record[0], release_year=record[1])
+        metadata.metadata_found = True
+
+        return metadata
+
+    def _append(self, record_type: str, key: str, metadata: Metadata) -> None:
+        records = self.patterns if record_type == "pattern" else self.paths
+        with self._lock:
+            records[key] = (metadata.name, metadata.release_year)
+            if record_type == "pattern":
+                self._compile_patterns()
+
+            if self.read_only:
+                return
+
+            manifest_dir = os.path.dirname(self.file_path)
+            if manifest_dir:
+                os.makedirs(manifest_dir, exist_ok=True)
+
+            new_file = not os.path.exists(self.file_path)
+            with open(self.file_path, mode="a", encoding="utf-8") as manifest_file:
+                if new_file:
+                    manifest_file.write(
+                        json.dumps({"version": METADATA_MANIFEST_FORMAT_VERSION}) + "\n"
+                    )
+                manifest_file.write(
+                    json.dumps([record_type, key, metadata.name, metadata.release_year])
+                    + "\n"
+                )
+            self._num_records += 1
+
+    def record(self, dir_path: str, metadata: Metadata) -> None:
+        """
+        Record the metadata of the given directory
+        """
+
+        self._append("path", self.generate_key(dir_path), metadata)
+
+    def add_pattern(self, pattern: str, metadata: Metadata) -> None:
+        """
+        Record the metadata of all directories matching the given glob pattern
+        """
+
+        self._append("pattern", pattern, metadata)
+
+    def compact(self) -> None:
+        """
+        Rewrite the manifest without any replaced records
+        """
+
+        if self.read_only:
+            return
+
+        with self._lock:
+            tmp_file_path = f"{self.file_path}.tmp"
+            with open(tmp_file_path, mode="w", encoding="utf-8") as manifest_file:
+                manifest_file.write(
+                    json.dumps({"version": METADATA_MANIFEST_FORMAT_VERSION}) + "\n"
+                )
+                for record_type, records in (
+                    ("pattern", self.patterns),
+                    ("path", self.paths),
+                ):
+                    for key, (name, release_year) in records.items():
+                        manifest_file.write(
+                            json.dumps([record_type, key, name, release_year]) + "\n"
+                        )
+            os.replace(tmp_file_path, self.file_path)
+
+            self._num_records = len(self.paths) + len(self.patterns)
+
+        logger.debug("metadata manifest @ %s compacted", self.file_path)
@@ -9,7 +9,20 @@ import re
 from logzero import logger
 from prompt_toolkit import PromptSession
 
-from .const import ARTIFACT_HEURISTICS_PATTERNS
+from . import events, progress
+from .const import (
+    ARTIFACT_HEURISTICS_PATTERNS,
+    RELEASE_TAG_PATTERN,
+    RESOLUTION_PATTERN,
+    TITLE_INDEX_MAX_PREFIX_TOKENS,
+    TITLE_INDEX_MIN_CORRECTION_SCORE,
+    TITLE_INDEX_MIN_YEARLESS_TOKENS,
+)
+
+SEPARATOR_REGEX = re.compile(r"[\.\_\-\(\)\[\]]+")
+RESOLUTION_REGEX = re.compile(RESOLUTION_PATTERN)
+RELEASE_TAG_REGEX = re.compile(RELEASE_TAG_PATTERN)
+YEAR_TOKEN_REGEX = re.compile(r"(?:19|20)[0-9]{2}")
 
 
 class Metadata:
@@ -33,12 +46,10 @@ class Metadata:
         Typically used to produce a cleaner string as part of heuristic analysis.
         """
 
-        logger.debug("scrubbing artifact name: %s", artifact_name)
-
         # replace common separators with spaces and strip surrounding whitespace
-        scrubbed_name = re.sub(r"[\.\_\-\(\)\[\]]+", " ", artifact_name).strip()
+        scrubbed_name = SEPARATOR_REGEX.sub(" ", artifact_name).strip()
 
-        logger.debug("artifact name post-scrubbing: %s", scrubbed_name)
+        events.emit("name_scrubbed", name=artifact_name, scrubbed_name=scrubbed_name)
 
         return scrubbed_name
 
@@ -48,18 +59,21 @@ class Metadata:
         """
 
         logger.debug("prompting user for metadata input")
+        # make sure the user sees everything about the artifact before being asked
+        events.flush()
 
         prompt_sess = PromptSession()
 
-        user_name = prompt_sess.prompt(
-            "Enter the correct name for this media: ", default=self.name
-        )
-        user_release_year = prompt_sess.prompt(
-            "Enter the release year for this media: ",
-            default=str(
-                self.release_year
-            ),  # `default` argument _must_ be a string, per docs
-        )
+        with progress.paused():
+            user_name = prompt_sess.prompt(
+                "Enter the correct name for this media: ", default=self.name
+            )
+            user_release_year = prompt_sess.prompt(
+                "Enter the release year for this media: ",
+                default=str(
+                    self.release_year
+                ),  # `default` argument _must_ be a string, per docs
+            )
 
         self.name = user_name
         self.release_year = int(user_release_year)
@@ -70,8 +84,6 @@ class Metadata:
         Analyze given file name and attempt to extract metadata values via heuristics
         """
 
-        logger.debug("performing heuristic analysis on artifact: %s", file_name)
-
         # perform basic heuristics
         ## NAME
         possible_name = re.search(ARTIFACT_HEURISTICS_PATTERNS["name"], file_name)
@@ -88,31 +100,114 @@ class Metadata:
                 "".join(possible_release_year[-1])
             )  # Ex: [('19', '99'), ('20', '20')] -> ('20', '20') -> 2020
 
-        if possible_name and possible_release_year:
-            logger.debug(
-                "heuristic analysis results - name: %s, release_year: %d",
-                self.name,
-                self.release_year,
-            )
+        events.emit(
+            "heuristics_result",
+            file_name=file_name,
+            name=self.name,
+            release_year=self.release_year,
+            complete=bool(possible_name and possible_release_year),
+        )
 
+        if possible_name and possible_release_year:
             self.metadata_found = True
             return True
 
-        logger.debug("heuristic analysis produced partial or no results")
         self.metadata_found = (
             False  # in case it has been overwritten from the default value
         )
         return False
 
-    def import_metadata_from_file(self, file_path: str) -> None:
+    def do_title_index_verification(self, file_name: str, title_index) -> bool:
+        """
+        Confirm and correct heuristic results using the given offline title index
+
+        Heuristic regexes can pick up years from unrelated numbers and names from partial captures, so the index is
+        checked for the longest prefix of the scrubbed file name that is a known title, released in one of the
+        candidate years found in the file name. Numbers within resolutions (e.g. 1920x1080) are never candidate
+        years. Without any candidate years, the prefix has to cover the whole title part of the name (everything up
+        to the first year or release tag), or at least a few words of it. If none match exactly, the heuristic name is fuzzy-matched instead,
+        which only corrects small differences in the name: the title found has to be nearly identical and released
+        in one of the candidate years too, so e.g. "Aliens (1986)" is never turned into "Alien (1979)". Metadata
+        values are left as-is if the title isn't known.
+        """
+
+        candidate_years = [
+            int("".join(year_match))
+            for year_match in re.findall(
+                ARTIFACT_HEURISTICS_PATTERNS["release_year"],
+                RESOLUTION_REGEX.sub(" ", file_name),
+            )
+        ]
+        name_tokens = self.scrub_artifact_name(file_name).split()
+
+        # short prefixes are likely to collide with unrelated titles (e.g. "Her" for
+        # "Her.Wedding.Photos"), so either the release year has to agree too, or the
+        # prefix has to cover enough of the title
+        min_tokens = 1
+        if not candidate_years:
+            num_title_tokens = next(
+                (
+                    idx
+                    for idx, token in enumerate(name_tokens[1:], start=1)
+                    if YEAR_TOKEN_REGEX.fullmatch(token)
+                    or RELEASE_TAG_REGEX.fullmatch(token)
+                ),
+                len(name_tokens),
+            )
+            min_tokens = max(1, min(num_title_tokens, TITLE_INDEX_MIN_YEARLESS_TOKENS))
+
+        match = None
+        for num_tokens in range(
+            min(len(name_tokens), TITLE_INDEX_MAX_PREFIX_TOKENS), min_tokens - 1, -1
+        ):
+            match = title_index.lookup(
+                " ".join(name_tokens[:num_tokens]), candidate_years, fuzzy=False
+            )
+            if match and (not candidate_years or match[1] in candidate_years):
+                break
+
+            match = None
+
+        if not match and self.name and candidate_years:
+            match = title_index.lookup(
+                self.name, candidate_years, min_score=TITLE_INDEX_MIN_CORRECTION_SCORE
+            )
+            if match and match[1] not in candidate_years:
+                match = None
+
+        if not match:
+            events.emit("title_index_miss", file_name=file_name)
+
+            return self.metadata_found
+
+        if match != (self.name, self.release_year):
+            events.emit(
+                "title_index_corrected",
+                old_name=self.name,
+                name=match[0],
+                old_release_year=self.release_year,
+                release_year=match[1],
+            )
+
+        self.name, self.release_year = match
+        self.metadata_found = True
+
+        return True
+
+    def import_metadata_from_file(self, file_path: str, filesystem=None) -> None:
         """
         Read in given file and process data into metadata values
+
+        The file is read through the given filesystem backend, if any (e.g. a virtual one during replays).
         """
 
         logger.debug("metadata file found @ %s - importing data", file_path)
 
-        with open(file_path, mode="r", encoding="utf-8") as metadata_file:
-            imported_metadata = json.load(metadata_file)
+        if filesystem:
+            imported_metadata = json.loads(filesystem.read_text(file_path))
+        else:
+            with open(file_path, mode="r", encoding="utf-8") as metadata_file:
+                imported_metadata = json.load(metadata_file)
 
         logger.debug("data imported as: %s", imported_metadata)
 
@@ -123,3 +218,5 @@ class Metadata:
             logger.error(
                 'data missing in metadata file; "%s" field was not found', e.args[0]
             )
+        else:
+            self.metadata_found = True
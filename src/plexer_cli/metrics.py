@@ -0,0 +1,429 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Metrics - run metrics, exported in the Prometheus text format
+"""
+
+import math
+import os
+import threading
+import time
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logzero import logger
+
+from .const import METRICS_LATENCY_BUCKETS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_value(value) -> str:
+    """
+    Format a sample value the way the Prometheus text format expects it
+    """
+
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+
+        return repr(value)
+
+    return str(value)
+
+
+def format_labels(label_names: tuple, label_values: tuple) -> str:
+    """
+    Format the given labels as a Prometheus label set, e.g. {type="directory"}
+    """
+
+    if not label_names:
+        return ""
+
+    escaped_values = (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in label_values
+    )
+
+    return (
+        "{"
+        + ",".join(
+            f'{name}="{value}"' for name, value in zip(label_names, escaped_values)
+        )
+        + "}"
+    )
+
+
+class Metric:
+    """
+    Base class for metrics: a named set of samples, one per combination of label values
+    """
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, description: str, labels=()) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _get_label_values(self, labels: dict) -> tuple:
+        if len(labels) != len(self.label_names) or not all(
+            label_name in labels for label_name in self.label_names
+        ):
+            raise ValueError(
+                f"metric {self.name} expects labels {self.label_names}, got {tuple(labels)}"
+            )
+
+        return tuple(labels[label_name] for label_name in self.label_names)
+
+    def reset(self) -> None:
+        """
+        Drop all samples
+        """
+
+        with self._lock:
+            self._values.clear()
+
+    def render_samples(self) -> list:
+        """
+        Generate the sample lines of the metric
+        """
+
+        with self._lock:
+            values = sorted(self._values.items())
+
+        return [
+            f"{self.name}{format_labels(self.label_names, label_values)} {format_value(value)}"
+            for label_values, value in values
+        ]
+
+    def render(self) -> str:
+        """
+        Render the metric in the Prometheus text format
+        """
+
+        return "\n".join(
+            [
+                f"# HELP {self.name} {self.description}",
+                f"# TYPE {self.name} {self.metric_type}",
+                *self.render_samples(),
+            ]
+        )
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing count, e.g. of artifacts processed
+    """
+
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels) -> None:
+        """
+        Increase the counter by the given amount
+        """
+
+        label_values = (
+            self._get_label_values(labels) if labels or self.label_names else ()
+        )
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, **labels):
+        """
+        Fetch the current value of the counter
+        """
+
+        with self._lock:
+            return self._values.get(self._get_label_values(labels), 0)
+
+    def get_total(self):
+        """
+        Fetch the sum of the counter's values across all labels
+        """
+
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down, e.g. the duration of the last run
+    """
+
+    metric_type = "gauge"
+
+    def set(self, value, **labels) -> None:
+        """
+        Set the gauge to the given value
+        """
+
+        label_values = self._get_label_values(labels)
+        with self._lock:
+            self._values[label_values] = value
+
+    def get(self, **labels):
+        """
+        Fetch the current value of the gauge
+        """
+
+        with self._lock:
+            return self._values.get(self._get_label_values(labels), 0)
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values (e.g. latencies) over a fixed set of buckets
+
+    Observations are counted in their own bucket only; buckets are made cumulative when rendered, which keeps
+    `observe()` to a bisect and a few additions.
+    """
+
+    metric_type = "histogram"
+
+    def __init__(
+        self, name: str, description: str, labels=(), buckets=METRICS_LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, description, labels)
+
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Record a single observation
+        """
+
+        label_values = self._get_label_values(labels)
+        bucket_idx = bisect_left(self.buckets, value)
+
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                # per-bucket counts (plus +Inf), sum, count
+                state = self._values[label_values] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                    0,
+                ]
+
+            state[0][bucket_idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the duration of the wrapped block, in seconds
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get_count(self, **labels) -> int:
+        """
+        Fetch the number of observations recorded
+        """
+
+        with self._lock:
+            state = self._values.get(self._get_label_values(labels))
+
+        return state[2] if state else 0
+
+    def render_samples(self) -> list:
+        with self._lock:
+            values = sorted(
+                (label_values, (list(state[0]), state[1], state[2]))
+                for label_values, state in self._values.items()
+            )
+
+        lines = []
+        for label_values, (bucket_counts, total, count) in values:
+            cumulative_count = 0
+            for bucket, bucket_count in zip((*self.buckets, math.inf), bucket_counts):
+                cumulative_count += bucket_count
+                bucket_labels = format_labels(
+                    (*self.label_names, "le"),
+                    (*label_values, format_value(float(bucket))),
+                )
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative_count}")
+
+            label_set = format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{label_set} {format_value(total)}")
+            lines.append(f"{self.name}_count{label_set} {count}")
+
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics that are exported together
+    """
+
+    def __init__(self) -> None:
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Add the given metric to the registry
+        """
+
+        if metric.name in self.metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+
+        self.metrics[metric.name] = metric
+
+        return metric
+
+    def counter(self, name: str, description: str, labels=()) -> Counter:
+        """
+        Create and register a counter
+        """
+
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels=()) -> Gauge:
+        """
+        Create and register a gauge
+        """
+
+        return self.register(Gauge(name, description, labels))
+
+    def histogram(
+        self, name: str, description: str, labels=(), buckets=METRICS_LATENCY_BUCKETS
+    ) -> Histogram:
+        """
+        Create and register a histogram
+        """
+
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text format
+        """
+
+        return "".join(f"{metric.render()}\n" for metric in self.metrics.values())
+
+    def write_textfile(self, file_path: str) -> None:
+        """
+        Write all metrics to the given file, for node_exporter's textfile collector
+
+        The file is replaced atomically so the collector never reads a partially written file.
+        """
+
+        tmp_file_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_file_path, mode="w", encoding="utf-8") as metrics_file:
+            metrics_file.write(self.render())
+        os.replace(tmp_file_path, file_path)
+
+        logger.debug("metrics written to %s", file_path)
+
+
+class MetricsServer:
+    """
+    Tiny HTTP server exposing a registry's metrics at /metrics, for scraping during long runs
+    """
+
+    def __init__(self, registry: MetricsRegistry, host="127.0.0.1", port=0) -> None:
+        class MetricsHandler(BaseHTTPRequestHandler):
+            """
+            Serve the rendered registry
+            """
+
+            def do_GET(self):
+                """Handle metrics requests"""
+
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+
+                    return
+
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("metrics request: " + format, *args)
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        """Port the server is listening on"""
+
+        return self.server.server_address[1]
+
+    def start(self) -> None:
+        """
+        Start serving metrics in the background
+        """
+
+        self._thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.1},
+            name="plexer-metrics",
+            daemon=True,
+        )
+        self._thread.start()
+
+        logger.info(
+            "serving metrics @ http://%s:%d/metrics", *self.server.server_address[:2]
+        )
+
+    def close(self) -> None:
+        """
+        Stop serving metrics
+        """
+
+        if self._thread:
+            self.server.shutdown()
+            self._thread.join()
+            self._thread = None
+
+        self.server.server_close()
+
+
+REGISTRY = MetricsRegistry()
+
+ARTIFACTS_PROCESSED = REGISTRY.counter(
+    "plexer_artifacts_processed_total",
+    "Artifacts processed, by type (directory, or the top-level MIME type of files)",
+    labels=("type",),
+)
+MAGIC_CALLS = REGISTRY.counter(
+    "plexer_libmagic_calls_total", "Files classified via libmagic"
+)
+HEURISTIC_RESULTS = REGISTRY.counter(
+    "plexer_heuristic_results_total",
+    "Heuristic analysis attempts on directory names, by result (hit or miss)",
+    labels=("result",),
+)
+RENAMES = REGISTRY.counter(
+    "plexer_renames_total", "Artifacts renamed or moved into place"
+)
+RENAME_DURATION = REGISTRY.histogram(
+    "plexer_rename_duration_seconds",
+    "Time taken per rename/move operation, including copies across filesystems",
+)
+PROMPTS = REGISTRY.counter("plexer_prompts_total", "User prompts shown")
+RUN_DURATION = REGISTRY.gauge(
+    "plexer_run_duration_seconds", "Duration of the run, in seconds"
+)
+RUN_SUCCESS = REGISTRY.gauge(
+    "plexer_run_success", "Whether the run completed successfully (1) or not (0)"
+)
+RUN_END_TIME = REGISTRY.gauge(
+    "plexer_run_end_timestamp_seconds", "Unix time the run ended at"
+)
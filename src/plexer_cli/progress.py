@@ -0,0 +1,230 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Progress - live progress display with rates and ETA
+"""
+
+import sys
+import threading
+import time
+
+from contextlib import contextmanager
+
+from .const import PROGRESS_REFRESH_INTERVAL, PROGRESS_RATE_WINDOW
+
+COUNTERS = ("scanned", "classified", "processed", "renamed", "skipped", "prompted")
+
+
+def format_duration(seconds: float) -> str:
+    """
+    Format the given number of seconds as H:MM:SS
+    """
+
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class ProgressReporter:
+    """
+    Track run counters and redraw a single status line from a side thread
+
+    Counters are bumped from the processing (and I/O worker) threads, which is all they pay for; the line is drawn
+    at most once per `refresh_interval` by the side thread. The processing rate is measured over a sliding window
+    of recent samples, and the ETA is based on artifacts scanned but not processed yet, so it firms up as the tree
+    is discovered. Drawing is paused while anything else needs the terminal, e.g. prompts and log output.
+    """
+
+    enabled = False
+
+    def __init__(
+        self, enabled=True, stream=None, refresh_interval=PROGRESS_REFRESH_INTERVAL
+    ) -> None:
+        self.enabled = enabled
+        # resolved on draw when not given, so redirecting stderr later on still works
+        self.stream = stream
+        self.refresh_interval = refresh_interval
+
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.start_time = time.monotonic()
+
+        self._lock = threading.Lock()
+        self._pause_depth = 0
+        self._line_drawn = False
+        # (timestamp, processed count) samples for the rate calculation
+        self._samples = [(self.start_time, 0)]
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def increment(self, counter: str, amount=1) -> None:
+        """
+        Bump the given counter
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self.counters[counter] += amount
+
+    def calculate_rate(self) -> float:
+        """
+        Calculate the number of artifacts processed per second over the recent sample window
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, self.counters["processed"]))
+            while (
+                len(self._samples) > 2
+                and self._samples[0][0] < now - PROGRESS_RATE_WINDOW
+            ):
+                self._samples.pop(0)
+
+            (first_time, first_count), (last_time, last_count) = (
+                self._samples[0],
+                self._samples[-1],
+            )
+
+        if last_time <= first_time:
+            return 0.0
+
+        return (last_count - first_count) / (last_time - first_time)
+
+    def generate_status_line(self) -> str:
+        """
+        Generate the status line for the current counters
+        """
+
+        rate = self.calculate_rate()
+        with self._lock:
+            counters = dict(self.counters)
+
+        remaining = max(counters["scanned"] - counters["processed"], 0)
+        eta = format_duration(remaining / rate) if rate else "--:--:--"
+
+        return (
+            f"scanned {counters['scanned']} | classified {counters['classified']} | "
+            f"renamed {counters['renamed']} | skipped {counters['skipped']} | prompted {counters['prompted']} | "
+            f"{rate:.1f} artifacts/s | elapsed {format_duration(time.monotonic() - self.start_time)} | ETA {eta}"
+        )
+
+    def draw(self) -> None:
+        """
+        Redraw the status line, unless drawing is paused
+        """
+
+        status_line = self.generate_status_line()
+        with self._lock:
+            if self._pause_depth:
+                return
+
+            stream = self.stream if self.stream else sys.stderr
+            stream.write(f"\r{status_line}\x1b[K")
+            stream.flush()
+            self._line_drawn = True
+
+    def _clear_line(self) -> None:
+        if self._line_drawn:
+            stream = self.stream if self.stream else sys.stderr
+            stream.write("\r\x1b[K")
+            stream.flush()
+            self._line_drawn = False
+
+    @contextmanager
+    def paused(self):
+        """
+        Clear the status line and hold off redraws for the duration of the wrapped block
+        """
+
+        with self._lock:
+            self._pause_depth += 1
+            self._clear_line()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pause_depth -= 1
+
+    def _redraw(self) -> None:
+        while not self._stop_event.wait(self.refresh_interval):
+            self.draw()
+
+    def start(self) -> None:
+        """
+        Start redrawing the status line in the background
+        """
+
+        if not self.enabled or self._thread:
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._redraw, name="plexer-progress", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop redrawing the status line and leave the final status on screen
+        """
+
+        if not self._thread:
+            return
+
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+        self.draw()
+        with self._lock:
+            if self._line_drawn:
+                stream = self.stream if self.stream else sys.stderr
+                stream.write("\n")
+                stream.flush()
+                self._line_drawn = False
+
+
+_reporter = ProgressReporter(enabled=False)
+
+
+def configure(
+    enabled=True, stream=None, refresh_interval=PROGRESS_REFRESH_INTERVAL
+) -> ProgressReporter:
+    """
+    Replace the shared progress reporter with one using the given settings
+    """
+
+    global _reporter
+
+    _reporter.stop()
+    _reporter = ProgressReporter(
+        enabled=enabled, stream=stream, refresh_interval=refresh_interval
+    )
+
+    return _reporter
+
+
+def get_reporter() -> ProgressReporter:
+    """
+    Fetch the shared progress reporter
+    """
+
+    return _reporter
+
+
+def increment(counter: str, amount=1) -> None:
+    """
+    Bump the given counter on the shared progress reporter
+    """
+
+    _reporter.increment(counter, amount)
+
+
+def paused():
+    """
+    Pause the shared progress reporter for the duration of the wrapped block
+    """
+
+    return _reporter.paused()
@@ -0,0 +1,525 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Provider - pluggable sources of metadata, e.g. HTTP lookup services
+"""
+
+import asyncio
+import json
+import os
+import ssl
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from logzero import logger
+
+from .const import (
+    PROVIDER_CACHE_FORMAT_VERSION,
+    PROVIDER_CACHE_TTL,
+    PROVIDER_MAX_CONNECTIONS,
+    PROVIDER_RATE_LIMIT,
+    PROVIDER_REQUEST_TIMEOUT,
+)
+from .metadata import Metadata
+from .title_index import normalize_title
+
+
+class MetadataProvider(ABC):
+    """
+    Base class for metadata providers
+
+    Providers implement `lookup()` as a coroutine, which is always run on the resolver's event loop, so it can
+    keep state (connections, etc) bound to that loop between calls.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def lookup(self, name: str, release_year=None):
+        """
+        Look up metadata for the given name and (optional) release year
+
+        Returns a dict containing `name` and `release_year`, or None if the provider doesn't know the title.
+        """
+
+    async def close(self) -> None:
+        """
+        Release any resources held by the provider
+        """
+
+
+class RateLimiter:
+    """
+    Token bucket limiting how many operations can be started per second
+
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst=1) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._lock = None
+
+    async def acquire(self) -> None:
+        """
+        Wait until an operation is allowed to start
+        """
+
+        if not self.rate:
+            return
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last_refill) * self.rate
+                )
+                self._last_refill = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class HTTPConnectionPool:
+    """
+    Minimal asyncio HTTP/1.1 client keeping a pool of keep-alive connections to a single server
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        use_tls=False,
+        max_connections=PROVIDER_MAX_CONNECTIONS,
+        timeout=PROVIDER_REQUEST_TIMEOUT,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        self.num_connections_opened = 0
+        self._idle_connections = []
+        self._semaphore = None
+
+    async def _connect(self) -> tuple:
+        self.num_connections_opened += 1
+
+        return await asyncio.open_connection(
+            self.host,
+            self.port,
+            ssl=ssl.create_default_context() if self.use_tls else None,
+        )
+
+    async def _read_body(self, reader, headers: dict) -> bytes:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                chunk_size = int((await reader.readline()).split(b";")[0], 16)
+                if not chunk_size:
+                    # skip any trailers
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+
+                    return bytes(body)
+
+                body += await reader.readexactly(chunk_size)
+                await reader.readline()
+
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"]))
+
+        return await reader.read()
+
+    async def _send_request(self, connection: tuple, path: str) -> tuple:
+        reader, writer = connection
+
+        writer.write(
+            (
+                f"GET {path} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                "Accept: application/json\r\n"
+                "Connection: keep-alive\r\n"
+                "\r\n"
+            ).encode("ascii")
+        )
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        status_parts = status_line.split()
+        if len(status_parts) < 2 or not status_parts[1].isdigit():
+            raise ValueError(f"malformed HTTP status line: {status_line[:80]!r}")
+        status = int(status_parts[1])
+
+        headers = {}
+        while True:
+            header_line = await reader.readline()
+            if header_line in (b"\r\n", b"\n", b""):
+                break
+
+            header_name, _, header_value = header_line.decode("latin-1").partition(":")
+            headers[header_name.strip().lower()] = header_value.strip()
+
+        body = await self._read_body(reader, headers)
+        keep_alive = headers.get("connection", "").lower() != "close" and (
+            "content-length" in headers or "transfer-encoding" in headers
+        )
+
+        return status, body, keep_alive
+
+    async def get(self, path: str) -> tuple:
+        """
+        Send a GET request for the given path, reusing an idle connection if possible
+
+        Returns the response status and body.
+        """
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+
+        async with self._semaphore:
+            while True:
+                reused = bool(self._idle_connections)
+                connection = (
+                    self._idle_connections.pop() if reused else await self._connect()
+                )
+
+                try:
+                    status, body, keep_alive = await asyncio.wait_for(
+                        self._send_request(connection, path), self.timeout
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    connection[1].close()
+                    if reused:
+                        # the server probably closed the idle connection on its end; try
+                        # the next one
+                        continue
+
+                    raise
+                except BaseException:
+                    connection[1].close()
+                    raise
+
+                break
+
+            if keep_alive:
+                self._idle_connections.append(connection)
+            else:
+                connection[1].close()
+
+        return status, body
+
+    async def close(self) -> None:
+        """
+        Close all idle connections
+        """
+
+        while self._idle_connections:
+            _, writer = self._idle_connections.pop()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+class HTTPMetadataProvider(MetadataProvider):
+    """
+    Metadata provider backed by an HTTP lookup service
+
+    Titles are looked up via `GET <url>?name=<name>&year=<release year>`, along with any query parameters of the
+    given URL (e.g. an API key). The service is expected to respond with a JSON object containing `name` and
+    `release_year`, or a 404 if the title isn't known.
+    """
+
+    name = "http"
+
+    def __init__(
+        self,
+        url: str,
+        max_connections=PROVIDER_MAX_CONNECTIONS,
+        rate_limit=PROVIDER_RATE_LIMIT,
+        timeout=PROVIDER_REQUEST_TIMEOUT,
+    ) -> None:
+        parsed_url = urlsplit(url)
+        if parsed_url.scheme not in ("http", "https") or not parsed_url.hostname:
+            raise ValueError(f"invalid metadata provider URL: {url}")
+
+        # the query may hold credentials (e.g. an API key), so it's left out of the name
+        # used in logs
+        self.name = f"http:{parsed_url.scheme}://{parsed_url.hostname}{parsed_url.path}"
+        self.path = parsed_url.path if parsed_url.path else "/"
+        # query parameters of the URL are sent along with every lookup
+        self.query = parse_qsl(parsed_url.query, keep_blank_values=True)
+        self.pool = HTTPConnectionPool(
+            host=parsed_url.hostname,
+            port=parsed_url.port
+            if parsed_url.port
+            else (443 if parsed_url.scheme == "https" else 80),
+            use_tls=parsed_url.scheme == "https",
+            max_connections=max_connections,
+            timeout=timeout,
+        )
+        self.rate_limiter = RateLimiter(rate=rate_limit, burst=max_connections)
+
+    async def lookup(self, name: str, release_year=None):
+        query = [*self.query, ("name", name)]
+        if release_year:
+            query.append(("year", release_year))
+
+        await self.rate_limiter.acquire()
+        status, body = await self.pool.get(f"{self.path}?{urlencode(query)}")
+
+        if status == 404:
+            return None
+        if status != 200:
+            raise ConnectionError(f"metadata provider returned HTTP {status}")
+
+        response_data = json.loads(body)
+        if not isinstance(response_data, dict):
+            raise ValueError("metadata provider response is not a JSON object")
+
+        name, release_year = (
+            response_data.get("name"),
+            response_data.get("release_year"),
+        )
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("metadata provider response has no name")
+        # int() would also take floats and booleans
+        if not isinstance(release_year, (int, str)) or isinstance(release_year, bool):
+            raise ValueError("metadata provider response has no release year")
+
+        return {"name": name, "release_year": int(release_year)}
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+
+class ProviderCache:
+    """
+    On-disk cache of provider responses, with entries expiring after a fixed TTL
+
+    Misses are cached as well so unknown titles aren't looked up again on every run. A read-only cache (e.g. for
+    dry runs) is loaded and used as usual, but never written back to disk.
+    """
+
+    file_path = ""
+
+    def __init__(self, file_path="", ttl=PROVIDER_CACHE_TTL, read_only=False) -> None:
+        self.file_path = file_path
+        self.ttl = ttl
+        self.read_only = read_only
+        self.entries = {}
+
+    def load(self) -> None:
+        """
+        Read in cached responses, dropping any that have expired
+        """
+
+        if not self.file_path:
+            return
+
+        try:
+            with open(self.file_path, mode="r", encoding="utf-8") as cache_file:
+                cache_data = json.load(cache_file)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError:
+            logger.warning(
+                "metadata provider cache @ %s is corrupt; ignoring it", self.file_path
+            )
+
+            return
+
+        if cache_data.get("version") != PROVIDER_CACHE_FORMAT_VERSION:
+            return
+
+        now = time.time()
+        self.entries = {
+            key: entry
+            for key, entry in cache_data.get("entries", {}).items()
+            if entry[0] > now
+        }
+
+        logger.debug(
+            "loaded %d cached metadata provider response(s)", len(self.entries)
+        )
+
+    def save(self) -> None:
+        """
+        Write the cached responses to disk
+        """
+
+        if not self.file_path or self.read_only:
+            return
+
+        cache_dir = os.path.dirname(self.file_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        tmp_file_path = f"{self.file_path}.tmp"
+        with open(tmp_file_path, mode="w", encoding="utf-8") as cache_file:
+            json.dump(
+                {"version": PROVIDER_CACHE_FORMAT_VERSION, "entries": self.entries},
+                cache_file,
+            )
+        os.replace(tmp_file_path, self.file_path)
+
+    def get(self, key: str) -> tuple:
+        """
+        Return a (hit, value) pair for the given key
+        """
+
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            return False, None
+
+        return True, entry[1]
+
+    def set(self, key: str, value) -> None:
+        self.entries[key] = (time.time() + self.ttl, value)
+
+
+class ProviderResolver:
+    """
+    Resolve metadata for batches of artifacts using a chain of providers
+
+    Lookups run concurrently on an event loop owned by a background thread, so provider connections stay open
+    between batches. Duplicate lookups are coalesced (within a batch and across in-flight batches), and results
+    are cached on disk. Providers are queried in order; the first one that knows a title wins.
+    """
+
+    def __init__(self, providers: list, cache=None) -> None:
+        self.providers = providers
+        self.cache = cache if cache else ProviderCache()
+
+        self._loop = None
+        self._thread = None
+        self._in_flight = {}
+
+    @staticmethod
+    def generate_key(name: str, release_year=None) -> str:
+        return f"{normalize_title(name)}|{release_year if release_year else ''}"
+
+    def start(self) -> None:
+        """
+        Start the event loop used to run lookups
+        """
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="plexer-provider-loop", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Close all providers, stop the event loop, and save the cache
+        """
+
+        if self._loop:
+
+            async def close_providers():
+                for provider in self.providers:
+                    await provider.close()
+
+            asyncio.run_coroutine_threadsafe(close_providers(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+
+        self.cache.save()
+
+    async def _lookup(self, key: str, name: str, release_year):
+        failed = False
+        for provider in self.providers:
+            try:
+                result = await provider.lookup(name, release_year)
+            except (
+                OSError,
+                asyncio.TimeoutError,
+                asyncio.IncompleteReadError,
+                KeyError,
+                ValueError,
+            ) as e:
+                logger.warning(
+                    "metadata lookup failed via %s for %s: %s", provider.name, name, e
+                )
+                failed = True
+
+                continue
+
+            if result:
+                self.cache.set(key, result)
+
+                return result
+
+        # don't cache misses that may be down to a failure, which may be temporary
+        if not failed:
+            self.cache.set(key, None)
+
+        return None
+
+    def _resolve(self, key: str, name: str, release_year):
+        hit, result = self.cache.get(key)
+        if hit:
+            future = self._loop.create_future()
+            future.set_result(result)
+
+            return future
+
+        if key not in self._in_flight:
+            task = self._loop.create_task(self._lookup(key, name, release_year))
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self._in_flight[key] = task
+
+        return self._in_flight[key]
+
+    async def _resolve_many(self, queries: list) -> list:
+        return await asyncio.gather(
+            *(
+                self._resolve(self.generate_key(name, release_year), name, release_year)
+                for name, release_year in queries
+            )
+        )
+
+    def resolve_many(self, queries: list) -> dict:
+        """
+        Resolve metadata for the given (name, release year) pairs
+
+        Returns a dict mapping each query to a Metadata object, or None if no provider knew the title.
+        """
+
+        if not self._loop:
+            self.start()
+
+        results = asyncio.run_coroutine_threadsafe(
+            self._resolve_many(queries), self._loop
+        ).result()
+
+        resolved_metadata = {}
+        for query, result in zip(queries, results):
+            if result:
+                resolved_metadata[query] = Metadata(
+                    name=result["name"], release_year=result["release_year"]
+                )
+                resolved_metadata[query].metadata_found = True
+            else:
+                resolved_metadata[query] = None
+
+        return resolved_metadata
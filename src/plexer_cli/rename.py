@@ -0,0 +1,225 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Rename - atomic, no-clobber renames and the plan recording their outcomes
+"""
+
+import ctypes
+import errno
+import os
+import threading
+
+from collections import Counter, OrderedDict
+from logzero import logger
+
+from .const import RENAME_MAX_OPEN_DIRS
+
+# from linux/fs.h
+RENAME_NOREPLACE = 1
+# errors meaning renameat2() or the flag isn't supported, e.g. by an older kernel or a
+# network filesystem
+UNSUPPORTED_ERRNOS = {errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP}
+
+
+def _load_renameat2():
+    """
+    Look up renameat2() in the C library (glibc 2.28+), returning None if it's not available
+    """
+
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        renameat2 = libc.renameat2
+    except (AttributeError, OSError, TypeError):
+        return None
+
+    renameat2.argtypes = [
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_uint,
+    ]
+    renameat2.restype = ctypes.c_int
+
+    return renameat2
+
+
+_renameat2 = _load_renameat2()
+
+
+class RenameExecutor:
+    """
+    Rename files and directories without ever replacing an existing destination
+
+    On Linux, each rename is a single renameat2() call with RENAME_NOREPLACE, which fails atomically if the
+    destination exists; no stat() beforehand, and no window for another process to create the destination in
+    between. Paths are resolved relative to file descriptors of their parent directories, which are kept open (up
+    to `max_open_dirs`, least recently used first out) so sibling renames share a single lookup of their parent.
+    Where renameat2() isn't available or supported by the filesystem, the executor falls back to checking for the
+    destination before renaming, which is not atomic.
+    """
+
+    def __init__(self, max_open_dirs=RENAME_MAX_OPEN_DIRS) -> None:
+        self.max_open_dirs = max_open_dirs
+        self.atomic = _renameat2 is not None
+
+        # dir path -> fd
+        self._dir_fds = OrderedDict()
+        # ancestors of the dirs held open -> number of held dirs below them, so renames
+        # of anything else don't have to check every held path
+        self._held_ancestors = Counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def generate_ancestors(dir_path: str) -> list:
+        """
+        List all ancestors of the given directory, closest first
+        """
+
+        ancestors = []
+        parent_dir = os.path.dirname(dir_path)
+        while parent_dir != dir_path:
+            ancestors.append(parent_dir)
+            dir_path, parent_dir = parent_dir, os.path.dirname(parent_dir)
+
+        return ancestors
+
+    def _close_dir_fd(self, dir_path: str, dir_fd: int) -> None:
+        os.close(dir_fd)
+        self._held_ancestors.subtract(self.generate_ancestors(dir_path))
+
+    def get_dir_fd(self, dir_path: str) -> int:
+        """
+        Fetch an open file descriptor of the given directory, opening it if needed
+
+        Must be called with the lock held.
+        """
+
+        dir_fd = self._dir_fds.get(dir_path)
+        if dir_fd is not None:
+            self._dir_fds.move_to_end(dir_path)
+
+            return dir_fd
+
+        dir_fd = os.open(dir_path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+        self._dir_fds[dir_path] = dir_fd
+        self._held_ancestors.update(self.generate_ancestors(dir_path))
+        if len(self._dir_fds) > self.max_open_dirs:
+            self._close_dir_fd(*self._dir_fds.popitem(last=False))
+
+        return dir_fd
+
+    def forget_dir(self, dir_path: str) -> None:
+        """
+        Close the file descriptors held for the given directory and anything below it, e.g. after it's been renamed
+
+        Must be called with the lock held.
+        """
+
+        if dir_path in self._dir_fds:
+            self._close_dir_fd(dir_path, self._dir_fds.pop(dir_path))
+        if self._held_ancestors[dir_path] <= 0:
+            return
+
+        for held_dir_path in list(self._dir_fds):
+            if held_dir_path.startswith(dir_path + os.sep):
+                self._close_dir_fd(held_dir_path, self._dir_fds.pop(held_dir_path))
+
+    def _rename_fallback(
+        self, src_dir_fd: int, src_name: str, dst_dir_fd: int, dst_name: str
+    ) -> None:
+        try:
+            os.stat(dst_name, dir_fd=dst_dir_fd, follow_symlinks=False)
+        except FileNotFoundError:
+            os.rename(src_name, dst_name, src_dir_fd=src_dir_fd, dst_dir_fd=dst_dir_fd)
+        else:
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), dst_name)
+
+    def rename(self, src_path: str, dst_path: str) -> None:
+        """
+        Rename the given file or directory
+
+        Raises FileExistsError, without changing anything, if the destination already exists.
+        """
+
+        src_path, dst_path = os.path.abspath(src_path), os.path.abspath(dst_path)
+        src_dir, src_name = os.path.split(src_path)
+        dst_dir, dst_name = os.path.split(dst_path)
+
+        with self._lock:
+            src_dir_fd = self.get_dir_fd(src_dir)
+            dst_dir_fd = self.get_dir_fd(dst_dir)
+
+            if self.atomic:
+                if (
+                    _renameat2(
+                        src_dir_fd,
+                        os.fsencode(src_name),
+                        dst_dir_fd,
+                        os.fsencode(dst_name),
+                        RENAME_NOREPLACE,
+                    )
+                    == 0
+                ):
+                    self.forget_dir(src_path)
+
+                    return
+
+                rename_errno = ctypes.get_errno()
+                if rename_errno == errno.EEXIST:
+                    raise FileExistsError(
+                        rename_errno, os.strerror(rename_errno), dst_path
+                    )
+                if rename_errno not in UNSUPPORTED_ERRNOS:
+                    raise OSError(rename_errno, os.strerror(rename_errno), src_path)
+
+                logger.info(
+                    "atomic no-clobber renames aren't supported here; falling back to checking destinations first"
+                )
+                self.atomic = False
+
+            self._rename_fallback(src_dir_fd, src_name, dst_dir_fd, dst_name)
+            self.forget_dir(src_path)
+
+    def close(self) -> None:
+        """
+        Close all directory file descriptors held open
+        """
+
+        with self._lock:
+            while self._dir_fds:
+                os.close(self._dir_fds.popitem()[1])
+            self._held_ancestors.clear()
+
+
+class RenamePlan:
+    """
+    Record of every rename attempted during a run and its outcome
+
+    Collisions (destinations that already exist) are recorded here rather than raised, so one collision doesn't
+    stop the walk; they're reported once the run is done.
+    """
+
+    def __init__(self) -> None:
+        # (src path, dst path, status) tuples
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def add(self, src_path: str, dst_path: str, status: str) -> None:
+        """
+        Record the outcome of a rename: renamed, dry_run or collision
+        """
+
+        with self._lock:
+            self.entries.append((src_path, dst_path, status))
+
+    @property
+    def collisions(self) -> list:
+        """Renames that were skipped because their destination already existed"""
+
+        with self._lock:
+            return [
+                (src_path, dst_path)
+                for src_path, dst_path, status in self.entries
+                if status == "collision"
+            ]
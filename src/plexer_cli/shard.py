@@ -0,0 +1,355 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Shard - split a library across multiple workers/hosts using consistent hashing and lease files
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from bisect import bisect
+from hashlib import blake2b
+from logzero import logger
+
+from .const import LEASE_FILE_EXTENSION, LEASE_TTL, SHARD_VIRTUAL_NODES
+
+
+def hash_name(name: str) -> int:
+    """
+    Generate the 64-bit ring position of the given name
+    """
+
+    return int.from_bytes(blake2b(name.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def generate_owner_id() -> str:
+    """
+    Generate an ID unique to this process, used to mark lease ownership
+    """
+
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping artifact names to shards
+
+    Each shard is placed on the ring multiple times (virtual nodes) so that names are spread evenly, and changing the
+    shard count only moves roughly 1/N of the names to a different shard.
+    """
+
+    def __init__(self, num_shards: int, virtual_nodes=SHARD_VIRTUAL_NODES) -> None:
+        if num_shards < 1:
+            raise ValueError("number of shards must be at least 1")
+
+        self.num_shards = num_shards
+
+        ring = sorted(
+            (hash_name(f"shard-{shard}-{vnode}"), shard)
+            for shard in range(num_shards)
+            for vnode in range(virtual_nodes)
+        )
+        self._positions = [position for position, _ in ring]
+        self._shards = [shard for _, shard in ring]
+
+    def get_shard(self, name: str) -> int:
+        """
+        Find the shard responsible for the given name: the first shard found clockwise of the name's ring position
+        """
+
+        idx = bisect(self._positions, hash_name(name))
+
+        return self._shards[idx % len(self._shards)]
+
+
+class LeaseManager:
+    """
+    Take, renew, and release lease files that give a single worker exclusive ownership of a subtree for a while
+
+    Lease files are created exclusively (O_EXCL), so only one worker can hold a given lease. Leases expire after `ttl`
+    seconds unless renewed, which lets other workers take over subtrees abandoned by crashed workers. Held leases are
+    renewed in the background once `start()` is called.
+
+    Expiry is based on wall clock time, so hosts sharing a lease directory need reasonably synced clocks.
+    """
+
+    lease_dir = ""
+
+    def __init__(self, lease_dir: str, owner="", ttl=LEASE_TTL) -> None:
+        self.lease_dir = lease_dir
+        self.owner = owner if owner else generate_owner_id()
+        self.ttl = ttl
+
+        self.held_leases = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def generate_lease_path(self, path: str) -> str:
+        """
+        Generate the path of the lease file for the given subtree path
+        """
+
+        return os.path.join(
+            self.lease_dir,
+            f"{blake2b(path.encode('utf-8'), digest_size=16).hexdigest()}{LEASE_FILE_EXTENSION}",
+        )
+
+    def read_lease(self, lease_path: str):
+        """
+        Read the lease file at the given path
+
+        Returns the lease data, or None if the lease file doesn't exist (or is still being written).
+        """
+
+        try:
+            with open(lease_path, mode="r", encoding="utf-8") as lease_file:
+                return json.load(lease_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_lease(self, lease_path: str, path: str, exclusive: bool) -> bool:
+        lease_data = json.dumps(
+            {"owner": self.owner, "path": path, "expires": time.time() + self.ttl}
+        )
+
+        if exclusive:
+            try:
+                lease_fd = os.open(
+                    lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644
+                )
+            except FileExistsError:
+                return False
+
+            with os.fdopen(lease_fd, mode="w", encoding="utf-8") as lease_file:
+                lease_file.write(lease_data)
+        else:
+            tmp_lease_path = f"{lease_path}.{self.owner.replace(':', '_')}.tmp"
+            with open(tmp_lease_path, mode="w", encoding="utf-8") as lease_file:
+                lease_file.write(lease_data)
+            os.replace(tmp_lease_path, lease_path)
+
+        return True
+
+    def _break_expired_lease(self, lease_path: str) -> None:
+        # a separate lock file makes sure only one worker breaks a given lease;
+        # otherwise a slow worker could delete the fresh lease a faster one just took
+        break_lock_path = f"{lease_path}.break"
+        try:
+            break_lock_fd = os.open(
+                break_lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644
+            )
+        except FileExistsError:
+            try:
+                if os.stat(break_lock_path).st_mtime < time.time() - self.ttl:
+                    # left behind by a worker that crashed mid-break
+                    os.remove(break_lock_path)
+            except FileNotFoundError:
+                pass
+
+            return
+
+        try:
+            lease_data = self.read_lease(lease_path)
+            if lease_data and lease_data["expires"] <= time.time():
+                logger.info(
+                    "breaking expired lease held by %s: %s",
+                    lease_data["owner"],
+                    lease_data["path"],
+                )
+                try:
+                    os.remove(lease_path)
+                except FileNotFoundError:
+                    pass
+        finally:
+            os.close(break_lock_fd)
+            os.remove(break_lock_path)
+
+    def acquire(self, path: str) -> bool:
+        """
+        Try to take the lease for the given subtree path
+
+        Returns True if the lease is now held by this worker, or False if another worker holds an unexpired lease.
+        """
+
+        lease_path = self.generate_lease_path(path)
+
+        with self._lock:
+            if path in self.held_leases:
+                return True
+
+        os.makedirs(self.lease_dir, exist_ok=True)
+
+        acquired = self._write_lease(lease_path, path, exclusive=True)
+        if not acquired:
+            lease_data = self.read_lease(lease_path)
+            if lease_data and lease_data["expires"] <= time.time():
+                self._break_expired_lease(lease_path)
+                acquired = self._write_lease(lease_path, path, exclusive=True)
+
+        if acquired:
+            with self._lock:
+                self.held_leases[path] = lease_path
+            logger.debug("lease acquired for %s", path)
+        else:
+            logger.debug("%s is leased by another worker", path)
+
+        return acquired
+
+    def renew(self) -> None:
+        """
+        Push back the expiry of all leases held by this worker
+
+        Leases that were broken by other workers in the meantime (e.g. after a long pause) are dropped.
+        """
+
+        with self._lock:
+            held_leases = list(self.held_leases.items())
+
+        for path, lease_path in held_leases:
+            lease_data = self.read_lease(lease_path)
+            if lease_data and lease_data["owner"] == self.owner:
+                self._write_lease(lease_path, path, exclusive=False)
+            else:
+                logger.warning("lease for %s was lost to another worker", path)
+                with self._lock:
+                    self.held_leases.pop(path, None)
+
+    def release(self, path: str) -> None:
+        """
+        Give up the lease for the given subtree path, if held
+        """
+
+        with self._lock:
+            lease_path = self.held_leases.pop(path, None)
+        if not lease_path:
+            return
+
+        lease_data = self.read_lease(lease_path)
+        if lease_data and lease_data["owner"] == self.owner:
+            try:
+                os.remove(lease_path)
+            except FileNotFoundError:
+                pass
+
+        logger.debug("lease released for %s", path)
+
+    def _renew_leases(self) -> None:
+        while not self._stop_event.wait(self.ttl / 3):
+            self.renew()
+
+    def start(self) -> None:
+        """
+        Start renewing held leases in the background
+        """
+
+        if self._thread:
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._renew_leases, name="plexer-lease-renewal", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop renewing leases in the background and release all held leases
+        """
+
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+        for path in list(self.held_leases):
+            self.release(path)
+
+
+class Shard:
+    """
+    A single worker's share of a library: the top-level artifacts that hash to its index, claimed via leases
+
+    Only artifacts directly inside the root directory are sharded; anything nested below them belongs to whichever
+    worker holds the lease on its top-level subtree.
+    """
+
+    root_dir = ""
+
+    def __init__(
+        self,
+        root_dir: str,
+        shard_index: int,
+        shard_count: int,
+        lease_manager: LeaseManager,
+    ) -> None:
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(
+                f"shard index must be between 0 and {shard_count - 1} (got {shard_index})"
+            )
+
+        self.root_dir = os.path.abspath(root_dir)
+        self.shard_index = shard_index
+        self.hash_ring = HashRing(num_shards=shard_count)
+        self.lease_manager = lease_manager
+
+    def owns(self, artifact_name: str) -> bool:
+        """
+        Check if the artifact with the given name is assigned to this shard
+        """
+
+        return self.hash_ring.get_shard(artifact_name) == self.shard_index
+
+    def is_assigned(self, artifact_path: str) -> bool:
+        """
+        Check if the subtree at the given path is assigned to this shard
+
+        Nested subtrees are always considered assigned, since their top-level subtree was already claimed.
+        """
+
+        artifact_path = os.path.abspath(artifact_path)
+        if os.path.dirname(artifact_path) != self.root_dir:
+            return True
+
+        if artifact_path == os.path.abspath(self.lease_manager.lease_dir):
+            return False
+
+        return self.owns(os.path.basename(artifact_path))
+
+    def claim(self, artifact_path: str) -> bool:
+        """
+        Try to claim the subtree at the given path for processing by this worker
+
+        Top-level subtrees are claimed if they're assigned to this shard and not leased by another worker. Nested
+        subtrees are always claimed.
+        """
+
+        artifact_path = os.path.abspath(artifact_path)
+        if os.path.dirname(artifact_path) != self.root_dir:
+            return True
+
+        if not self.is_assigned(artifact_path):
+            return False
+
+        if not self.lease_manager.acquire(artifact_path):
+            return False
+
+        # another worker may have finished (and renamed) the subtree between our
+        # directory listing and now
+        if not os.path.exists(artifact_path):
+            self.lease_manager.release(artifact_path)
+
+            return False
+
+        return True
+
+    def release(self, artifact_path: str) -> None:
+        """
+        Release the claim on the subtree at the given path once it's been processed
+        """
+
+        self.lease_manager.release(os.path.abspath(artifact_path))
@@ -0,0 +1,215 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Snapshot - capture a source tree once, then replay runs against it without touching the real files
+"""
+
+import gzip
+import json
+import os
+import time
+
+from logzero import logger
+
+from .concurrency import ConcurrencyController
+from .const import METADATA_FILE_NAME, SNAPSHOT_FORMAT_VERSION
+from .filesystem import VirtualDirEntry, get_mime_type
+
+
+class Snapshot:
+    """
+    Compact record of a source tree: the name, type, size, and MIME type of every entry, plus the contents of
+    metadata files, so replays pick up the same overrides as a live run
+
+    Entries are stored in breadth-first order, each referring to its parent directory by index rather than by full
+    path, and MIME types are stored once in a lookup table, which keeps snapshots of huge libraries small. Snapshots
+    are saved as gzipped JSON.
+    """
+
+    root_dir = ""
+
+    def __init__(
+        self, root_dir="", entries=None, captured_at=0.0, file_contents=None
+    ) -> None:
+        self.root_dir = root_dir
+        # (parent index, name, is dir, size, MIME type) tuples; entries directly in the
+        # root have a parent index of -1
+        self.entries = entries if entries else []
+        self.captured_at = captured_at
+        # entry index -> text of the file
+        self.file_contents = file_contents if file_contents else {}
+
+    @classmethod
+    def capture(cls, root_dir: str, io_controller=None):
+        """
+        Capture a snapshot of the tree at the given directory
+
+        Symlinked directories are recorded, but not descended into. Files are classified using libmagic, spread across
+        worker threads by the I/O controller. Metadata files that can't be read are recorded without their contents,
+        so they're ignored with a warning on replay, like a live run would.
+        """
+
+        io_controller = io_controller if io_controller else ConcurrencyController()
+        root_dir = os.path.abspath(root_dir)
+
+        entries = []
+        file_contents = {}
+        file_paths = []
+        file_entry_indexes = []
+        pending_dirs = [(root_dir, -1)]
+        while pending_dirs:
+            next_pending_dirs = []
+            for dir_path, dir_idx in pending_dirs:
+                with os.scandir(dir_path) as sd_iter:
+                    dir_entries = sorted(sd_iter, key=lambda dir_entry: dir_entry.name)
+
+                for dir_entry in dir_entries:
+                    entry_idx = len(entries)
+                    if dir_entry.is_dir():
+                        entries.append((dir_idx, dir_entry.name, True, 0, "directory"))
+                        if not dir_entry.is_symlink():
+                            next_pending_dirs.append((dir_entry.path, entry_idx))
+                    else:
+                        entries.append(
+                            (
+                                dir_idx,
+                                dir_entry.name,
+                                False,
+                                dir_entry.stat().st_size,
+                                "",
+                            )
+                        )
+                        file_paths.append(dir_entry.path)
+                        file_entry_indexes.append(entry_idx)
+
+                        if dir_entry.name == METADATA_FILE_NAME:
+                            try:
+                                with open(
+                                    dir_entry.path, mode="r", encoding="utf-8"
+                                ) as metadata_file:
+                                    file_contents[entry_idx] = metadata_file.read()
+                            except (OSError, UnicodeDecodeError) as e:
+                                logger.warning(
+                                    "metadata file @ %s can't be captured (%s)",
+                                    dir_entry.path,
+                                    e,
+                                )
+
+            pending_dirs = next_pending_dirs
+
+        for entry_idx, mime_type in zip(
+            file_entry_indexes,
+            io_controller.map(get_mime_type, file_paths, operation="classify"),
+        ):
+            entries[entry_idx] = (*entries[entry_idx][:4], mime_type)
+
+        logger.info(
+            "captured snapshot of %s - %d entries (%d file(s))",
+            root_dir,
+            len(entries),
+            len(file_paths),
+        )
+
+        return cls(
+            root_dir=root_dir,
+            entries=entries,
+            captured_at=time.time(),
+            file_contents=file_contents,
+        )
+
+    @classmethod
+    def load(cls, file_path: str):
+        """
+        Read in the snapshot saved at the given path
+        """
+
+        with gzip.open(file_path, mode="rt", encoding="utf-8") as snapshot_file:
+            snapshot_data = json.load(snapshot_file)
+
+        if snapshot_data.get("version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"snapshot @ {file_path} uses an unsupported format")
+
+        mime_types = snapshot_data["mime_types"]
+
+        return cls(
+            root_dir=snapshot_data["root_dir"],
+            entries=[
+                (parent_idx, name, bool(is_dir), size, mime_types[mime_type_idx])
+                for parent_idx, name, is_dir, size, mime_type_idx in snapshot_data[
+                    "entries"
+                ]
+            ],
+            captured_at=snapshot_data["captured_at"],
+            file_contents={
+                int(entry_idx): contents
+                for entry_idx, contents in snapshot_data.get(
+                    "file_contents", {}
+                ).items()
+            },
+        )
+
+    def save(self, file_path: str) -> None:
+        """
+        Write the snapshot to the given path
+        """
+
+        mime_type_indexes = {}
+        serialized_entries = [
+            [
+                parent_idx,
+                name,
+                int(is_dir),
+                size,
+                mime_type_indexes.setdefault(mime_type, len(mime_type_indexes)),
+            ]
+            for parent_idx, name, is_dir, size, mime_type in self.entries
+        ]
+
+        tmp_file_path = f"{file_path}.tmp"
+        with gzip.open(
+            tmp_file_path, mode="wt", encoding="utf-8", compresslevel=6
+        ) as snapshot_file:
+            json.dump(
+                {
+                    "version": SNAPSHOT_FORMAT_VERSION,
+                    "root_dir": self.root_dir,
+                    "captured_at": self.captured_at,
+                    "mime_types": list(mime_type_indexes),
+                    "entries": serialized_entries,
+                    # JSON object keys are always strings
+                    "file_contents": {
+                        str(entry_idx): contents
+                        for entry_idx, contents in self.file_contents.items()
+                    },
+                },
+                snapshot_file,
+                separators=(",", ":"),
+            )
+        os.replace(tmp_file_path, file_path)
+
+        logger.info("snapshot saved to %s", file_path)
+
+    def mount(self, filesystem, root_dir="") -> None:
+        """
+        Recreate the captured tree in the given virtual filesystem, at the given directory (the captured one by default)
+        """
+
+        root_dir = root_dir if root_dir else self.root_dir
+        filesystem.makedirs(root_dir)
+
+        dir_nodes = {-1: filesystem.get_entry(root_dir)}
+        for entry_idx, (parent_idx, name, is_dir, size, mime_type) in enumerate(
+            self.entries
+        ):
+            node = VirtualDirEntry(
+                name=name,
+                is_dir=is_dir,
+                size=size,
+                mime_type=mime_type,
+                contents=self.file_contents.get(entry_idx),
+            )
+            dir_nodes[parent_idx].children[name] = node
+            if is_dir:
+                dir_nodes[entry_idx] = node
+
+        logger.debug("mounted snapshot of %s @ %s", self.root_dir, root_dir)
@@ -0,0 +1,612 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Title Index - offline database of known titles used to confirm and correct heuristic results
+"""
+
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+
+from array import array
+from collections import Counter
+from bisect import bisect_left, bisect_right
+from hashlib import blake2b
+from itertools import product
+from math import prod
+from logzero import logger
+
+from .const import (
+    TITLE_INDEX_FILE_EXTENSION,
+    TITLE_INDEX_FORMAT_VERSION,
+    TITLE_INDEX_MAX_CANDIDATES,
+    TITLE_INDEX_MAX_POSTINGS,
+    TITLE_INDEX_MAX_WORD_MATCHES,
+    TITLE_INDEX_MIN_FUZZY_WORD_LENGTH,
+    TITLE_INDEX_MIN_SCORE,
+)
+
+# header layout: magic, format version, byte order, record/key/word/deletion counts,
+# then the offset and size of each section
+INDEX_MAGIC = b"PLXTIDX\0"
+INDEX_HEADER = struct.Struct("<8sBB6x4Q26Q")
+INDEX_SECTIONS = (
+    "record_offsets",
+    "record_years",
+    "record_blob",
+    "key_hashes",
+    "key_records",
+    "key_offsets",
+    "key_blob",
+    "word_hashes",
+    "word_offsets",
+    "word_blob",
+    "word_key_offsets",
+    "word_keys",
+    "word_deletions",
+)
+
+NON_ALNUM_REGEX = re.compile(r"[\W_]+")
+
+
+def normalize_title(title: str) -> str:
+    """
+    Normalize a title for comparisons: lowercase with any runs of separators/punctuation collapsed into a space
+    """
+
+    return NON_ALNUM_REGEX.sub(" ", title.lower()).strip()
+
+
+def hash_key(key: str) -> int:
+    """
+    Generate the 64-bit hash of a normalized title (or word of one) used for exact lookups
+    """
+
+    return int.from_bytes(
+        blake2b(key.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+def generate_trigrams(key: str) -> set:
+    """
+    Generate the set of trigrams of a normalized title, padded so that short titles and word boundaries count
+    """
+
+    padded_key = f"  {key} "
+
+    return {padded_key[idx : idx + 3] for idx in range(len(padded_key) - 2)}
+
+
+def score_trigrams(trigrams: set, other_trigrams: set) -> float:
+    """
+    Score the similarity of two trigram sets (Dice coefficient), from 0 (nothing in common) to 1 (identical)
+    """
+
+    return 2 * len(trigrams & other_trigrams) / (len(trigrams) + len(other_trigrams))
+
+
+def generate_deletions(word: str) -> set:
+    """
+    Generate all variants of a word with a single character removed
+    """
+
+    return {word[:idx] + word[idx + 1 :] for idx in range(len(word))}
+
+
+def hash_deletion(variant: str) -> int:
+    """
+    Generate the 32-bit hash of a word variant used in the deletion table
+    """
+
+    return zlib.crc32(variant.encode("utf-8"))
+
+
+class TitleIndex:
+    """
+    Read-only, memory-mapped index of known titles and their release years
+
+    The index is built once from a user-supplied TSV dump (title, release year, alternate titles) and stored in a
+    compact binary format next to it. Opening an existing index only maps the file and reads its header, so load
+    time doesn't depend on the number of titles. Lookups use binary searches over the mapped arrays:
+        * exact matches via a sorted table of normalized title hashes
+        * fuzzy matches via an inverted index of the words in titles, scored with the Dice coefficient of their
+          trigrams; misspelled words are matched against the vocabulary via a table of single-character deletions
+    """
+
+    index_path = ""
+
+    def __init__(self, index_path: str) -> None:
+        self.index_path = index_path
+
+        with open(index_path, mode="rb") as index_file:
+            self._mmap = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = INDEX_HEADER.unpack_from(self._mmap, 0)
+        magic, version, big_endian = header[0:3]
+        if magic != INDEX_MAGIC or version != TITLE_INDEX_FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"unsupported title index format: {index_path}")
+        if big_endian != (sys.byteorder == "big"):
+            self._mmap.close()
+            raise ValueError(
+                f"title index was built on a different platform: {index_path}"
+            )
+
+        self.num_records, self.num_keys, self.num_words, self.num_deletions = header[
+            3:7
+        ]
+
+        buffer = memoryview(self._mmap)
+        sections = {}
+        for idx, name in enumerate(INDEX_SECTIONS):
+            section_offset, section_size = header[7 + idx * 2 : 9 + idx * 2]
+            sections[name] = buffer[section_offset : section_offset + section_size]
+
+        self._record_offsets = sections["record_offsets"].cast("I")
+        self._record_years = sections["record_years"].cast("H")
+        self._record_blob = sections["record_blob"]
+        self._key_hashes = sections["key_hashes"].cast("Q")
+        self._key_records = sections["key_records"].cast("I")
+        self._key_offsets = sections["key_offsets"].cast("I")
+        self._key_blob = sections["key_blob"]
+        self._word_hashes = sections["word_hashes"].cast("Q")
+        self._word_offsets = sections["word_offsets"].cast("I")
+        self._word_blob = sections["word_blob"]
+        self._word_key_offsets = sections["word_key_offsets"].cast("I")
+        self._word_keys = sections["word_keys"].cast("I")
+        # (32-bit variant hash << 32) | word ID, sorted
+        self._word_deletions = sections["word_deletions"].cast("Q")
+
+        logger.debug(
+            "title index loaded from %s (%d titles, %d keys)",
+            index_path,
+            self.num_records,
+            self.num_keys,
+        )
+
+    @classmethod
+    def build(cls, tsv_path: str, index_path: str) -> None:
+        """
+        Build a binary title index from the given TSV dump
+
+        Each line is expected to contain a title, its release year and, optionally, any number of alternate titles
+        (either as extra columns or a single `|`-separated column). Lines without a valid year are skipped, which
+        also takes care of header rows.
+        """
+
+        logger.info("building title index from %s", tsv_path)
+
+        record_offsets = array("I", [0])
+        record_years = array("H")
+        record_blob = bytearray()
+        keys = []  # (key hash, normalized key, record id)
+
+        with open(tsv_path, mode="r", encoding="utf-8") as tsv_file:
+            for line in tsv_file:
+                fields = line.rstrip("\r\n").split("\t")
+                if len(fields) < 2 or not fields[1].strip().isdigit():
+                    continue
+
+                title, release_year = fields[0].strip(), int(fields[1])
+                if not title or not 0 < release_year < 65536:
+                    continue
+
+                record_id = len(record_years)
+                record_blob += title.encode("utf-8")
+                record_offsets.append(len(record_blob))
+                record_years.append(release_year)
+
+                alt_titles = [
+                    alt_title for field in fields[2:] for alt_title in field.split("|")
+                ]
+                for key in {normalize_title(t) for t in [title, *alt_titles]}:
+                    if key:
+                        keys.append((hash_key(key), key, record_id))
+
+        keys.sort()
+
+        key_hashes = array("Q")
+        key_records = array("I")
+        key_offsets = array("I", [0])
+        key_blob = bytearray()
+        word_postings = {}
+        for key_id, (key_hash, key, record_id) in enumerate(keys):
+            key_hashes.append(key_hash)
+            key_records.append(record_id)
+            key_blob += key.encode("utf-8")
+            key_offsets.append(len(key_blob))
+
+            for word in set(key.split()):
+                word_postings.setdefault(word, array("I")).append(key_id)
+
+        word_hashes = array("Q")
+        word_offsets = array("I", [0])
+        word_blob = bytearray()
+        word_key_offsets = array("I", [0])
+        word_keys = array("I")
+        word_deletions = array("Q")
+        for word_id, (word_hash, word) in enumerate(
+            sorted((hash_key(word), word) for word in word_postings)
+        ):
+            word_hashes.append(word_hash)
+            word_blob += word.encode("utf-8")
+            word_offsets.append(len(word_blob))
+            word_keys.extend(word_postings[word])
+            word_key_offsets.append(len(word_keys))
+
+            if len(word) >= TITLE_INDEX_MIN_FUZZY_WORD_LENGTH:
+                word_deletions.extend(
+                    hash_deletion(variant) << 32 | word_id
+                    for variant in generate_deletions(word)
+                )
+        word_deletions = array("Q", sorted(word_deletions))
+
+        sections = [
+            record_offsets.tobytes(),
+            record_years.tobytes(),
+            bytes(record_blob),
+            key_hashes.tobytes(),
+            key_records.tobytes(),
+            key_offsets.tobytes(),
+            bytes(key_blob),
+            word_hashes.tobytes(),
+            word_offsets.tobytes(),
+            bytes(word_blob),
+            word_key_offsets.tobytes(),
+            word_keys.tobytes(),
+            word_deletions.tobytes(),
+        ]
+
+        # lay out sections back-to-back, each padded to 8-byte alignment for casting
+        section_layout = []
+        offset = INDEX_HEADER.size
+        for section in sections:
+            section_layout.extend((offset, len(section)))
+            offset += len(section) + (-len(section) % 8)
+
+        tmp_index_path = f"{index_path}.tmp"
+        with open(tmp_index_path, mode="wb") as index_file:
+            index_file.write(
+                INDEX_HEADER.pack(
+                    INDEX_MAGIC,
+                    TITLE_INDEX_FORMAT_VERSION,
+                    sys.byteorder == "big",
+                    len(record_years),
+                    len(keys),
+                    len(word_hashes),
+                    len(word_deletions),
+                    *section_layout,
+                )
+            )
+            for section in sections:
+                index_file.write(section)
+                index_file.write(b"\0" * (-len(section) % 8))
+        os.replace(tmp_index_path, index_path)
+
+        logger.info(
+            "title index built @ %s (%d titles, %d keys)",
+            index_path,
+            len(record_years),
+            len(keys),
+        )
+
+    @classmethod
+    def open(cls, tsv_path: str, index_path=""):
+        """
+        Open the title index for the given TSV dump, (re)building it first if it's missing or out of date
+        """
+
+        index_path = (
+            index_path if index_path else f"{tsv_path}{TITLE_INDEX_FILE_EXTENSION}"
+        )
+
+        try:
+            needs_build = os.path.getmtime(index_path) < os.path.getmtime(tsv_path)
+        except FileNotFoundError:
+            needs_build = True
+
+        if not needs_build:
+            try:
+                return cls(index_path)
+            except ValueError as e:
+                logger.warning("%s; rebuilding", e)
+
+        cls.build(tsv_path, index_path)
+
+        return cls(index_path)
+
+    def close(self) -> None:
+        """
+        Release the memory mapping of the index file
+        """
+
+        for view in (
+            self._record_offsets,
+            self._record_years,
+            self._record_blob,
+            self._key_hashes,
+            self._key_records,
+            self._key_offsets,
+            self._key_blob,
+            self._word_hashes,
+            self._word_offsets,
+            self._word_blob,
+            self._word_key_offsets,
+            self._word_keys,
+            self._word_deletions,
+        ):
+            view.release()
+        self._mmap.close()
+
+    def get_record(self, record_id: int) -> tuple:
+        """
+        Return the (title, release year) of the given record
+        """
+
+        title = bytes(
+            self._record_blob[
+                self._record_offsets[record_id] : self._record_offsets[record_id + 1]
+            ]
+        ).decode("utf-8")
+
+        return title, self._record_years[record_id]
+
+    def _get_key(self, key_id: int) -> str:
+        return bytes(
+            self._key_blob[self._key_offsets[key_id] : self._key_offsets[key_id + 1]]
+        ).decode("utf-8")
+
+    def find_exact(self, title: str) -> list:
+        """
+        Return the IDs of all records with a title or alternate title equal to the given one, after normalization
+        """
+
+        key = normalize_title(title)
+        key_hash = hash_key(key)
+
+        start = bisect_left(self._key_hashes, key_hash)
+        end = bisect_right(self._key_hashes, key_hash, lo=start)
+
+        return [
+            self._key_records[key_id]
+            for key_id in range(start, end)
+            if self._get_key(key_id) == key
+        ]
+
+    def _get_word(self, word_id: int) -> str:
+        return bytes(
+            self._word_blob[
+                self._word_offsets[word_id] : self._word_offsets[word_id + 1]
+            ]
+        ).decode("utf-8")
+
+    def find_word(self, word: str) -> int:
+        """
+        Return the ID of the given word of normalized titles, or -1 if no title contains it
+        """
+
+        word_hash = hash_key(word)
+
+        start = bisect_left(self._word_hashes, word_hash)
+        end = bisect_right(self._word_hashes, word_hash, lo=start)
+        for word_id in range(start, end):
+            if self._get_word(word_id) == word:
+                return word_id
+
+        return -1
+
+    def _find_deletion_words(self, variant: str) -> list:
+        variant_hash = hash_deletion(variant) << 32
+        start = bisect_left(self._word_deletions, variant_hash)
+        end = bisect_left(self._word_deletions, variant_hash + (1 << 32), lo=start)
+
+        return [entry & 0xFFFFFFFF for entry in self._word_deletions[start:end]]
+
+    def find_similar_words(
+        self, word: str, max_words=TITLE_INDEX_MAX_WORD_MATCHES
+    ) -> list:
+        """
+        Return the IDs of the words of normalized titles one typo (a missing, extra, different or swapped character)
+        away from the given word, most similar first
+
+        Uses symmetric deletion: the index holds every variant of every word with one character removed, so each
+        kind of typo is a handful of exact lookups rather than a scan of the vocabulary.
+        """
+
+        if len(word) < TITLE_INDEX_MIN_FUZZY_WORD_LENGTH:
+            return []
+
+        # words the given one is missing a character of
+        word_ids = set(self._find_deletion_words(word))
+        for variant in generate_deletions(word):
+            # words the given one has an extra character over
+            word_id = self.find_word(variant)
+            if word_id >= 0:
+                word_ids.add(word_id)
+            # words with a different or swapped character, which share a deletion with
+            # the given one
+            word_ids.update(self._find_deletion_words(variant))
+
+        word_trigrams = generate_trigrams(word)
+        scored_words = [
+            (
+                score_trigrams(
+                    word_trigrams, generate_trigrams(self._get_word(word_id))
+                ),
+                word_id,
+            )
+            for word_id in word_ids
+        ]
+
+        return [
+            word_id for _, word_id in sorted(scored_words, reverse=True)[:max_words]
+        ]
+
+    def find_fuzzy(
+        self,
+        title: str,
+        min_score=TITLE_INDEX_MIN_SCORE,
+        max_postings=TITLE_INDEX_MAX_POSTINGS,
+        max_candidates=TITLE_INDEX_MAX_CANDIDATES,
+    ) -> list:
+        """
+        Return (score, record ID) pairs of all records with a title similar to the given one, best matches first
+
+        Similarity is the Dice coefficient of the trigram sets of the normalized titles. Words that no title contains
+        are replaced by the most similar words that some title does, and every resulting spelling of the title is
+        looked up exactly, which finds titles with a typo or two at the cost of a few exact lookups. Failing that,
+        candidates are the titles sharing the most words with the given one: posting lists of words are walked
+        rarest first and up to a fixed number of postings, and only the candidates sharing the most words are scored
+        in full. This bounds the cost of a lookup regardless of the size of the index.
+        """
+
+        key = normalize_title(title)
+        query_trigrams = generate_trigrams(key)
+        if not query_trigrams:
+            return []
+
+        words = key.split()
+        word_ids = []
+        # word index -> spellings of words of the title that no title contains
+        corrections = {}
+        for word_idx, word in enumerate(words):
+            word_id = self.find_word(word)
+            if word_id >= 0:
+                word_ids.append([word_id])
+            else:
+                word_ids.append(self.find_similar_words(word))
+                corrections[word_idx] = [
+                    self._get_word(word_id) for word_id in word_ids[-1]
+                ]
+
+        matches = {}
+        if (
+            corrections
+            and prod(len(spellings) for spellings in corrections.values())
+            <= max_candidates
+        ):
+            for spellings in product(*corrections.values()):
+                corrected_words = list(words)
+                for word_idx, spelling in zip(corrections, spellings):
+                    corrected_words[word_idx] = spelling
+                corrected_key = " ".join(corrected_words)
+
+                record_ids = self.find_exact(corrected_key)
+                if record_ids:
+                    score = score_trigrams(
+                        query_trigrams, generate_trigrams(corrected_key)
+                    )
+                    for record_id in record_ids:
+                        matches[record_id] = max(score, matches.get(record_id, 0))
+
+        if not matches:
+            matches = self._find_sharing_words(
+                query_trigrams,
+                word_ids,
+                max_postings=max_postings,
+                max_candidates=max_candidates,
+            )
+
+        return sorted(
+            (
+                (score, record_id)
+                for record_id, score in matches.items()
+                if score >= min_score
+            ),
+            reverse=True,
+        )
+
+    def _find_sharing_words(
+        self,
+        query_trigrams: set,
+        word_ids: list,
+        max_postings: int,
+        max_candidates: int,
+    ) -> dict:
+        # (number of postings, index of the word of the title, posting range) of each
+        # word of the title, or each word similar to it if no title contains it
+        posting_ranges = []
+        for word_idx, similar_word_ids in enumerate(word_ids):
+            for word_id in similar_word_ids:
+                start, end = (
+                    self._word_key_offsets[word_id],
+                    self._word_key_offsets[word_id + 1],
+                )
+                posting_ranges.append((end - start, word_idx, start, end))
+        posting_ranges.sort()
+
+        # walk posting lists rarest first, until the scan budget is used up; words like
+        # "the" appear in so many titles that walking their posting lists would dominate
+        # the lookup, and narrow nothing down
+        word_key_ids = {}
+        num_scanned = 0
+        for num_postings, word_idx, start, end in posting_ranges:
+            num_scanned += num_postings
+            if num_scanned > max_postings:
+                break
+
+            word_key_ids.setdefault(word_idx, set()).update(
+                self._word_keys[start:end].tolist()
+            )
+
+        # count shared words per key; a word repeated in the title, or similar words
+        # appearing in the same key, still only count once
+        shared_counts = Counter()
+        for key_ids in {frozenset(key_ids) for key_ids in word_key_ids.values()}:
+            shared_counts.update(key_ids)
+
+        candidates = shared_counts.most_common(max_candidates)
+        if not candidates:
+            return {}
+
+        # keys missing more than one more word of the title than the best candidates are
+        # left out
+        min_shared = candidates[0][1] - 1
+
+        matches = {}
+        for key_id, shared_count in candidates:
+            if shared_count < min_shared:
+                break
+
+            score = score_trigrams(
+                query_trigrams, generate_trigrams(self._get_key(key_id))
+            )
+            record_id = self._key_records[key_id]
+            matches[record_id] = max(score, matches.get(record_id, 0))
+
+        return matches
+
+    def lookup(
+        self, title: str, release_years=(), fuzzy=True, min_score=TITLE_INDEX_MIN_SCORE
+    ):
+        """
+        Find the known title that best matches the given title and candidate release years
+
+        Exact title matches are preferred over fuzzy ones. Among equally good title matches, records released in one
+        of the candidate years win, with later candidates preferred (same as the heuristics), then the closest year.
+        Returns a (title, release year) tuple, or None if nothing matched at least as well as `min_score`.
+        """
+
+        scored_records = [(1.0, record_id) for record_id in self.find_exact(title)]
+        if not scored_records and fuzzy:
+            scored_records = self.find_fuzzy(title, min_score=min_score)
+        if not scored_records:
+            return None
+
+        def rank(scored_record):
+            score, record_id = scored_record
+            release_year = self._record_years[record_id]
+
+            if release_year in release_years:
+                year_rank = (1, release_years.index(release_year), 0)
+            elif release_years:
+                year_rank = (0, 0, -abs(release_year - release_years[-1]))
+            else:
+                year_rank = (0, 0, 0)
+
+            return (round(score, 2), year_rank)
+
+        return self.get_record(max(scored_records, key=rank)[1])
@@ -0,0 +1,364 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: Transfer - move files into the library, verifying copies made across filesystems
+"""
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from logzero import logger
+
+from .const import (
+    DIGEST_MANIFEST_DIR_PATH,
+    DIGEST_MANIFEST_FORMAT_VERSION,
+    TRANSFER_CHUNK_SIZE,
+    TRANSFER_HASH_ALGORITHM,
+    TRANSFER_HASH_WORKERS,
+    TRANSFER_PARTIAL_FILE_EXTENSION,
+    TRANSFER_SAMPLE_BLOCKS,
+)
+from .rename import RenameExecutor
+
+VERIFY_MODES = ("none", "sample", "full")
+
+
+class DigestManifest:
+    """
+    File recording the digest, size, and mtime of every file copied into a directory
+
+    Paths are stored relative to the given root directory (the manifest's own directory by default), so the manifest
+    can be kept out of the library it describes. Size and mtime are kept alongside each digest so later audits can
+    tell whether a file changed since it was copied without reading it back.
+    """
+
+    file_path = ""
+
+    def __init__(
+        self, file_path: str, root_dir="", algorithm=TRANSFER_HASH_ALGORITHM
+    ) -> None:
+        self.file_path = file_path
+        self.root_dir = (
+            root_dir if root_dir else os.path.dirname(os.path.abspath(file_path))
+        )
+        self.algorithm = algorithm
+
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._unsaved_changes = False
+
+    def load(self) -> None:
+        """
+        Read in the existing manifest, if any
+        """
+
+        try:
+            with open(self.file_path, mode="r", encoding="utf-8") as manifest_file:
+                manifest_data = json.load(manifest_file)
+        except FileNotFoundError:
+            logger.debug("no digest manifest found @ %s", self.file_path)
+
+            return
+        except json.JSONDecodeError:
+            logger.warning(
+                "digest manifest @ %s is corrupt; ignoring it", self.file_path
+            )
+
+            return
+
+        if (
+            manifest_data.get("version") != DIGEST_MANIFEST_FORMAT_VERSION
+            or manifest_data.get("algorithm") != self.algorithm
+        ):
+            logger.warning(
+                "digest manifest @ %s uses an unsupported format; ignoring it",
+                self.file_path,
+            )
+
+            return
+
+        self.entries = manifest_data.get("files", {})
+
+        logger.debug("loaded %d digest(s) from %s", len(self.entries), self.file_path)
+
+    def save(self) -> None:
+        """
+        Write the manifest to disk, if anything changed since it was loaded
+        """
+
+        with self._lock:
+            if not self._unsaved_changes:
+                return
+
+            self._unsaved_changes = False
+            manifest_data = {
+                "version": DIGEST_MANIFEST_FORMAT_VERSION,
+                "algorithm": self.algorithm,
+                "files": dict(self.entries),
+            }
+
+        manifest_dir = os.path.dirname(self.file_path)
+        if manifest_dir:
+            os.makedirs(manifest_dir, exist_ok=True)
+
+        tmp_file_path = f"{self.file_path}.tmp"
+        with open(tmp_file_path, mode="w", encoding="utf-8") as manifest_file:
+            json.dump(manifest_data, manifest_file)
+        os.replace(tmp_file_path, self.file_path)
+
+    @staticmethod
+    def generate_file_path(root_dir: str) -> str:
+        """
+        Generate the default path of the manifest of the given directory, under the user's cache directory
+        """
+
+        root_dir_hash = hashlib.sha256(os.path.abspath(root_dir).encode("utf-8"))
+
+        return os.path.join(
+            DIGEST_MANIFEST_DIR_PATH, f"{root_dir_hash.hexdigest()[:16]}.json"
+        )
+
+    def generate_key(self, file_path: str) -> str:
+        """
+        Generate the manifest key of the given file: its path relative to the manifest's root directory
+        """
+
+        return os.path.relpath(file_path, self.root_dir)
+
+    def record(self, file_path: str, digest: str) -> None:
+        """
+        Record the digest of the given file, along with its current size and mtime
+        """
+
+        file_stat = os.stat(file_path)
+        with self._lock:
+            self.entries[self.generate_key(file_path)] = {
+                "digest": digest,
+                "size": file_stat.st_size,
+                "mtime_ns": file_stat.st_mtime_ns,
+            }
+            self._unsaved_changes = True
+
+    def get(self, file_path: str):
+        """
+        Fetch the manifest entry of the given file, or None if it isn't in the manifest
+        """
+
+        with self._lock:
+            return self.entries.get(self.generate_key(file_path))
+
+
+class TransferManager:
+    """
+    Move files to their destination, copying them when the destination is on a different filesystem
+
+    Copies are hashed while the data streams through: each chunk is handed off to a shared thread pool to be hashed
+    while the next one is being read and written, so hashing overlaps with I/O instead of needing a separate pass.
+    Copies are written to a partial file and only renamed into place (and the source removed) once verified:
+        * none: trust the copy
+        * sample: compare sizes plus a handful of blocks spread across both files
+        * full: read the whole destination back and compare its digest against the one computed while copying
+
+    Both renames go through a rename executor, so an existing destination is never replaced, even one that
+    appeared while the file was being copied.
+
+    Only TV runs move files into the destination directory; movie runs rename directories in place, so they never
+    go through here.
+    """
+
+    verify = "sample"
+
+    def __init__(
+        self,
+        verify="sample",
+        manifest=None,
+        chunk_size=TRANSFER_CHUNK_SIZE,
+        hash_workers=TRANSFER_HASH_WORKERS,
+    ) -> None:
+        if verify not in VERIFY_MODES:
+            raise ValueError(
+                f"verification mode must be one of: {', '.join(VERIFY_MODES)}"
+            )
+
+        self.verify = verify
+        self.manifest = manifest
+        self.chunk_size = chunk_size
+        self.algorithm = manifest.algorithm if manifest else TRANSFER_HASH_ALGORITHM
+        self.hash_workers = hash_workers
+        self.rename_executor = RenameExecutor()
+
+        self._hash_pool = None
+        self._hash_pool_lock = threading.Lock()
+
+    def get_hash_pool(self) -> ThreadPoolExecutor:
+        """
+        Fetch the hashing thread pool, starting it on first use
+        """
+
+        with self._hash_pool_lock:
+            if not self._hash_pool:
+                self._hash_pool = ThreadPoolExecutor(
+                    max_workers=self.hash_workers, thread_name_prefix="plexer-hash"
+                )
+
+            return self._hash_pool
+
+    def close(self) -> None:
+        """
+        Shut down the hashing thread pool and release the rename executor
+        """
+
+        with self._hash_pool_lock:
+            if self._hash_pool:
+                self._hash_pool.shutdown()
+                self._hash_pool = None
+        self.rename_executor.close()
+
+    def hash_file(self, file_path: str) -> str:
+        """
+        Generate the digest of the given file by reading it in full
+        """
+
+        hasher = hashlib.new(self.algorithm)
+        with open(file_path, mode="rb") as src_file:
+            while chunk := src_file.read(self.chunk_size):
+                hasher.update(chunk)
+
+        return hasher.hexdigest()
+
+    def copy_file(self, src_file_path: str, dst_file_path: str) -> str:
+        """
+        Copy the given file, hashing its contents on the way, and return the digest
+
+        The copy is flushed to disk before returning.
+        """
+
+        hasher = hashlib.new(self.algorithm)
+        hash_pool = self.get_hash_pool()
+        pending_hash = None
+
+        with (
+            open(src_file_path, mode="rb") as src_file,
+            open(dst_file_path, mode="wb") as dst_file,
+        ):
+            while chunk := src_file.read(self.chunk_size):
+                # chunks of a file must be hashed in order, so at most one is hashed at
+                # a time while the next one is read and written
+                if pending_hash:
+                    pending_hash.result()
+                pending_hash = hash_pool.submit(hasher.update, chunk)
+
+                dst_file.write(chunk)
+
+            if pending_hash:
+                pending_hash.result()
+
+            dst_file.flush()
+            os.fsync(dst_file.fileno())
+
+        shutil.copystat(src_file_path, dst_file_path)
+
+        return hasher.hexdigest()
+
+    def verify_sample(self, src_file_path: str, dst_file_path: str) -> bool:
+        """
+        Check that the given files have the same size and the same data in a sample of blocks across the file
+        """
+
+        file_size = os.path.getsize(src_file_path)
+        if os.path.getsize(dst_file_path) != file_size:
+            return False
+
+        block_size = min(self.chunk_size, file_size)
+        if not block_size:
+            return True
+
+        # first block, last block, and evenly spaced blocks in between
+        sample_offsets = {
+            (file_size - block_size) * idx // (TRANSFER_SAMPLE_BLOCKS - 1)
+            for idx in range(TRANSFER_SAMPLE_BLOCKS)
+        }
+
+        src_fd = os.open(src_file_path, os.O_RDONLY)
+        dst_fd = os.open(dst_file_path, os.O_RDONLY)
+        try:
+            return all(
+                os.pread(src_fd, block_size, offset)
+                == os.pread(dst_fd, block_size, offset)
+                for offset in sorted(sample_offsets)
+            )
+        finally:
+            os.close(src_fd)
+            os.close(dst_fd)
+
+    def verify_copy(self, src_file_path: str, dst_file_path: str, digest: str) -> bool:
+        """
+        Verify the copy of the given file using the configured verification mode
+        """
+
+        if self.verify == "full":
+            return self.hash_file(dst_file_path) == digest
+        if self.verify == "sample":
+            return self.verify_sample(src_file_path, dst_file_path)
+
+        return True
+
+    def move(self, src_file_path: str, dst_file_path: str) -> bool:
+        """
+        Move the given file to its destination
+
+        Files are renamed if possible; otherwise they're copied, verified, and then removed from the source.
+        Returns False (leaving the source untouched) if the copy failed verification. Raises FileExistsError, also
+        leaving the source untouched, if the destination already exists.
+        """
+
+        try:
+            self.rename_executor.rename(src_file_path, dst_file_path)
+
+            return True
+        except OSError as err:
+            if err.errno != errno.EXDEV:
+                raise
+
+        logger.debug(
+            "destination is on a different filesystem; copying: %s -> %s",
+            src_file_path,
+            dst_file_path,
+        )
+
+        partial_file_path = f"{dst_file_path}{TRANSFER_PARTIAL_FILE_EXTENSION}"
+        try:
+            digest = self.copy_file(src_file_path, partial_file_path)
+
+            if not self.verify_copy(src_file_path, partial_file_path, digest):
+                logger.error(
+                    "copy failed verification; leaving source in place: %s -> %s",
+                    src_file_path,
+                    dst_file_path,
+                )
+                os.remove(partial_file_path)
+
+                return False
+
+            # the destination may have appeared while copying, so it's never replaced
+            self.rename_executor.rename(partial_file_path, dst_file_path)
+        except BaseException:
+            if os.path.exists(partial_file_path):
+                os.remove(partial_file_path)
+
+            raise
+
+        if self.manifest:
+            self.manifest.record(dst_file_path, digest)
+        os.remove(src_file_path)
+
+        logger.debug(
+            "copy verified (%s: %s): %s", self.algorithm, digest, dst_file_path
+        )
+
+        return True
@@ -0,0 +1,299 @@
+"""
+Plexer - Normalize media files for use with Plex Media Server
+
+Module: TV - parsing of TV episode files and grouping them into shows and seasons
+"""
+
+import os
+import re
+
+from logzero import logger
+
+from .const import EPISODE_HEURISTICS_PATTERN, RELEASE_TAG_PATTERN, SHOW_YEAR_PATTERN
+from .metadata import Metadata
+
+EPISODE_REGEX = re.compile(EPISODE_HEURISTICS_PATTERN)
+RELEASE_TAG_REGEX = re.compile(RELEASE_TAG_PATTERN)
+SHOW_YEAR_REGEX = re.compile(SHOW_YEAR_PATTERN)
+EXTRA_EPISODE_SEPARATOR_REGEX = re.compile(r"[Ee]|-")
+SEASON_DIR_REGEX = re.compile(
+    r"^(season|series|s)[\s\.\-\_]*\d+$|^specials$", re.IGNORECASE
+)
+
+
+class Episode:
+    """
+    Single TV episode file (which may contain multiple episodes)
+
+    Date-based episodes have no season of their own (0) until one is derived from their show's year.
+    """
+
+    show_name = ""
+    show_year = 0
+    season = 0
+    episodes = ()
+    air_date = ""
+    absolute_path = ""
+    file_ext = ""
+
+    def __init__(
+        self,
+        show_name: str,
+        path: str,
+        show_year=0,
+        season=0,
+        episodes=(),
+        air_date="",
+    ) -> None:
+        self.show_name = show_name
+        self.show_year = show_year
+        self.season = season
+        self.episodes = tuple(episodes)
+        self.air_date = air_date
+        self.absolute_path = path
+        self.file_ext = os.path.splitext(path)[1]
+
+    @property
+    def episode_key(self) -> str:
+        """
+        Plex-formatted episode identifier, e.g. s01e02, s01e02-e03, or 2020-01-31 for date-based episodes
+        """
+
+        if self.air_date:
+            return self.air_date
+
+        episode_key = f"s{self.season:02d}e{self.episodes[0]:02d}"
+        if len(self.episodes) > 1:
+            episode_key += f"-e{self.episodes[-1]:02d}"
+
+        return episode_key
+
+    @property
+    def air_year(self) -> int:
+        """
+        Year a date-based episode aired in, or 0 for other episodes
+        """
+
+        return int(self.air_date[:4]) if self.air_date else 0
+
+
+class EpisodeParser:
+    """
+    Extract show, season and episode info from TV episode file names
+    """
+
+    def __init__(self) -> None:
+        # show names repeat across episodes, so scrubbing results are reused
+        self._show_name_cache = {}
+
+    def parse_show_name(self, raw_show_name: str) -> tuple:
+        """
+        Clean up the show part of an episode file name and split off the show's year, if present
+
+        Release tags (resolutions, sources, codecs, etc) mark the end of the show name; they and anything after them
+        are dropped. Returns a (show name, show year) tuple.
+        """
+
+        if raw_show_name not in self._show_name_cache:
+            show_name_tokens = Metadata().scrub_artifact_name(raw_show_name).split()
+            # the first token is always kept, e.g. for shows named after a tag
+            for token_idx, token in enumerate(show_name_tokens[1:], start=1):
+                if RELEASE_TAG_REGEX.fullmatch(token):
+                    del show_name_tokens[token_idx:]
+
+                    break
+            show_name = " ".join(show_name_tokens)
+            show_year = 0
+
+            year_match = SHOW_YEAR_REGEX.match(show_name)
+            if year_match:
+                show_name, show_year = year_match.group(1), int(year_match.group(2))
+
+            self._show_name_cache[raw_show_name] = (show_name, show_year)
+
+        return self._show_name_cache[raw_show_name]
+
+    def parse(self, file_path: str, show_name=""):
+        """
+        Parse the given episode file path
+
+        The show name is taken from the file name (anything before the episode marker), falling back to the given
+        show name (e.g. from the parent directory) if the file name starts with the episode marker.
+        Returns an Episode object, or None if the file name doesn't look like an episode.
+        """
+
+        file_name = os.path.basename(file_path)
+        episode_match = EPISODE_REGEX.search(file_name)
+        if not episode_match:
+            return None
+
+        raw_show_name = file_name[: episode_match.start()].strip(" .-_([")
+        parsed_show_name, show_year = self.parse_show_name(
+            raw_show_name if raw_show_name else show_name
+        )
+        if not parsed_show_name:
+            return None
+
+        groups = episode_match.groupdict()
+        if groups["date_year"]:
+            return Episode(
+                show_name=parsed_show_name,
+                show_year=show_year,
+                path=file_path,
+                air_date=f"{groups['date_year']}-{groups['date_month']}-{groups['date_day']}",
+            )
+
+        if groups["se_season"]:
+            season, first_episode, extra = (
+                groups["se_season"],
+                groups["se_episode"],
+                groups["se_extra"],
+            )
+        else:
+            season, first_episode, extra = (
+                groups["x_season"],
+                groups["x_episode"],
+                groups["x_extra"],
+            )
+
+        episodes = [int(first_episode)]
+        if extra:
+            # extra episodes are separated by E/-/x markers, e.g. E03, -03, -1x03; the
+            # episode is the last number
+            for extra_episode in EXTRA_EPISODE_SEPARATOR_REGEX.split(extra):
+                if extra_episode:
+                    episodes.append(int(extra_episode.lower().rpartition("x")[2]))
+
+        return Episode(
+            show_name=parsed_show_name,
+            show_year=show_year,
+            path=file_path,
+            season=int(season),
+            episodes=sorted(set(episodes)),
+        )
+
+
+def is_season_dir(dir_name: str) -> bool:
+    """
+    Check if the given directory name is a season directory (e.g. `Season 1`, `S02`, `Specials`) rather than a show
+    """
+
+    return bool(SEASON_DIR_REGEX.match(dir_name))
+
+
+class ShowGrouper:
+    """
+    Bucket episodes into show -> season -> episode in a single pass and generate their Plex target paths
+
+    Shows are keyed by their normalized name, so the same show is grouped together regardless of how each release
+    formatted it. Only the first file seen for a given episode is kept; later ones are recorded as duplicates. A
+    show's year can turn up on any of its episodes, so targets should only be generated once all episodes are added.
+
+    Date-based episodes are filed under the season counted from the show's year (e.g. the 2021 episodes of a show
+    from 2020 go in season 2). Without a known show year, there's no telling which season they belong to, so they're
+    set aside in `needs_review` instead of being given a target.
+    """
+
+    def __init__(self) -> None:
+        self.shows = {}
+        self.duplicates = []
+        self.needs_review = []
+        self.num_episodes = 0
+
+    def add(self, episode: Episode) -> bool:
+        """
+        Add the given episode to its show/season bucket
+
+        Returns False if the episode was already present.
+        """
+
+        show_key = episode.show_name.lower()
+        show = self.shows.get(show_key)
+        if show is None:
+            show = self.shows[show_key] = {
+                "metadata": Metadata(name=episode.show_name, release_year=0),
+                "seasons": {},
+                # air date -> date-based episode, until their seasons are known
+                "dated": {},
+            }
+        if episode.show_year and not show["metadata"].release_year:
+            show["metadata"].release_year = episode.show_year
+
+        season = (
+            show["dated"]
+            if episode.air_date
+            else show["seasons"].setdefault(episode.season, {})
+        )
+        if episode.episode_key in season:
+            self.duplicates.append(episode)
+
+            return False
+
+        season[episode.episode_key] = episode
+        self.num_episodes += 1
+
+        return True
+
+    @staticmethod
+    def generate_show_dir_name(show_metadata: Metadata) -> str:
+        """
+        Generate the Plex-formatted directory name of the given show
+        """
+
+        if show_metadata.release_year:
+            return f"{show_metadata.name} ({show_metadata.release_year})"
+
+        return show_metadata.name
+
+    def generate_targets(self, dst_dir: str) -> list:
+        """
+        Generate the (source path, target path) pairs for all grouped episodes
+
+        Targets follow Plex's `Show (Year)/Season NN/Show (Year) - sNNeMM.ext` naming convention, with the air date
+        in place of the episode number for date-based episodes. Date-based episodes whose season can't be determined
+        are added to `needs_review` rather than given a target.
+        """
+
+        targets = []
+        self.needs_review = []
+        for show in self.shows.values():
+            show_dir_name = self.generate_show_dir_name(show["metadata"])
+            show_year = show["metadata"].release_year
+
+            seasons = {
+                season_num: dict(season)
+                for season_num, season in show["seasons"].items()
+            }
+            for episode_key, episode in show["dated"].items():
+                if not show_year or episode.air_year < show_year:
+                    self.needs_review.append(episode)
+
+                    continue
+
+                seasons.setdefault(episode.air_year - show_year + 1, {})[
+                    episode_key
+                ] = episode
+
+            for season_num, season in seasons.items():
+                season_dir = os.path.join(
+                    dst_dir, show_dir_name, f"Season {season_num:02d}"
+                )
+
+                for episode_key, episode in season.items():
+                    targets.append(
+                        (
+                            episode.absolute_path,
+                            os.path.join(
+                                season_dir,
+                                f"{show_dir_name} - {episode_key}{episode.file_ext}",
+                            ),
+                        )
+                    )
+
+        logger.debug(
+            "generated %d episode target(s) across %d show(s)",
+            len(targets),
+            len(self.shows),
+        )
+
+        return targets
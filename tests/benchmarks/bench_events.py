@@ -0,0 +1,83 @@
+"""
+Plexer Benchmarks - Event Stream
+
+Measures the per-artifact logging overhead seen by the processing thread, comparing synchronous logzero calls
+against the event stream, with the level both disabled and enabled (writing to /dev/null).
+
+Usage: python tests/benchmarks/bench_events.py [--artifacts N]
+"""
+
+import argparse
+import logging
+import os
+import time
+
+import logzero
+from logzero import logger
+
+from plexer_cli.events import EventStream
+
+
+def log_with_logzero(num_artifacts: int) -> float:
+    start = time.perf_counter()
+    for idx in range(num_artifacts):
+        logger.info(
+            "processing artifact: [ FILE: %s | PATH: %s | FILE TYPE: %s ]",
+            f"Movie.{idx}.2001.1080p",
+            f"/src/Movie.{idx}.2001.1080p",
+            "directory",
+        )
+        logger.debug(
+            "artifact name is NOT in a valid format for Plex: %s",
+            f"Movie.{idx}.2001.1080p",
+        )
+
+    return time.perf_counter() - start
+
+
+def log_with_events(event_stream: EventStream, num_artifacts: int) -> tuple:
+    start = time.perf_counter()
+    for idx in range(num_artifacts):
+        event_stream.emit(
+            "artifact_found",
+            name=f"Movie.{idx}.2001.1080p",
+            path=f"/src/Movie.{idx}.2001.1080p",
+            mime_type="directory",
+        )
+        event_stream.emit("artifact_invalid", name=f"Movie.{idx}.2001.1080p")
+    caller_time = time.perf_counter() - start
+
+    event_stream.close()
+
+    return caller_time, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--artifacts", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        for handler in logger.handlers:
+            handler.setStream(devnull)
+
+        for level in (logging.WARNING, logging.DEBUG):
+            logzero.loglevel(level)
+            logzero_time = log_with_logzero(args.artifacts)
+
+            for output_format in ("console", "jsonl"):
+                caller_time, total_time = log_with_events(
+                    EventStream(
+                        level=level, output_format=output_format, stream=devnull
+                    ),
+                    args.artifacts,
+                )
+
+                print(
+                    f"{logging.getLevelName(level):7s} {output_format:7s} - logzero: {logzero_time:7.3f}s | "
+                    f"events (processing thread): {caller_time:7.3f}s | events (incl. writer): {total_time:7.3f}s"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Plexer Benchmarks - Adaptive I/O Concurrency
+
+Compares fixed and adaptive worker counts for artifact classification against an artificially delayed
+filesystem shim. The shim models storage with a limited number of I/O channels: each operation takes a
+fixed service time, and once more operations are in flight than the storage can serve, the excess queue up
+and latency climbs (like a spinning-disk NAS would).
+
+Usage: python tests/benchmarks/bench_io_concurrency.py [--files N] [--channels N] [--service-ms N]
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+
+from pathlib import Path
+
+import logzero
+
+import plexer_cli.filesystem
+from plexer_cli.concurrency import ConcurrencyController
+from plexer_cli.file_manager import FileManager
+
+
+class DelayedStorageShim:
+    """
+    Stand-in for MIME detection that simulates slow, channel-limited storage
+    """
+
+    def __init__(self, channels: int, service_time: float) -> None:
+        self.channels = threading.Semaphore(channels)
+        self.service_time = service_time
+
+    def get_mime_type(self, file_path: str) -> str:
+        with self.channels:
+            time.sleep(self.service_time)
+
+        return "video/mp4"
+
+
+def build_tree(root: Path, num_files: int) -> None:
+    for idx in range(num_files):
+        (root / f"Movie.Title.{idx}.2020.1080p.mp4").touch()
+
+
+def run_case(label: str, src_dir: str, controller: ConcurrencyController) -> None:
+    fm = FileManager(src_dir=src_dir, dst_dir=src_dir, io_controller=controller)
+
+    start = time.perf_counter()
+    artifacts = fm.get_artifacts()
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{label:<24} {len(artifacts):>6} artifacts in {elapsed:7.3f}s "
+        f"({len(artifacts) / elapsed:8.1f}/s) | final workers: {controller.workers:>2} "
+        f"| avg latency: {controller.avg_latency * 1000:7.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--service-ms", type=float, default=5.0)
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Show controller adjustments"
+    )
+    args = parser.parse_args()
+
+    logzero.loglevel(logzero.INFO if args.verbose else logzero.WARNING)
+
+    shim = DelayedStorageShim(
+        channels=args.channels, service_time=args.service_ms / 1000
+    )
+    plexer_cli.filesystem.get_mime_type = shim.get_mime_type
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        build_tree(Path(tmp_dir), args.files)
+
+        print(
+            f"storage shim: {args.channels} channel(s), {args.service_ms}ms service time\n"
+        )
+        run_case("fixed (1 worker)", tmp_dir, ConcurrencyController(1, 1))
+        run_case("fixed (32 workers)", tmp_dir, ConcurrencyController(32, 32))
+        run_case("adaptive (1-32 workers)", tmp_dir, ConcurrencyController(1, 32))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Plexer Benchmarks - No-Clobber Renames
+
+Builds a synthetic library of title directories (each holding a handful of files), then measures how long it takes
+to rename every file without replacing existing destinations: by checking for the destination with os.path.exists()
+before each os.rename() (the old approach), and with the rename executor, atomically where renameat2() is supported
+and via its fallback otherwise.
+
+Usage: python tests/benchmarks/bench_rename.py [--titles N] [--files-per-title N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import logzero
+
+from plexer_cli.rename import RenameExecutor
+
+
+def build_library(library_dir: str, num_titles: int, files_per_title: int) -> list:
+    file_paths = []
+    for idx in range(num_titles):
+        title_dir = os.path.join(library_dir, f"Movie.{idx}.1999.1080p")
+        os.mkdir(title_dir)
+        for file_idx in range(files_per_title):
+            file_path = os.path.join(
+                title_dir, f"Movie.{idx}.1999.1080p.part{file_idx}.mkv"
+            )
+            open(file_path, "wb").close()
+            file_paths.append(file_path)
+
+    return file_paths
+
+
+def rename_exists_check(src_path: str, dst_path: str) -> None:
+    if os.path.exists(dst_path):
+        raise FileExistsError(dst_path)
+    os.rename(src_path, dst_path)
+
+
+def run_case(label: str, file_paths: list, suffix: str, rename_func) -> list:
+    renamed_paths = [f"{file_path}{suffix}" for file_path in file_paths]
+
+    start = time.perf_counter()
+    for src_path, dst_path in zip(file_paths, renamed_paths):
+        rename_func(src_path, dst_path)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{label:<28} {len(file_paths):>7} renames in {elapsed:7.3f}s ({len(file_paths) / elapsed:,.0f}/s)"
+    )
+
+    return renamed_paths
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=5_000)
+    parser.add_argument("--files-per-title", type=int, default=4)
+    args = parser.parse_args()
+
+    logzero.loglevel(logzero.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_paths = build_library(tmp_dir, args.titles, args.files_per_title)
+
+        file_paths = run_case(
+            "exists() + os.rename()", file_paths, ".a", rename_exists_check
+        )
+
+        executor = RenameExecutor()
+        file_paths = run_case(
+            f"executor (atomic: {executor.atomic})", file_paths, ".b", executor.rename
+        )
+        executor.close()
+
+        executor = RenameExecutor()
+        executor.atomic = False
+        run_case("executor (fallback)", file_paths, ".c", executor.rename)
+        executor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Plexer Benchmarks - Snapshot Replay
+
+Builds a synthetic snapshot of a large movie library (one file per movie directory), then measures how long it
+takes to save, load and mount it, and to replay a full run against it in memory.
+
+Usage: python tests/benchmarks/bench_snapshot_replay.py [--dirs N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import logzero
+
+from plexer_cli.file_manager import FileManager
+from plexer_cli.filesystem import VirtualFilesystem
+from plexer_cli.snapshot import Snapshot
+
+SRC_DIR = "/library/movies"
+
+
+def generate_title(idx: int) -> str:
+    # digits would be mistaken for release years by the heuristics, so titles are
+    # spelled out in letters
+    letters = ""
+    while True:
+        idx, remainder = divmod(idx, 26)
+        letters += chr(ord("a") + remainder)
+        if not idx:
+            return f"Movie.{letters.title()}"
+
+
+def build_snapshot(num_dirs: int) -> Snapshot:
+    entries = []
+    for idx in range(num_dirs):
+        dir_name = f"{generate_title(idx)}.{1950 + idx % 75}.1080p"
+        entries.append((-1, dir_name, True, 0, "directory"))
+        entries.append(
+            (idx * 2, f"{dir_name}.mkv", False, 4 * 1024**3, "video/x-matroska")
+        )
+
+    return Snapshot(root_dir=SRC_DIR, entries=entries, captured_at=time.time())
+
+
+def timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<10} {time.perf_counter() - start:8.3f}s")
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dirs", type=int, default=100_000)
+    args = parser.parse_args()
+
+    logzero.loglevel(logzero.WARNING)
+
+    snapshot = build_snapshot(args.dirs)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_file = os.path.join(tmp_dir, "snapshot.json.gz")
+        timed("save", lambda: snapshot.save(snapshot_file))
+        print(f"{'size':<10} {os.path.getsize(snapshot_file) / 1024**2:8.2f}MB")
+        snapshot = timed("load", lambda: Snapshot.load(snapshot_file))
+
+    virtual_fs = VirtualFilesystem()
+    timed("mount", lambda: snapshot.mount(virtual_fs))
+
+    fm = FileManager(src_dir=SRC_DIR, dst_dir="/library/out", filesystem=virtual_fs)
+    timed(
+        "replay",
+        lambda: fm.process_directory(
+            dir_artifacts=fm.prep_artifacts(fm.get_artifacts()), prompt_behavior="none"
+        ),
+    )
+    print(
+        f"{len(virtual_fs.operations)} operation(s) simulated for {args.dirs} directories"
+    )
+
+
+if __name__ == "__main__":
+    main()
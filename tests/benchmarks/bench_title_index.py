@@ -0,0 +1,98 @@
+"""
+Plexer Benchmarks - Offline Title Index
+
+Builds a title index from a synthetic TSV dump, then measures how long it takes to open the index and to run
+exact and fuzzy lookups against it.
+
+Usage: python tests/benchmarks/bench_title_index.py [--titles N] [--lookups N]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+
+import logzero
+
+from plexer_cli.title_index import TitleIndex
+
+COMMON_WORDS = "the of a and in to love night man last day".split()
+SYLLABLES = "ka ri mo ta ne shi lo vu ar en el or is an qu ex zo pe li da ro mi".split()
+
+
+def generate_titles(num_titles: int, rng: random.Random) -> list:
+    # mix a handful of very common words into a large vocabulary of made-up ones,
+    # roughly like real title lists
+    vocabulary = [
+        "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(50_000)
+    ]
+
+    titles = []
+    for _ in range(num_titles):
+        words = rng.choices(vocabulary, k=rng.randint(1, 4))
+        if rng.random() < 0.5:
+            words.insert(rng.randint(0, len(words)), rng.choice(COMMON_WORDS))
+
+        titles.append((" ".join(words).title(), rng.randint(1920, 2025)))
+
+    return titles
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    args = parser.parse_args()
+
+    logzero.loglevel(logzero.WARNING)
+    rng = random.Random(42)
+    titles = generate_titles(args.titles, rng)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tsv_path = f"{tmp_dir}/titles.tsv"
+        with open(tsv_path, "w", encoding="utf-8") as tsv_file:
+            for title, release_year in titles:
+                tsv_file.write(f"{title}\t{release_year}\t\n")
+
+        start = time.perf_counter()
+        TitleIndex.open(tsv_path).close()
+        print(
+            f"initial build + open ({args.titles} titles): {time.perf_counter() - start:8.3f}s"
+        )
+
+        start = time.perf_counter()
+        title_index = TitleIndex.open(tsv_path)
+        print(
+            f"open existing index:                   {time.perf_counter() - start:8.3f}s"
+        )
+
+        samples = rng.sample(titles, min(args.lookups, len(titles)))
+
+        start = time.perf_counter()
+        for title, release_year in samples:
+            title_index.lookup(title, [release_year], fuzzy=False)
+        elapsed = time.perf_counter() - start
+        print(
+            f"exact lookup:                          {elapsed / len(samples) * 1e6:8.1f}us/lookup"
+        )
+
+        # drop a character to force fuzzy matching
+        fuzzy_samples = samples[: max(1, len(samples) // 10)]
+        num_correct = 0
+        start = time.perf_counter()
+        for title, release_year in fuzzy_samples:
+            num_correct += title_index.lookup(title[1:], [release_year]) == (
+                title,
+                release_year,
+            )
+        elapsed = time.perf_counter() - start
+        print(
+            f"fuzzy lookup:                          {elapsed / len(fuzzy_samples) * 1e6:8.1f}us/lookup "
+            f"({num_correct / len(fuzzy_samples):.1%} correct)"
+        )
+
+        title_index.close()
+
+
+if __name__ == "__main__":
+    main()
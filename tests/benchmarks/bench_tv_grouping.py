@@ -0,0 +1,90 @@
+"""
+Plexer Benchmarks - TV Episode Parsing and Grouping
+
+Generates a synthetic list of episode file names in a mix of naming formats, then measures how long it takes to
+parse them, group them by show/season and generate their target paths.
+
+Usage: python tests/benchmarks/bench_tv_grouping.py [--episodes N] [--shows N]
+"""
+
+import argparse
+import random
+import time
+
+import logzero
+
+from plexer_cli.tv import EpisodeParser, ShowGrouper
+
+SYLLABLES = "ka ri mo ta ne shi lo vu ar en el or is an qu ex zo pe li da ro mi".split()
+EPISODE_FORMATS = [
+    "{show}.S{season:02d}E{episode:02d}.720p.WEB.x264.mkv",
+    "{show} - {season}x{episode:02d} - Episode Title.mp4",
+    "{show}.S{season:02d}E{episode:02d}E{next_episode:02d}.1080p.mkv",
+    "{show} ({year}) S{season:02d}E{episode:02d}.avi",
+]
+
+
+def generate_file_names(num_episodes: int, num_shows: int, rng: random.Random) -> list:
+    shows = [
+        (
+            " ".join(
+                "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).title()
+                for _ in range(rng.randint(1, 3))
+            ),
+            rng.randint(1980, 2025),
+        )
+        for _ in range(num_shows)
+    ]
+
+    file_names = []
+    for i in range(num_episodes):
+        show, year = rng.choice(shows)
+        episode_format = rng.choice(EPISODE_FORMATS)
+        file_names.append(
+            "/src/"
+            + episode_format.format(
+                show=show.replace(" ", ".")
+                if episode_format.startswith("{show}.")
+                else show,
+                year=year,
+                season=i % 12 + 1,
+                episode=i // 12 % 99 + 1,
+                next_episode=i // 12 % 99 + 2,
+            )
+        )
+
+    return file_names
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--episodes", type=int, default=50_000)
+    parser.add_argument("--shows", type=int, default=500)
+    args = parser.parse_args()
+
+    logzero.loglevel(logzero.WARNING)
+    file_names = generate_file_names(args.episodes, args.shows, random.Random(42))
+
+    episode_parser = EpisodeParser()
+    start = time.perf_counter()
+    episodes = [episode_parser.parse(file_name) for file_name in file_names]
+    parse_time = time.perf_counter() - start
+
+    show_grouper = ShowGrouper()
+    start = time.perf_counter()
+    for episode in episodes:
+        show_grouper.add(episode)
+    group_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    targets = show_grouper.generate_targets(dst_dir="/dst")
+    target_time = time.perf_counter() - start
+
+    print(f"parse ({len(file_names)} file names):  {parse_time:8.3f}s")
+    print(f"group ({len(show_grouper.shows)} shows):         {group_time:8.3f}s")
+    print(f"generate targets ({len(targets)}):  {target_time:8.3f}s")
+    print(f"duplicates:                     {len(show_grouper.duplicates):8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Plexer Unit Tests - Answer_Cache.py
+"""
+
+import pytest
+
+import plexer_cli.answer_cache
+from plexer_cli.answer_cache import AnswerCache
+from plexer_cli.metadata import Metadata
+
+
+class FakePromptSession:
+    """Stand-in for prompt_toolkit's PromptSession that returns canned answers"""
+
+    answers = []
+    prompt_count = 0
+
+    def prompt(self, *args, **kwargs):
+        FakePromptSession.prompt_count += 1
+
+        return FakePromptSession.answers.pop(0)
+
+
+class TestAnswerCache:
+    """
+    Unit Tests - AnswerCache
+    """
+
+    @pytest.fixture
+    def answer_cache(self, tmp_path) -> AnswerCache:
+        """Generate an AnswerCache() obj for tests"""
+
+        return AnswerCache(file_path=f"{tmp_path}/cache/answers.json")
+
+    @pytest.fixture
+    def fake_prompt(self, monkeypatch):
+        """Replace interactive prompts with canned answers"""
+
+        FakePromptSession.answers = []
+        FakePromptSession.prompt_count = 0
+        monkeypatch.setattr(plexer_cli.answer_cache, "PromptSession", FakePromptSession)
+
+        return FakePromptSession
+
+    @staticmethod
+    def analyze(artifact_name: str) -> Metadata:
+        metadata = Metadata()
+        metadata.do_heuristic_analysis(file_name=artifact_name)
+
+        return metadata
+
+    def test_generate_key(self):
+        """Test cache key generation for various artifact names"""
+
+        test_cases = [
+            ("Some.Collection.Part.1.2001.1080p", "some collection"),
+            ("Some.Collection.Part.2.2002.720p", "some collection"),
+            ("The_Matrix_1999", "the matrix"),
+            ("The.Matrix.Reloaded.2003", "the matrix reloaded"),
+            ("2001.A.Space.Odyssey.1968", ""),
+        ]
+
+        for artifact_name, expected_key in test_cases:
+            assert AnswerCache.generate_key(artifact_name) == expected_key
+
+    def test_apply_no_answer(self, answer_cache):
+        """Test that artifacts without a cached answer are left alone"""
+
+        metadata = Metadata()
+
+        assert answer_cache.apply("Unknown.Thing", metadata, confirm=False) is False
+        assert metadata.metadata_found is False
+
+    def test_remember_and_apply_part_pattern(self, answer_cache):
+        """Test that part markers kept in an answer are swapped out for each sibling's own part marker"""
+
+        artifact_name = "Some.Collection.Part.1.2001.1080p"
+        user_metadata = Metadata(name="Some Great Collection Part 1", release_year=2001)
+        answer_cache.remember(artifact_name, self.analyze(artifact_name), user_metadata)
+
+        sibling_name = "Some.Collection.Part.3.2004.1080p"
+        sibling_metadata = self.analyze(sibling_name)
+
+        assert answer_cache.apply(sibling_name, sibling_metadata, confirm=False)
+        assert sibling_metadata.name == "Some Great Collection Part 3"
+        # year given by the user matched the heuristics, so the sibling's heuristic year
+        # should be used
+        assert sibling_metadata.release_year == 2004
+        assert sibling_metadata.metadata_found is True
+
+    def test_remember_and_apply_corrected_year(self, answer_cache):
+        """Test that a release year corrected by the user is applied to siblings"""
+
+        artifact_name = "Some.Movie.Directors.Cut.1080p.2020"
+        user_metadata = Metadata(name="Some Movie", release_year=1985)
+        answer_cache.remember(artifact_name, self.analyze(artifact_name), user_metadata)
+
+        sibling_name = "Some.Movie.Directors.Cut.720p.2020"
+        sibling_metadata = self.analyze(sibling_name)
+
+        assert answer_cache.apply(sibling_name, sibling_metadata, confirm=False)
+        assert sibling_metadata.name == "Some Movie"
+        assert sibling_metadata.release_year == 1985
+
+    def test_apply_confirmation_batching(self, answer_cache, fake_prompt):
+        """Test that the user is only asked once per key to confirm cached answers"""
+
+        answer_cache.remember(
+            "Some.Collection.Part.1.2001",
+            Metadata(),
+            Metadata(name="Some Collection", release_year=2001),
+        )
+        fake_prompt.answers = ["y"]
+
+        for part_num in range(2, 6):
+            assert answer_cache.apply(
+                f"Some.Collection.Part.{part_num}.2001", Metadata()
+            )
+
+        assert fake_prompt.prompt_count == 1
+
+    def test_apply_confirmation_declined(self, answer_cache, fake_prompt):
+        """Test that cached answers aren't applied if the user declines"""
+
+        answer_cache.remember(
+            "Some.Collection.Part.1.2001",
+            Metadata(),
+            Metadata(name="Some Collection", release_year=2001),
+        )
+        fake_prompt.answers = ["n"]
+        metadata = Metadata()
+
+        assert answer_cache.apply("Some.Collection.Part.2.2001", metadata) is False
+        assert metadata.metadata_found is False
+
+    def test_persistence(self, answer_cache):
+        """Test that cached answers survive across cache instances"""
+
+        answer_cache.remember(
+            "The_Matrix_1999",
+            Metadata(),
+            Metadata(name="The Matrix", release_year=1999),
+        )
+
+        new_answer_cache = AnswerCache(file_path=answer_cache.file_path)
+        new_answer_cache.load()
+
+        assert new_answer_cache.answers == answer_cache.answers
+
+    def test_persistence_read_only(self, answer_cache):
+        """Test that read-only caches are never written to disk"""
+
+        answer_cache.read_only = True
+        answer_cache.remember(
+            "The_Matrix_1999",
+            Metadata(),
+            Metadata(name="The Matrix", release_year=1999),
+        )
+
+        new_answer_cache = AnswerCache(file_path=answer_cache.file_path)
+        new_answer_cache.load()
+
+        assert new_answer_cache.answers == {}
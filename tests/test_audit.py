@@ -0,0 +1,103 @@
+"""
+Plexer Unit Tests - Audit.py
+"""
+
+import json
+import os
+
+import pytest
+
+from plexer_cli import metrics
+from plexer_cli.audit import FINDING_TYPES, LibraryAuditor
+from plexer_cli.const import METADATA_FILE_NAME
+
+
+class TestLibraryAuditor:
+    """
+    Unit Tests - LibraryAuditor
+    """
+
+    @pytest.fixture
+    def library_dir(self, tmp_path) -> str:
+        """Create a small library with one of each kind of finding"""
+
+        library_dir = f"{tmp_path}/library"
+        files = {
+            "The Matrix (1999)/The Matrix (1999).mkv": b"video",
+            "The Matrix (1999)/The Matrix (1999).en.srt": b"subs",
+            f"The Matrix (1999)/{METADATA_FILE_NAME}": b"{}",
+            "The.Matrix.1999.1080p/The.Matrix.1999.1080p.mkv": b"video",
+            "Heat (1995)/heat.mp4": b"video",
+            "Heat (1995)/Extras/download.url": b"clutter",
+            "Alien (1979) {edition-Director's Cut}/Alien (1979) {edition-Director's Cut}.mkv": b"",
+            "Alien (1979)/Alien (1979) - 1080p.mkv": b"video",
+        }
+        for file_path, data in files.items():
+            os.makedirs(os.path.dirname(f"{library_dir}/{file_path}"), exist_ok=True)
+            with open(f"{library_dir}/{file_path}", "wb") as f:
+                f.write(data)
+        os.makedirs(f"{library_dir}/Empty (2000)")
+        os.makedirs(f"{library_dir}/.plexer-leases")
+
+        return library_dir
+
+    @pytest.fixture
+    def report(self, library_dir) -> dict:
+        """Audit the library, returning the report"""
+
+        return LibraryAuditor(library_dir=library_dir).run()
+
+    def test_totals(self, report):
+        """Test that all directories and files are counted, skipping plexer's own"""
+
+        assert report["totals"] == {"directories": 7, "files": 8, "videos": 5}
+
+    def test_findings(self, report, library_dir):
+        """Test that each kind of problem is found, and nothing else"""
+
+        assert report["findings"] == {
+            "invalid_name": [f"{library_dir}/The.Matrix.1999.1080p"],
+            "name_mismatch": [f"{library_dir}/Heat (1995)/heat.mp4"],
+            "empty_dir": [f"{library_dir}/Empty (2000)"],
+            "duplicate_title": [
+                [
+                    f"{library_dir}/The Matrix (1999)",
+                    f"{library_dir}/The.Matrix.1999.1080p",
+                ]
+            ],
+            "clutter": [f"{library_dir}/Heat (1995)/Extras/download.url"],
+            "empty_file": [
+                f"{library_dir}/Alien (1979) {{edition-Director's Cut}}/Alien (1979) {{edition-Director's Cut}}.mkv"
+            ],
+        }
+
+    def test_read_only(self, library_dir):
+        """Test that auditing never changes the library or calls libmagic"""
+
+        before = sorted(os.walk(library_dir))
+        magic_calls = metrics.MAGIC_CALLS.get()
+
+        LibraryAuditor(library_dir=library_dir).run()
+
+        assert sorted(os.walk(library_dir)) == before
+        assert metrics.MAGIC_CALLS.get() == magic_calls
+
+    def test_summary_and_report_file(self, library_dir, tmp_path):
+        """Test the human-readable summary and the JSON report file"""
+
+        auditor = LibraryAuditor(library_dir=library_dir)
+        auditor.run()
+        auditor.save_report(f"{tmp_path}/report.json")
+
+        summary = auditor.generate_summary()
+        for finding_type in FINDING_TYPES:
+            assert f"{finding_type}: 1" in summary
+
+        with open(f"{tmp_path}/report.json", encoding="utf-8") as f:
+            assert json.load(f) == auditor.generate_report()
+
+    def test_missing_library(self, tmp_path):
+        """Test auditing a library directory that doesn't exist"""
+
+        with pytest.raises(FileNotFoundError):
+            LibraryAuditor(library_dir=f"{tmp_path}/nope").run()
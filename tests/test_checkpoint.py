@@ -0,0 +1,98 @@
+"""
+Plexer Unit Tests - Checkpoint.py
+"""
+
+import json
+import os
+
+import pytest
+
+from plexer_cli.checkpoint import Checkpoint
+
+
+class TestCheckpoint:
+    """
+    Unit Tests - Checkpoint
+    """
+
+    @pytest.fixture
+    def checkpoint(self, tmp_path) -> Checkpoint:
+        """Generate a Checkpoint() obj for tests"""
+
+        return Checkpoint(
+            file_path=f"{tmp_path}/checkpoint",
+            source_dir=str(tmp_path),
+            flush_interval=3,
+        )
+
+    def test_load_missing_file(self, checkpoint):
+        """Test loading a checkpoint file that doesn't exist yet"""
+
+        assert checkpoint.load() is False
+
+    def test_load_corrupt_file(self, checkpoint):
+        """Test loading a checkpoint file that contains invalid data"""
+
+        with open(checkpoint.file_path, "w", encoding="utf-8") as f:
+            f.write("{not json")
+
+        assert checkpoint.load() is False
+
+    def test_load_other_source_dir(self, checkpoint, tmp_path):
+        """Test that checkpoints recorded for another source directory are ignored"""
+
+        checkpoint.mark_complete("/src/a")
+        checkpoint.flush()
+
+        other_checkpoint = Checkpoint(
+            file_path=checkpoint.file_path, source_dir=f"{tmp_path}/other"
+        )
+
+        assert other_checkpoint.load() is False
+        assert other_checkpoint.completed == set()
+
+    def test_flush_and_load(self, checkpoint):
+        """Test that a flushed checkpoint can be loaded back in"""
+
+        checkpoint.add_pending(["/src/a", "/src/b", "/src/b/extras"])
+        checkpoint.mark_complete("/src/a", "/src/A (2020)")
+        checkpoint.flush()
+
+        loaded_checkpoint = Checkpoint(
+            file_path=checkpoint.file_path, source_dir=checkpoint.source_dir
+        )
+
+        assert loaded_checkpoint.load() is True
+        assert loaded_checkpoint.is_complete("/src/a")
+        assert loaded_checkpoint.is_complete("/src/A (2020)")
+        assert not loaded_checkpoint.is_complete("/src/b")
+        assert loaded_checkpoint.pending == {"/src/b", "/src/b/extras"}
+        assert loaded_checkpoint.get_pending("/src/") == ["/src/b"]
+
+    def test_batched_flush(self, checkpoint):
+        """Test that updates are only written to disk once a full batch is collected"""
+
+        checkpoint.mark_complete("/src/a")
+        checkpoint.mark_complete("/src/b")
+
+        assert not os.path.exists(checkpoint.file_path)
+
+        checkpoint.mark_complete("/src/c")
+
+        with open(checkpoint.file_path, encoding="utf-8") as f:
+            checkpoint_data = json.load(f)
+
+        assert checkpoint_data["completed"] == ["/src/a", "/src/b", "/src/c"]
+
+    def test_clear(self, checkpoint):
+        """Test that clearing the checkpoint removes all state and the file itself"""
+
+        checkpoint.mark_complete("/src/a")
+        checkpoint.flush()
+        checkpoint.clear()
+
+        assert not os.path.exists(checkpoint.file_path)
+        assert not checkpoint.is_complete("/src/a")
+
+        # clearing again should be a no-op
+        checkpoint.clear()
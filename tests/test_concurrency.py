@@ -0,0 +1,193 @@
+"""
+Plexer Unit Tests - Concurrency.py
+"""
+
+import threading
+import time
+
+import pytest
+
+from plexer_cli.concurrency import ConcurrencyController
+
+
+class TestConcurrencyController:
+    """
+    Unit Tests - ConcurrencyController
+    """
+
+    @pytest.fixture
+    def controller(self) -> ConcurrencyController:
+        """Generate a ConcurrencyController() obj for tests"""
+
+        return ConcurrencyController(min_workers=1, max_workers=8, sample_window=4)
+
+    def test_controller_initialization_bad_bounds(self):
+        """Test that invalid worker bounds are rejected"""
+
+        with pytest.raises(ValueError):
+            ConcurrencyController(min_workers=0)
+
+        with pytest.raises(ValueError):
+            ConcurrencyController(min_workers=4, max_workers=2)
+
+        with pytest.raises(ValueError):
+            ConcurrencyController(device_max_workers=0)
+
+    def test_record_additive_increase(self, controller):
+        """Test that steady latency grows the worker count by one per window"""
+
+        for _ in range(controller.sample_window * 3):
+            controller.record(latency=0.01)
+
+        assert controller.workers == 4
+
+    def test_record_respects_max_workers(self, controller):
+        """Test that the worker count never grows past the configured maximum"""
+
+        for _ in range(controller.sample_window * 20):
+            controller.record(latency=0.01)
+
+        assert controller.workers == controller.max_workers
+
+    def test_record_multiplicative_decrease(self, controller):
+        """Test that a latency spike cuts the worker count"""
+
+        for _ in range(controller.sample_window * 7):
+            controller.record(latency=0.01)
+        assert controller.workers == 8
+
+        for _ in range(controller.sample_window):
+            controller.record(latency=0.1)
+
+        assert controller.workers == 4
+        assert controller.avg_latency == pytest.approx(0.1)
+
+    def test_record_respects_min_workers(self, controller):
+        """Test that the worker count never drops below the configured minimum"""
+
+        for _ in range(controller.sample_window):
+            controller.record(latency=0.01)
+        for _ in range(controller.sample_window * 5):
+            controller.record(latency=1.0)
+
+        assert controller.workers == controller.min_workers
+
+    def test_record_baseline_decay(self, controller):
+        """Test that a single unusually fast window doesn't hold the worker count down for good"""
+
+        for _ in range(controller.sample_window):
+            controller.record(latency=0.001)
+        for _ in range(controller.sample_window * 30):
+            controller.record(latency=0.01)
+
+        assert controller.workers == controller.max_workers
+
+    def test_record_per_operation(self, controller):
+        """Test that every type of operation is measured against its own baseline"""
+
+        for _ in range(controller.sample_window):
+            controller.record(latency=0.001, operation="classify")
+        for _ in range(controller.sample_window):
+            controller.record(latency=0.01, operation="scan")
+
+        assert controller.workers == 3
+        assert controller.windows["classify"].avg_latency == pytest.approx(0.001)
+        assert controller.windows["scan"].avg_latency == pytest.approx(0.01)
+
+    def test_track_without_adjusting(self, controller):
+        """Test that tracked operations are only measured, unless they ran concurrently under the controller"""
+
+        for _ in range(controller.sample_window * 3):
+            with controller.track(num_bytes=1024, operation="transfer"):
+                pass
+
+        assert controller.workers == controller.min_workers
+        assert controller.windows["transfer"].throughput > controller.sample_window
+
+    def test_track(self, controller):
+        """Test that tracked operations are timed and recorded"""
+
+        for _ in range(controller.sample_window):
+            with controller.track(num_bytes=1024):
+                time.sleep(0.001)
+
+        assert controller.avg_latency >= 0.001
+        assert controller.throughput > 0
+
+    def test_map_preserves_order(self, controller):
+        """Test that mapped results are returned in the same order as the input"""
+
+        results = controller.map(lambda x: x * 2, range(50))
+
+        assert results == [x * 2 for x in range(50)]
+
+    def test_map_propagates_exceptions(self, controller):
+        """Test that exceptions raised by the mapped function are surfaced to the caller"""
+
+        def fail(_):
+            raise FileNotFoundError("missing")
+
+        with pytest.raises(FileNotFoundError):
+            controller.map(fail, range(5))
+
+    def test_map_empty(self, controller):
+        """Test mapping over an empty set of items"""
+
+        assert controller.map(str, []) == []
+
+    def test_map_device_limit(self):
+        """Test that no more than the per-device limit of calls hit a single device at once"""
+
+        controller = ConcurrencyController(
+            min_workers=8, max_workers=8, device_max_workers=2
+        )
+        lock = threading.Lock()
+        in_flight = {"a": 0, "b": 0}
+        peak = {"a": 0, "b": 0}
+
+        def hit_device(item):
+            device = item[0]
+            with lock:
+                in_flight[device] += 1
+                peak[device] = max(peak[device], in_flight[device])
+            time.sleep(0.005)
+            with lock:
+                in_flight[device] -= 1
+
+            return item
+
+        items = [f"a{idx}" for idx in range(20)] + [f"b{idx}" for idx in range(5)]
+        results = controller.map(hit_device, items, device_key=lambda item: item[0])
+
+        assert results == items
+        assert peak == {"a": 2, "b": 2}
+
+        controller.close()
+
+    def test_track_device_limit(self):
+        """Test that tracked operations wait for a slot on their device, without holding up other devices"""
+
+        controller = ConcurrencyController(device_max_workers=1)
+        entered = []
+
+        def track_device(device):
+            with controller.track(device=device):
+                entered.append(device)
+
+        with controller.track(device="a"):
+            waiting = threading.Thread(target=track_device, args=("a",))
+            waiting.start()
+            track_device("b")
+            waiting.join(timeout=0.05)
+
+            assert entered == ["b"]
+        waiting.join()
+
+        assert entered == ["b", "a"]
+
+    def test_close(self, controller):
+        """Test that the thread pool is restarted on demand after being shut down"""
+
+        assert controller.map(str, range(3)) == ["0", "1", "2"]
+        controller.close()
+        assert controller.map(str, range(3)) == ["0", "1", "2"]
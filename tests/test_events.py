@@ -0,0 +1,124 @@
+"""
+Plexer Unit Tests - Events.py
+"""
+
+import io
+import json
+import logging
+
+import pytest
+
+from plexer_cli import events
+from plexer_cli.events import EventStream
+
+
+class TestEvents:
+    """
+    Unit Tests - EventStream
+    """
+
+    @pytest.fixture
+    def output(self) -> io.StringIO:
+        """Generate an in-memory output stream for tests"""
+
+        return io.StringIO()
+
+    def test_invalid_output_format(self):
+        """Test that unknown output formats are rejected"""
+
+        with pytest.raises(ValueError):
+            EventStream(output_format="xml")
+
+    def test_unknown_event_type(self):
+        """Test that emitting an undefined event type fails loudly"""
+
+        with pytest.raises(KeyError):
+            EventStream().emit("not_an_event")
+
+    def test_level_filtering(self, output):
+        """Test that events below the stream's level are dropped without starting the writer"""
+
+        event_stream = EventStream(level=logging.INFO, stream=output)
+
+        assert event_stream.is_enabled(logging.WARNING)
+        assert not event_stream.is_enabled(logging.DEBUG)
+
+        event_stream.emit("artifact_valid", name="Movie (2001)")
+
+        assert event_stream._thread is None
+
+        event_stream.emit(
+            "artifact_skipped", path="/src/Movie (2001)", reason="testing"
+        )
+        event_stream.close()
+
+        assert output.getvalue().count("\n") == 1
+        assert (
+            "skipping directory artifact (testing): /src/Movie (2001)"
+            in output.getvalue()
+        )
+
+    def test_console_format(self, output):
+        """Test human-readable output"""
+
+        event_stream = EventStream(level=logging.DEBUG, stream=output)
+        event_stream.emit("artifact_renamed", src="/src/a", dst="/src/b", dry_run=False)
+        event_stream.close()
+
+        line = output.getvalue()
+
+        assert line.startswith("[D ")
+        assert line.endswith(
+            " artifact_renamed] renaming artifact: [ OLD PATH: /src/a ] to [ NEW PATH: /src/b ] (dry run: False)\n"
+        )
+
+    def test_jsonl_format(self, output):
+        """Test JSONL output, in order of emission"""
+
+        event_stream = EventStream(
+            level=logging.DEBUG, output_format="jsonl", stream=output
+        )
+        for idx in range(100):
+            event_stream.emit("file_found", path=f"/src/{idx}.mkv")
+        event_stream.emit("metadata_not_found", path="/src/Movie")
+        event_stream.close()
+
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+
+        assert len(lines) == 101
+        assert [line["path"] for line in lines[:100]] == [
+            f"/src/{idx}.mkv" for idx in range(100)
+        ]
+        assert lines[-1]["event"] == "metadata_not_found"
+        assert lines[-1]["level"] == "warning"
+        assert isinstance(lines[-1]["timestamp"], float)
+
+    def test_flush(self, output):
+        """Test that flushing waits for queued events and leaves the writer running"""
+
+        event_stream = EventStream(level=logging.DEBUG, stream=output)
+        event_stream.emit("file_found", path="/src/a.mkv")
+        event_stream.flush()
+
+        assert "/src/a.mkv" in output.getvalue()
+
+        event_stream.emit("file_found", path="/src/b.mkv")
+        event_stream.close()
+
+        assert "/src/b.mkv" in output.getvalue()
+
+    def test_configure(self, output):
+        """Test replacing the shared event stream"""
+
+        event_stream = events.configure(
+            level=logging.DEBUG, output_format="jsonl", stream=output
+        )
+        try:
+            assert events.get_event_stream() is event_stream
+
+            events.emit("file_found", path="/src/a.mkv")
+            events.flush()
+
+            assert json.loads(output.getvalue())["path"] == "/src/a.mkv"
+        finally:
+            events.configure()
@@ -8,8 +8,11 @@ import os
 import pytest
 from moviepy import ColorClip
 
-from plexer_cli.const import METADATA_FILE_NAME
+from plexer_cli.answer_cache import AnswerCache
+from plexer_cli.checkpoint import Checkpoint
+from plexer_cli.const import CHECKPOINT_FILE_NAME, LEASE_DIR_NAME, METADATA_FILE_NAME
 from plexer_cli.file_manager import FileManager
+from plexer_cli.manifest import MetadataManifest
 from plexer_cli.artifact import Artifact
 from plexer_cli.metadata import Metadata
 
@@ -83,6 +86,75 @@ class TestFileManager:
         with pytest.raises(FileNotFoundError):
             file_mgr.get_artifacts(tgt_dir=tgt_dir)
 
+    def test_get_root_artifacts(self, file_mgr, tmp_path):
+        """Test gathering the artifacts of multiple source directories in one go, keeping them grouped by root"""
+
+        other_src_dir = f"{tmp_path}/other_src"
+        mkdir(other_src_dir)
+        mkdir(f"{file_mgr.src_dir}/The.Matrix.1999.1080p")
+        mkdir(f"{other_src_dir}/Heat.1995.720p")
+        with open(f"{other_src_dir}/{METADATA_FILE_NAME}", "w", encoding="utf-8") as mf:
+            mf.write("{}")
+
+        artifacts = file_mgr.get_root_artifacts(
+            src_dirs=[file_mgr.src_dir, other_src_dir]
+        )
+
+        assert [artifact.absolute_path for artifact in artifacts] == [
+            f"{file_mgr.src_dir}/The.Matrix.1999.1080p",
+            f"{other_src_dir}/{METADATA_FILE_NAME}",
+            f"{other_src_dir}/Heat.1995.720p",
+        ]
+        assert artifacts[0].mime_type == "directory"
+        assert file_mgr.get_root_artifacts()[0].name == "The.Matrix.1999.1080p"
+
+    def test_get_root_artifacts_leftover_leases(self, file_mgr):
+        """Test that a lease dir left behind by a sharded run isn't picked up by later runs"""
+
+        mkdir(f"{file_mgr.src_dir}/{LEASE_DIR_NAME}")
+        mkdir(f"{file_mgr.src_dir}/The.Matrix.1999.1080p")
+
+        artifacts = file_mgr.get_root_artifacts()
+
+        assert [artifact.name for artifact in artifacts] == ["The.Matrix.1999.1080p"]
+        assert LEASE_DIR_NAME not in [
+            artifact.name for artifact in file_mgr.get_artifacts()
+        ]
+
+    def test_process_directory_root_device(self, file_mgr, monkeypatch):
+        """Test that the device of a source directory is used for everything done below it"""
+
+        mkdir(f"{file_mgr.src_dir}/Another.Thing")
+        with open(
+            f"{file_mgr.src_dir}/Another.Thing/notes.txt", "w", encoding="utf-8"
+        ) as f:
+            f.write("notes")
+        with open(
+            f"{file_mgr.src_dir}/Another.Thing/{METADATA_FILE_NAME}",
+            "w",
+            encoding="utf-8",
+        ) as mf:
+            mf.write('{"name": "Another Thing", "release_year": 2012}')
+
+        tracked_devices = []
+        real_track = file_mgr.io_controller.track
+
+        def spy_track(num_bytes=0, device=None, **kwargs):
+            tracked_devices.append(device)
+
+            return real_track(num_bytes=num_bytes, device=device, **kwargs)
+
+        monkeypatch.setattr(file_mgr.io_controller, "track", spy_track)
+
+        artifacts = file_mgr.get_root_artifacts()
+        file_mgr.process_directory(dir_artifacts=artifacts, prompt_behavior="none")
+
+        src_device = os.stat(file_mgr.src_dir).st_dev
+        assert artifacts[0].device == src_device
+        # classification of the root, the rename, then classification of its contents
+        assert len(tracked_devices) == 4
+        assert set(tracked_devices) == {src_device}
+
     def test_prep_artifacts(self, file_mgr, preloaded_media_dir):
         """Test the prepping of artifacts using default/expected values"""
 
@@ -201,6 +273,27 @@ class TestFileManager:
 
         # File should not be renamed since src/dst are same
         assert os.path.exists(test_file)
+        assert not file_mgr.rename_plan.entries
+
+    def test_rename_artifact_collision(self, file_mgr, tmp_path):
+        """Test that renaming onto an existing file is skipped and recorded rather than replacing it"""
+
+        test_file = f"{tmp_path}/oldname.txt"
+        with open(test_file, "w") as f:
+            f.write("old")
+        existing_file = f"{tmp_path}/New Title (2021).txt"
+        with open(existing_file, "w") as f:
+            f.write("existing")
+
+        artifact = Artifact(name="oldname.txt", path=test_file, mime_type="text/plain")
+
+        metadata = Metadata(name="New Title", release_year=2021)
+        renamed_artifact = file_mgr.rename_artifact(artifact, metadata)
+
+        assert renamed_artifact.name == "oldname.txt"
+        with open(existing_file) as f:
+            assert f.read() == "existing"
+        assert file_mgr.rename_plan.collisions == [(test_file, existing_file)]
 
     def test_process_directory(self, file_mgr, preloaded_media_dir):
         """Process the artifacts in preloaded media directory as is and confirm the results"""
@@ -270,3 +363,229 @@ class TestFileManager:
 
         # Should complete without raising an exception
         file_mgr.process_directory(dir_artifacts=[])
+
+    def test_process_directory_checkpoint(self, file_mgr, tmp_path):
+        """Process a directory with checkpointing enabled, then resume and confirm completed subtrees are skipped"""
+
+        src_dir = file_mgr.src_dir
+        mkdir(f"{src_dir}/The.Matrix.1999.1080p")
+
+        file_mgr.checkpoint = Checkpoint(
+            file_path=f"{tmp_path}/checkpoint", source_dir=src_dir
+        )
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.get_artifacts(), prompt_behavior="none"
+        )
+
+        assert os.path.isdir(f"{src_dir}/The Matrix (1999)")
+        assert file_mgr.checkpoint.is_complete(f"{src_dir}/The.Matrix.1999.1080p")
+        assert file_mgr.checkpoint.is_complete(f"{src_dir}/The Matrix (1999)")
+
+        # a completed subtree should be skipped entirely on resume, even if its name is
+        # no longer valid
+        os.rename(f"{src_dir}/The Matrix (1999)", f"{src_dir}/The.Matrix.1999.1080p")
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.get_artifacts(), prompt_behavior="none"
+        )
+
+        assert os.path.isdir(f"{src_dir}/The.Matrix.1999.1080p")
+
+    def test_process_directory_resume_pending(self, file_mgr, tmp_path):
+        """Resume from the pending items of a checkpoint, without picking up the checkpoint file itself"""
+
+        src_dir = file_mgr.src_dir
+        mkdir(f"{src_dir}/The.Matrix.1999.1080p")
+        mkdir(f"{src_dir}/Heat (1995)")
+        mkdir(f"{src_dir}/Heat (1995)/Heat.1995.Extras")
+        mkdir(f"{src_dir}/Alien.1979.720p")
+
+        checkpoint = Checkpoint(
+            file_path=f"{src_dir}/{CHECKPOINT_FILE_NAME}", source_dir=src_dir
+        )
+        # interrupted after renaming Heat, but before processing its contents
+        checkpoint.add_pending(
+            [
+                f"{src_dir}/Heat.1995.1080p",
+                f"{src_dir}/Heat (1995)",
+                f"{src_dir}/Alien.1979.720p",
+            ]
+        )
+        checkpoint.mark_complete(f"{src_dir}/Alien.1979.720p")
+        checkpoint.flush()
+        assert CHECKPOINT_FILE_NAME not in [
+            artifact.name for artifact in file_mgr.get_artifacts()
+        ]
+
+        checkpoint = Checkpoint(file_path=checkpoint.file_path, source_dir=src_dir)
+        checkpoint.load()
+        file_mgr = FileManager(
+            src_dir=src_dir, dst_dir=file_mgr.dst_dir, checkpoint=checkpoint
+        )
+        artifacts = file_mgr.get_pending_artifacts()
+
+        assert [artifact.name for artifact in artifacts] == ["Heat (1995)"]
+
+        file_mgr.process_directory(dir_artifacts=artifacts, prompt_behavior="none")
+
+        assert sorted(os.listdir(src_dir)) == [
+            CHECKPOINT_FILE_NAME,
+            "Alien.1979.720p",
+            "Heat (1995)",
+            "The.Matrix.1999.1080p",
+        ]
+        assert os.listdir(f"{src_dir}/Heat (1995)") == ["Heat (1995)"]
+
+    def test_process_directory_answer_cache(self, file_mgr):
+        """Process a directory the heuristics can't handle using a previously cached answer"""
+
+        src_dir = file_mgr.src_dir
+        mkdir(f"{src_dir}/Some Collection Part Three")
+
+        file_mgr.answer_cache = AnswerCache()
+        file_mgr.answer_cache.remember(
+            "Some Collection Part Two",
+            Metadata(),
+            Metadata(name="Some Collection Part Two", release_year=2005),
+        )
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.get_artifacts(), prompt_behavior="none"
+        )
+
+        assert os.listdir(src_dir) == ["Some Collection Part Three (2005)"]
+
+    def test_process_directory_metadata_manifest(self, file_mgr, tmp_path):
+        """Process directories using the metadata manifest, with metadata files within directories taking precedence"""
+
+        src_dir = file_mgr.src_dir
+        mkdir(f"{src_dir}/Some Collection Part Three")
+        mkdir(f"{src_dir}/Another.Thing")
+        with open(
+            f"{src_dir}/Another.Thing/{METADATA_FILE_NAME}", "w", encoding="utf-8"
+        ) as mf:
+            mf.write('{"name": "Another Thing", "release_year": 2012}')
+
+        file_mgr.metadata_manifest = MetadataManifest(
+            file_path=f"{src_dir}/.plexer-manifest"
+        )
+        file_mgr.metadata_manifest.add_pattern(
+            "Some Collection *",
+            Metadata(name="Some Collection Part Three", release_year=2005),
+        )
+        file_mgr.metadata_manifest.record(
+            f"{src_dir}/Another.Thing", Metadata(name="Wrong Thing", release_year=1999)
+        )
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.get_artifacts(), prompt_behavior="all"
+        )
+
+        assert sorted(os.listdir(src_dir)) == [
+            ".plexer-manifest",
+            "Another Thing (2012)",
+            "Some Collection Part Three (2005)",
+        ]
+
+    def test_find_override_metadata_listed_only(self, file_mgr, monkeypatch):
+        """Test that only directories listed as holding a metadata file have it read"""
+
+        mkdir(f"{file_mgr.src_dir}/Another.Thing")
+        read_paths = []
+        monkeypatch.setattr(
+            Metadata,
+            "import_metadata_from_file",
+            lambda _, file_path, **kwargs: read_paths.append(file_path),
+        )
+
+        dir_path = f"{file_mgr.src_dir}/Another.Thing"
+        assert file_mgr.find_override_metadata(dir_path, dir_entries=[]) is None
+        assert read_paths == []
+
+        dir_entries = [
+            Artifact(name=METADATA_FILE_NAME, path="", mime_type="text/plain")
+        ]
+        file_mgr.find_override_metadata(dir_path, dir_entries=dir_entries)
+        assert read_paths == [f"{dir_path}/{METADATA_FILE_NAME}"]
+
+    @pytest.mark.parametrize(
+        "metadata_file_data", ["{not json", '["Another Thing", 2012]', "2012", None]
+    )
+    def test_find_override_metadata_unusable_file(
+        self, file_mgr, caplog, metadata_file_data
+    ):
+        """Test that corrupt, non-object, and unreadable metadata files are ignored with a warning"""
+
+        dir_path = f"{file_mgr.src_dir}/Another.Thing"
+        mkdir(dir_path)
+        metadata_file_path = f"{dir_path}/{METADATA_FILE_NAME}"
+        if metadata_file_data is None:
+            # unreadable, even when running as root
+            mkdir(metadata_file_path)
+        else:
+            with open(metadata_file_path, "w", encoding="utf-8") as mf:
+                mf.write(metadata_file_data)
+
+        dir_entries = file_mgr.filesystem.scandir(dir_path)
+        assert (
+            file_mgr.find_override_metadata(dir_path, dir_entries=dir_entries) is None
+        )
+        assert f"metadata file @ {metadata_file_path}" in caplog.text
+
+    def test_process_directory_metadata_manifest_records_answers(
+        self, file_mgr, monkeypatch
+    ):
+        """Process a directory the heuristics can't handle and confirm the answer is added to the manifest under its
+        original name, and used when the same directory turns up again"""
+
+        src_dir = file_mgr.src_dir
+        mkdir(f"{src_dir}/Mystery Folder")
+
+        def answer_prompt(metadata):
+            metadata.name, metadata.release_year, metadata.metadata_found = (
+                "Mystery",
+                2001,
+                True,
+            )
+
+        monkeypatch.setattr(Metadata, "prompt_user_for_metadata", answer_prompt)
+        file_mgr.metadata_manifest = MetadataManifest(
+            file_path=f"{src_dir}/.plexer-manifest"
+        )
+        file_mgr.process_directory(dir_artifacts=file_mgr.get_artifacts())
+
+        reloaded_manifest = MetadataManifest(file_path=f"{src_dir}/.plexer-manifest")
+        reloaded_manifest.load()
+        assert reloaded_manifest.paths == {"Mystery Folder": ("Mystery", 2001)}
+        assert os.path.isdir(f"{src_dir}/Mystery (2001)")
+
+        os.rmdir(f"{src_dir}/Mystery (2001)")
+        mkdir(f"{src_dir}/Mystery Folder")
+        file_mgr.metadata_manifest = reloaded_manifest
+        monkeypatch.setattr(Metadata, "prompt_user_for_metadata", None)
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.get_artifacts(), prompt_behavior="all"
+        )
+
+        assert os.path.isdir(f"{src_dir}/Mystery (2001)")
+
+    def test_prefetch_provider_metadata_skips_overrides(self, file_mgr):
+        """Test that directories holding a metadata file aren't looked up via the metadata providers"""
+
+        src_dir = file_mgr.src_dir
+        mkdir(f"{src_dir}/Another.Thing")
+        mkdir(f"{src_dir}/Some.Movie.2005")
+        with open(
+            f"{src_dir}/Another.Thing/{METADATA_FILE_NAME}", "w", encoding="utf-8"
+        ) as mf:
+            mf.write('{"name": "Another Thing", "release_year": 2012}')
+
+        class RecordingResolver:
+            queries = []
+
+            def resolve_many(self, queries):
+                self.queries.extend(queries)
+
+                return {query: None for query in queries}
+
+        file_mgr.metadata_resolver = RecordingResolver()
+        file_mgr.prefetch_provider_metadata(dir_artifacts=file_mgr.get_artifacts())
+
+        assert file_mgr.metadata_resolver.queries == [("Some Movie", 2005)]
@@ -0,0 +1,133 @@
+"""
+Plexer Unit Tests - Filesystem.py
+"""
+
+import pytest
+
+from plexer_cli.filesystem import LocalFilesystem, VirtualFilesystem
+
+
+class TestFilesystem:
+    """
+    Unit Tests - LocalFilesystem and VirtualFilesystem
+    """
+
+    @pytest.fixture
+    def virtual_fs(self) -> VirtualFilesystem:
+        """Generate a VirtualFilesystem() obj holding a small movie library"""
+
+        virtual_fs = VirtualFilesystem()
+        virtual_fs.makedirs("/src/The.Matrix.1999.1080p")
+        virtual_fs.add_entry(
+            "/src/The.Matrix.1999.1080p/The.Matrix.1999.1080p.mkv",
+            is_dir=False,
+            size=1024,
+            mime_type="video/x-matroska",
+        )
+
+        return virtual_fs
+
+    def test_local_filesystem(self, tmp_path):
+        """Test that the local backend operates on the actual filesystem"""
+
+        local_fs = LocalFilesystem()
+        local_fs.makedirs(f"{tmp_path}/a/b")
+        local_fs.rename(f"{tmp_path}/a/b", f"{tmp_path}/a/c")
+
+        assert [entry.name for entry in local_fs.scandir(f"{tmp_path}/a")] == ["c"]
+        assert local_fs.exists(f"{tmp_path}/a/c")
+        assert not local_fs.exists(f"{tmp_path}/a/b")
+
+    def test_local_filesystem_move(self, tmp_path):
+        """Test that the transfer manager is only started by the first move, and closed with the backend"""
+
+        (tmp_path / "a.mkv").write_text("a")
+        local_fs = LocalFilesystem()
+        assert local_fs.transfer_manager is None
+
+        assert local_fs.move(f"{tmp_path}/a.mkv", f"{tmp_path}/b.mkv")
+        assert local_fs.transfer_manager is not None
+
+        local_fs.close()
+        assert local_fs.transfer_manager is None
+        assert (tmp_path / "b.mkv").read_text() == "a"
+
+    def test_scandir(self, virtual_fs):
+        """Test that virtual entries can be listed like os.DirEntry objects"""
+
+        entries = virtual_fs.scandir("/src")
+
+        assert len(entries) == 1
+        assert entries[0].name == "The.Matrix.1999.1080p"
+        assert entries[0].path == "/src/The.Matrix.1999.1080p"
+        assert entries[0].is_dir()
+
+        with pytest.raises(FileNotFoundError):
+            virtual_fs.scandir("/nope")
+        with pytest.raises(NotADirectoryError):
+            virtual_fs.scandir("/src/The.Matrix.1999.1080p/The.Matrix.1999.1080p.mkv")
+
+    def test_get_mime_type(self, virtual_fs):
+        """Test that MIME types come from the recorded entries"""
+
+        assert (
+            virtual_fs.get_mime_type(
+                "/src/The.Matrix.1999.1080p/The.Matrix.1999.1080p.mkv"
+            )
+            == "video/x-matroska"
+        )
+        assert virtual_fs.get_mime_type("/src/The.Matrix.1999.1080p") == "directory"
+
+    def test_read_text(self, virtual_fs):
+        """Test that only files with captured contents can be read"""
+
+        virtual_fs.add_entry(
+            "/src/The.Matrix.1999.1080p/.plexer",
+            is_dir=False,
+            contents='{"name": "The Matrix", "release_year": 1999}',
+        )
+
+        assert virtual_fs.read_text("/src/The.Matrix.1999.1080p/.plexer").startswith(
+            '{"name"'
+        )
+        with pytest.raises(OSError):
+            virtual_fs.read_text("/src/The.Matrix.1999.1080p/The.Matrix.1999.1080p.mkv")
+        with pytest.raises(IsADirectoryError):
+            virtual_fs.read_text("/src/The.Matrix.1999.1080p")
+
+    def test_rename_directory(self, virtual_fs):
+        """Test that renaming a directory carries its whole subtree along and is recorded"""
+
+        virtual_fs.rename("/src/The.Matrix.1999.1080p", "/src/The Matrix (1999)")
+
+        assert not virtual_fs.exists("/src/The.Matrix.1999.1080p")
+        assert virtual_fs.exists("/src/The Matrix (1999)/The.Matrix.1999.1080p.mkv")
+        assert virtual_fs.operations == [
+            ("rename", "/src/The.Matrix.1999.1080p", "/src/The Matrix (1999)")
+        ]
+
+    def test_rename_no_replace(self, virtual_fs):
+        """Test that renames never replace existing entries"""
+
+        virtual_fs.makedirs("/src/The Matrix (1999)")
+
+        with pytest.raises(FileExistsError):
+            virtual_fs.rename("/src/The.Matrix.1999.1080p", "/src/The Matrix (1999)")
+        with pytest.raises(FileNotFoundError):
+            virtual_fs.rename("/src/missing", "/src/other")
+
+        assert not virtual_fs.operations
+
+    def test_add_entry_missing_parent(self, virtual_fs):
+        """Test that entries can't be added to directories that don't exist"""
+
+        with pytest.raises(FileNotFoundError):
+            virtual_fs.add_entry("/dst/movie.mkv", is_dir=False)
+
+    def test_walk(self, virtual_fs):
+        """Test that walking lists every entry below the given directory"""
+
+        assert sorted(virtual_fs.walk("/src")) == [
+            "/src/The.Matrix.1999.1080p",
+            "/src/The.Matrix.1999.1080p/The.Matrix.1999.1080p.mkv",
+        ]
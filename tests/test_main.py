@@ -0,0 +1,62 @@
+"""
+Plexer Unit Tests - Main.py
+"""
+
+import sys
+
+import pytest
+
+from plexer_cli import main
+
+
+class TestMain:
+    """
+    Unit Tests - CLI argument parsing and subcommand dispatch
+    """
+
+    @pytest.mark.parametrize(
+        "args, verbose",
+        [
+            (["audit", "-s", "/library"], 0),
+            (["-v", "audit", "-s", "/library"], 1),
+            (["audit", "-vv", "-s", "/library"], 2),
+        ],
+    )
+    def test_fetch_cli_args_audit(self, args, verbose):
+        """Test that the audit subcommand is recognized wherever the verbosity flag is given"""
+
+        cli_args = main.fetch_cli_args(args)
+
+        assert cli_args.command == "audit"
+        assert cli_args.verbose == verbose
+        assert cli_args.source_dir == "/library"
+
+    def test_fetch_cli_args_process(self):
+        """Test that the source directory is required when no subcommand is given"""
+
+        cli_args = main.fetch_cli_args(["-s", "/src", "-s", "/src2", "-d", "/dst"])
+
+        assert cli_args.command is None
+        assert cli_args.source_dir == ["/src", "/src2"]
+        with pytest.raises(SystemExit):
+            main.fetch_cli_args(["-d", "/dst"])
+
+    def test_fetch_cli_args_resume_tv(self):
+        """Test that resuming is rejected for TV runs, which don't use checkpoints"""
+
+        with pytest.raises(SystemExit):
+            main.fetch_cli_args(
+                ["-s", "/src", "-d", "/dst", "--media-type", "tv", "--resume"]
+            )
+
+    def test_main_audit(self, tmp_path, monkeypatch, capsys):
+        """Test that the audit subcommand is dispatched to, even after global options"""
+
+        (tmp_path / "The Matrix (1999)").mkdir()
+        monkeypatch.setattr(sys, "argv", ["plexer", "-v", "audit", "-s", str(tmp_path)])
+
+        main.main()
+
+        assert capsys.readouterr().out.startswith(
+            f"audited {tmp_path}: 1 director(ies)"
+        )
@@ -0,0 +1,127 @@
+"""
+Plexer Unit Tests - Manifest.py
+"""
+
+import json
+
+import pytest
+
+from plexer_cli.manifest import MetadataManifest
+from plexer_cli.metadata import Metadata
+
+
+class TestMetadataManifest:
+    """
+    Unit Tests - MetadataManifest
+    """
+
+    @pytest.fixture
+    def manifest(self, tmp_path) -> MetadataManifest:
+        """Generate a MetadataManifest() obj for tests, at the root of a library"""
+
+        return MetadataManifest(file_path=f"{tmp_path}/library/.plexer-manifest")
+
+    def test_lookup_path(self, manifest, tmp_path):
+        """Test that recorded paths are looked up relative to the manifest"""
+
+        manifest.record(
+            f"{tmp_path}/library/The.Matrix.1999.1080p", Metadata("The Matrix", 1999)
+        )
+
+        metadata = manifest.lookup(f"{tmp_path}/library/The.Matrix.1999.1080p")
+        assert (metadata.name, metadata.release_year) == ("The Matrix", 1999)
+        assert metadata.metadata_found
+        assert manifest.lookup(f"{tmp_path}/library/Heat.1995.720p") is None
+        assert "The.Matrix.1999.1080p" in manifest.paths
+
+    def test_lookup_pattern(self, manifest, tmp_path):
+        """Test that patterns match directory names, or relative paths when they contain a separator"""
+
+        manifest.add_pattern("Some.Collection.*", Metadata("Some Collection", 2005))
+        manifest.add_pattern("extras/*", Metadata("Extras", 2010))
+        manifest.record(
+            f"{tmp_path}/library/Some.Collection.Special", Metadata("Special", 2006)
+        )
+
+        assert (
+            manifest.lookup(f"{tmp_path}/library/nested/Some.Collection.Part.1").name
+            == "Some Collection"
+        )
+        assert manifest.lookup(f"{tmp_path}/library/extras/Thing").name == "Extras"
+        assert manifest.lookup(f"{tmp_path}/library/nested/extras/Thing") is None
+        # exact paths win over patterns
+        assert (
+            manifest.lookup(f"{tmp_path}/library/Some.Collection.Special").name
+            == "Special"
+        )
+
+    def test_incremental_updates(self, manifest, tmp_path):
+        """Test that records are appended as they're made, with later records replacing earlier ones on load"""
+
+        manifest.record(f"{tmp_path}/library/Heat.1995.720p", Metadata("Heat", 1994))
+        manifest.record(f"{tmp_path}/library/Heat.1995.720p", Metadata("Heat", 1995))
+
+        with open(manifest.file_path, encoding="utf-8") as f:
+            assert len(f.read().splitlines()) == 3
+
+        loaded_manifest = MetadataManifest(file_path=manifest.file_path)
+        loaded_manifest.load()
+        assert (
+            loaded_manifest.lookup(f"{tmp_path}/library/Heat.1995.720p").release_year
+            == 1995
+        )
+
+    def test_compaction(self, manifest, tmp_path):
+        """Test that manifests mostly made up of replaced records are compacted on load"""
+
+        for release_year in range(1990, 2000):
+            manifest.record(
+                f"{tmp_path}/library/Heat.1995.720p", Metadata("Heat", release_year)
+            )
+
+        loaded_manifest = MetadataManifest(file_path=manifest.file_path)
+        loaded_manifest.load()
+
+        with open(manifest.file_path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        assert json.loads(lines[1]) == ["path", "Heat.1995.720p", "Heat", 1999]
+        assert len(lines) == 2
+
+    def test_corrupt_record(self, manifest, tmp_path):
+        """Test that a record cut off mid-append is skipped and dropped, without losing the ones after it"""
+
+        manifest.record(f"{tmp_path}/library/Heat.1995.720p", Metadata("Heat", 1995))
+        with open(manifest.file_path, "a", encoding="utf-8") as f:
+            f.write('["path", "The.Mat')
+
+        loaded_manifest = MetadataManifest(file_path=manifest.file_path)
+        loaded_manifest.load()
+        loaded_manifest.record(
+            f"{tmp_path}/library/The.Matrix.1999", Metadata("The Matrix", 1999)
+        )
+
+        reloaded_manifest = MetadataManifest(file_path=manifest.file_path)
+        reloaded_manifest.load()
+        assert sorted(reloaded_manifest.paths) == ["Heat.1995.720p", "The.Matrix.1999"]
+
+    def test_read_only(self, tmp_path):
+        """Test that read-only manifests are updated in memory only"""
+
+        manifest = MetadataManifest(
+            file_path=f"{tmp_path}/.plexer-manifest", read_only=True
+        )
+        manifest.record(f"{tmp_path}/Heat.1995.720p", Metadata("Heat", 1995))
+
+        assert manifest.lookup(f"{tmp_path}/Heat.1995.720p").name == "Heat"
+        assert not (tmp_path / ".plexer-manifest").exists()
+
+    def test_unsupported_version(self, manifest, tmp_path):
+        """Test that manifests in an unknown format are ignored"""
+
+        (tmp_path / "library").mkdir()
+        with open(manifest.file_path, "w", encoding="utf-8") as f:
+            f.write('{"version": 999}\n["path", "Heat.1995.720p", "Heat", 1995]\n')
+
+        manifest.load()
+
+        assert not manifest.paths
@@ -0,0 +1,130 @@
+"""
+Plexer Unit Tests - Metrics.py
+"""
+
+import threading
+import urllib.request
+
+import pytest
+
+from plexer_cli.metrics import MetricsRegistry, MetricsServer
+
+
+class TestMetrics:
+    """
+    Unit Tests - Metrics registry and exporters
+    """
+
+    @pytest.fixture
+    def registry(self) -> MetricsRegistry:
+        """Generate a MetricsRegistry() obj with a few metrics for tests"""
+
+        registry = MetricsRegistry()
+        registry.counter("test_artifacts_total", "Artifacts seen", labels=("type",))
+        registry.gauge("test_duration_seconds", "Run duration")
+        registry.histogram("test_latency_seconds", "Latency", buckets=(0.1, 1))
+
+        return registry
+
+    def test_counter(self, registry):
+        """Test counting from multiple threads"""
+
+        counter = registry.metrics["test_artifacts_total"]
+
+        def bump():
+            for _ in range(1000):
+                counter.inc(type="directory")
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc(2, type="video")
+
+        assert counter.get(type="directory") == 4000
+        assert counter.get(type="video") == 2
+        assert counter.get(type="text") == 0
+
+    def test_invalid_labels(self, registry):
+        """Test that samples must have exactly the metric's labels"""
+
+        with pytest.raises(ValueError):
+            registry.metrics["test_artifacts_total"].inc()
+        with pytest.raises(ValueError):
+            registry.metrics["test_artifacts_total"].inc(kind="directory")
+        with pytest.raises(ValueError):
+            registry.metrics["test_duration_seconds"].set(1, type="directory")
+
+    def test_duplicate_metric(self, registry):
+        """Test that metric names are unique"""
+
+        with pytest.raises(ValueError):
+            registry.gauge("test_duration_seconds", "Run duration, again")
+
+    def test_render(self, registry):
+        """Test rendering in the Prometheus text format"""
+
+        registry.metrics["test_artifacts_total"].inc(3, type="directory")
+        registry.metrics["test_artifacts_total"].inc(type='vid"eo')
+        registry.metrics["test_duration_seconds"].set(12.5)
+        for value in (0.05, 0.1, 0.5, 2):
+            registry.metrics["test_latency_seconds"].observe(value)
+
+        assert registry.render() == (
+            "# HELP test_artifacts_total Artifacts seen\n"
+            "# TYPE test_artifacts_total counter\n"
+            'test_artifacts_total{type="directory"} 3\n'
+            'test_artifacts_total{type="vid\\"eo"} 1\n'
+            "# HELP test_duration_seconds Run duration\n"
+            "# TYPE test_duration_seconds gauge\n"
+            "test_duration_seconds 12.5\n"
+            "# HELP test_latency_seconds Latency\n"
+            "# TYPE test_latency_seconds histogram\n"
+            'test_latency_seconds_bucket{le="0.1"} 2\n'
+            'test_latency_seconds_bucket{le="1.0"} 3\n'
+            'test_latency_seconds_bucket{le="+Inf"} 4\n'
+            "test_latency_seconds_sum 2.65\n"
+            "test_latency_seconds_count 4\n"
+        )
+
+    def test_histogram_time(self, registry):
+        """Test timing a block of code"""
+
+        histogram = registry.metrics["test_latency_seconds"]
+        with histogram.time():
+            pass
+
+        assert histogram.get_count() == 1
+
+    def test_write_textfile(self, registry, tmp_path):
+        """Test writing metrics for node_exporter's textfile collector"""
+
+        registry.metrics["test_duration_seconds"].set(3)
+        registry.write_textfile(f"{tmp_path}/plexer.prom")
+
+        with open(f"{tmp_path}/plexer.prom", encoding="utf-8") as f:
+            assert f.read() == registry.render()
+        assert [path.name for path in tmp_path.iterdir()] == ["plexer.prom"]
+
+    def test_metrics_server(self, registry):
+        """Test serving metrics over HTTP"""
+
+        registry.metrics["test_duration_seconds"].set(3)
+        metrics_server = MetricsServer(registry=registry)
+        metrics_server.start()
+        try:
+            with urllib.request.urlopen(
+                f"http://127.0.0.1:{metrics_server.port}/metrics", timeout=5
+            ) as response:
+                assert response.headers["Content-Type"].startswith(
+                    "text/plain; version=0.0.4"
+                )
+                assert response.read().decode("utf-8") == registry.render()
+
+            with pytest.raises(urllib.error.HTTPError):
+                urllib.request.urlopen(
+                    f"http://127.0.0.1:{metrics_server.port}/other", timeout=5
+                )
+        finally:
+            metrics_server.close()
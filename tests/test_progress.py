@@ -0,0 +1,128 @@
+"""
+Plexer Unit Tests - Progress.py
+"""
+
+import io
+import threading
+import time
+
+import pytest
+
+from plexer_cli import progress
+from plexer_cli.progress import ProgressReporter, format_duration
+
+
+class TestProgress:
+    """
+    Unit Tests - ProgressReporter
+    """
+
+    @pytest.fixture
+    def output(self) -> io.StringIO:
+        """Generate an in-memory output stream for tests"""
+
+        return io.StringIO()
+
+    def test_format_duration(self):
+        """Test formatting of ETAs and elapsed times"""
+
+        assert format_duration(0) == "0:00:00"
+        assert format_duration(83.7) == "0:01:23"
+        assert format_duration(3 * 3600 + 62) == "3:01:02"
+
+    def test_increment(self):
+        """Test that counters add up when bumped from multiple threads"""
+
+        reporter = ProgressReporter()
+
+        def bump():
+            for _ in range(1000):
+                reporter.increment("classified")
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert reporter.counters["classified"] == 4000
+
+    def test_disabled(self, output):
+        """Test that a disabled reporter neither counts nor draws"""
+
+        reporter = ProgressReporter(enabled=False, stream=output)
+        reporter.increment("scanned")
+        reporter.start()
+        reporter.stop()
+
+        assert reporter.counters["scanned"] == 0
+        assert output.getvalue() == ""
+
+    def test_status_line(self, output):
+        """Test the status line, including the processing rate and ETA"""
+
+        reporter = ProgressReporter(stream=output)
+        reporter.increment("scanned", 100)
+        reporter.increment("renamed", 3)
+        reporter.increment("prompted")
+
+        assert reporter.generate_status_line().endswith(
+            "0.0 artifacts/s | elapsed 0:00:00 | ETA --:--:--"
+        )
+
+        time.sleep(0.05)
+        reporter.increment("processed", 50)
+        status_line = reporter.generate_status_line()
+
+        assert status_line.startswith(
+            "scanned 100 | classified 0 | renamed 3 | skipped 0 | prompted 1 | "
+        )
+        assert "ETA --:--:--" not in status_line
+
+    def test_draw_paused(self, output):
+        """Test that pausing clears the status line and holds off redraws"""
+
+        reporter = ProgressReporter(stream=output)
+        reporter.draw()
+
+        assert output.getvalue().startswith("\rscanned 0")
+
+        with reporter.paused():
+            assert output.getvalue().endswith("\r\x1b[K")
+
+            drawn = output.getvalue()
+            reporter.draw()
+
+            assert output.getvalue() == drawn
+
+        reporter.draw()
+
+        assert output.getvalue() != drawn
+
+    def test_start_stop(self, output):
+        """Test background redraws and the final status line left behind on stop"""
+
+        reporter = ProgressReporter(stream=output, refresh_interval=0.01)
+        reporter.start()
+        reporter.increment("scanned", 5)
+        time.sleep(0.1)
+        reporter.stop()
+
+        assert output.getvalue().count("\rscanned") > 2
+        assert output.getvalue().endswith("\x1b[K\n")
+        assert "scanned 5" in output.getvalue().splitlines()[-1]
+
+    def test_configure(self, output):
+        """Test replacing the shared progress reporter"""
+
+        reporter = progress.configure(enabled=True, stream=output)
+        try:
+            assert progress.get_reporter() is reporter
+
+            progress.increment("renamed", 2)
+            with progress.paused():
+                pass
+
+            assert reporter.counters["renamed"] == 2
+        finally:
+            progress.configure(enabled=False)
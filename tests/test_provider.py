@@ -0,0 +1,313 @@
+"""
+Plexer Unit Tests - Provider.py
+"""
+
+import json
+import os
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import mkdir
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from plexer_cli.file_manager import FileManager
+from plexer_cli.provider import (
+    HTTPMetadataProvider,
+    MetadataProvider,
+    ProviderCache,
+    ProviderResolver,
+)
+
+KNOWN_TITLES = {
+    "the matrix": {"name": "The Matrix", "release_year": 1999},
+    "weird release name": {"name": "Actual Title", "release_year": 2012},
+}
+RESPONSE_DELAY = 0.05
+
+
+class StandInMetadataHandler(BaseHTTPRequestHandler):
+    """Stand-in for a metadata lookup service, serving KNOWN_TITLES over keep-alive HTTP/1.1"""
+
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, which stalls on delayed ACKs with Nagle's
+    # algorithm enabled
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.num_connections += 1
+
+    def do_GET(self):
+        self.server.num_requests += 1
+        time.sleep(RESPONSE_DELAY)
+
+        query = parse_qs(urlsplit(self.path).query)
+        self.server.last_query = query
+        title = KNOWN_TITLES.get(query.get("name", [""])[0].lower())
+
+        if self.server.raw_response:
+            self.wfile.write(self.server.raw_response)
+
+            return
+        if self.server.fail_requests:
+            status, body = 500, b"{}"
+        elif title:
+            status, body = 200, json.dumps(title).encode("utf-8")
+        else:
+            status, body = 404, b"{}"
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class UnavailableProvider(MetadataProvider):
+    """Provider whose lookups always fail"""
+
+    name = "unavailable"
+
+    async def lookup(self, name: str, release_year=None):
+        raise ConnectionError("provider unavailable")
+
+
+class TestProvider:
+    """
+    Unit Tests - Metadata Providers
+    """
+
+    @pytest.fixture
+    def metadata_server(self):
+        """Run the stand-in metadata service on a random local port"""
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInMetadataHandler)
+        server.daemon_threads = True
+        server.num_connections = 0
+        server.num_requests = 0
+        server.fail_requests = False
+        server.raw_response = None
+        server.last_query = {}
+
+        server_thread = threading.Thread(
+            target=server.serve_forever, args=(0.05,), daemon=True
+        )
+        server_thread.start()
+
+        yield server
+
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture
+    def provider_url(self, metadata_server) -> str:
+        """URL of the stand-in metadata service"""
+
+        return f"http://127.0.0.1:{metadata_server.server_address[1]}/lookup"
+
+    @pytest.fixture
+    def resolver(self, provider_url, tmp_path):
+        """Generate a ProviderResolver() obj for tests"""
+
+        resolver = ProviderResolver(
+            providers=[HTTPMetadataProvider(url=provider_url, max_connections=4)],
+            cache=ProviderCache(file_path=f"{tmp_path}/provider_cache.json"),
+        )
+
+        yield resolver
+
+        resolver.close()
+
+    def test_http_provider_bad_url(self):
+        """Test that invalid provider URLs are rejected"""
+
+        with pytest.raises(ValueError):
+            HTTPMetadataProvider(url="ftp://example.com/lookup")
+
+    def test_metadata_provider_abstract(self):
+        """Test that providers have to implement lookups"""
+
+        with pytest.raises(TypeError):
+            MetadataProvider()
+
+    def test_http_provider_url_query(self, provider_url, metadata_server):
+        """Test that query parameters of the provider URL are sent along with every lookup"""
+
+        provider = HTTPMetadataProvider(url=f"{provider_url}?api_key=secret")
+        resolver = ProviderResolver(providers=[provider])
+        results = resolver.resolve_many([("The Matrix", 1999)])
+        resolver.close()
+
+        assert results[("The Matrix", 1999)].name == "The Matrix"
+        assert metadata_server.last_query == {
+            "api_key": ["secret"],
+            "name": ["The Matrix"],
+            "year": ["1999"],
+        }
+        assert "secret" not in provider.name
+
+    def test_resolve_many(self, resolver):
+        """Test resolving known and unknown titles"""
+
+        results = resolver.resolve_many([("The Matrix", 1999), ("Unknown Title", None)])
+
+        assert results[("The Matrix", 1999)].name == "The Matrix"
+        assert results[("The Matrix", 1999)].release_year == 1999
+        assert results[("The Matrix", 1999)].metadata_found is True
+        assert results[("Unknown Title", None)] is None
+
+    def test_resolve_many_coalescing(self, resolver, metadata_server):
+        """Test that duplicate lookups only result in a single request"""
+
+        resolver.resolve_many([("The Matrix", 1999)] * 10 + [("the.matrix", 1999)] * 10)
+
+        assert metadata_server.num_requests == 1
+
+    def test_resolve_many_concurrency_and_pooling(self, resolver, metadata_server):
+        """Test that lookups run concurrently over a bounded set of reused connections"""
+
+        queries = [(f"Title {idx}", None) for idx in range(40)]
+
+        start = time.perf_counter()
+        resolver.resolve_many(queries[:20])
+        resolver.resolve_many(queries[20:])
+        elapsed = time.perf_counter() - start
+
+        assert metadata_server.num_requests == 40
+        # 4 connections at a time -> ~10 rounds of requests rather than 40
+        assert elapsed < len(queries) * RESPONSE_DELAY / 2
+        assert metadata_server.num_connections <= 4
+
+    def test_resolve_many_cache(self, resolver, metadata_server, provider_url):
+        """Test that responses (including misses) are cached on disk across resolvers"""
+
+        resolver.resolve_many([("The Matrix", 1999), ("Unknown Title", None)])
+        resolver.close()
+
+        assert metadata_server.num_requests == 2
+
+        provider_cache = ProviderCache(file_path=resolver.cache.file_path)
+        provider_cache.load()
+        new_resolver = ProviderResolver(
+            providers=[HTTPMetadataProvider(url=provider_url)], cache=provider_cache
+        )
+        results = new_resolver.resolve_many(
+            [("The Matrix", 1999), ("Unknown Title", None)]
+        )
+        new_resolver.close()
+
+        assert metadata_server.num_requests == 2
+        assert results[("The Matrix", 1999)].name == "The Matrix"
+        assert results[("Unknown Title", None)] is None
+
+    def test_resolve_many_cache_expiry(self, provider_url, metadata_server):
+        """Test that expired cache entries are looked up again"""
+
+        resolver = ProviderResolver(
+            providers=[HTTPMetadataProvider(url=provider_url)],
+            cache=ProviderCache(ttl=0),
+        )
+        resolver.resolve_many([("The Matrix", 1999)])
+        resolver.resolve_many([("The Matrix", 1999)])
+        resolver.close()
+
+        assert metadata_server.num_requests == 2
+
+    def test_resolve_many_server_error(self, resolver, metadata_server):
+        """Test that failed lookups resolve to nothing and aren't cached"""
+
+        metadata_server.fail_requests = True
+        results = resolver.resolve_many([("The Matrix", 1999)])
+
+        assert results[("The Matrix", 1999)] is None
+
+        metadata_server.fail_requests = False
+        results = resolver.resolve_many([("The Matrix", 1999)])
+
+        assert results[("The Matrix", 1999)].name == "The Matrix"
+
+    @pytest.mark.parametrize(
+        "raw_response",
+        [
+            b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n[]",
+            b"HTTP/1.1 200 OK\r\nContent-Length: 44\r\n\r\n"
+            b'{"name": "The Matrix", "release_year": null}',
+            b"garbage\r\n\r\n",
+        ],
+    )
+    def test_resolve_many_malformed_response(
+        self, resolver, metadata_server, raw_response
+    ):
+        """Test that malformed responses are handled like any other failed lookup, and aren't cached"""
+
+        metadata_server.raw_response = raw_response
+        results = resolver.resolve_many([("The Matrix", 1999)])
+
+        assert results[("The Matrix", 1999)] is None
+        assert not resolver.cache.entries
+
+    def test_provider_cache_read_only(self, tmp_path):
+        """Test that read-only caches are never written to disk"""
+
+        provider_cache = ProviderCache(
+            file_path=f"{tmp_path}/provider_cache.json", read_only=True
+        )
+        provider_cache.set("the matrix|1999", {"name": "The Matrix"})
+        provider_cache.save()
+
+        assert not os.path.exists(provider_cache.file_path)
+
+    def test_resolve_many_provider_fallback(self, provider_url, tmp_path):
+        """Test that later providers are tried when an earlier one fails, and the result is still cached"""
+
+        provider_cache = ProviderCache(file_path=f"{tmp_path}/provider_cache.json")
+        resolver = ProviderResolver(
+            providers=[UnavailableProvider(), HTTPMetadataProvider(url=provider_url)],
+            cache=provider_cache,
+        )
+        results = resolver.resolve_many([("The Matrix", 1999), ("Unknown Title", None)])
+        resolver.close()
+
+        assert results[("The Matrix", 1999)].name == "The Matrix"
+        assert results[("Unknown Title", None)] is None
+        # the miss may be down to the failed provider, so it isn't cached
+        assert len(provider_cache.entries) == 1
+
+    def test_rate_limiter(self, provider_url, metadata_server):
+        """Test that the request rate to a provider is limited"""
+
+        resolver = ProviderResolver(
+            providers=[
+                HTTPMetadataProvider(url=provider_url, max_connections=1, rate_limit=20)
+            ]
+        )
+
+        start = time.perf_counter()
+        resolver.resolve_many([(f"Title {idx}", None) for idx in range(6)])
+        elapsed = time.perf_counter() - start
+        resolver.close()
+
+        # the first request is immediate, the rest are spaced out by 1/20th of a second
+        assert elapsed >= 5 / 20
+
+    def test_process_directory_with_provider(self, resolver, tmp_path):
+        """Process a directory the heuristics can't handle using metadata from a provider"""
+
+        src_dir = f"{tmp_path}/src"
+        mkdir(src_dir)
+        mkdir(f"{src_dir}/Weird.Release.Name")
+
+        file_mgr = FileManager(
+            src_dir=src_dir, dst_dir=src_dir, metadata_resolver=resolver
+        )
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.get_artifacts(), prompt_behavior="none"
+        )
+
+        assert os.listdir(src_dir) == ["Actual Title (2012)"]
@@ -0,0 +1,119 @@
+"""
+Plexer Unit Tests - Rename.py
+"""
+
+import os
+
+import pytest
+
+from plexer_cli import rename
+from plexer_cli.rename import RenameExecutor, RenamePlan
+
+
+class TestRename:
+    """
+    Unit Tests - RenameExecutor and RenamePlan
+    """
+
+    @pytest.fixture
+    def executor(self):
+        """Generate a RenameExecutor() obj, closing it afterwards"""
+
+        executor = RenameExecutor(max_open_dirs=2)
+        yield executor
+        executor.close()
+
+    def test_rename(self, executor, tmp_path):
+        """Test renaming a file and a directory"""
+
+        (tmp_path / "a.txt").write_text("a")
+        (tmp_path / "dir_a").mkdir()
+
+        executor.rename(f"{tmp_path}/a.txt", f"{tmp_path}/b.txt")
+        executor.rename(f"{tmp_path}/dir_a", f"{tmp_path}/dir_b")
+
+        assert sorted(os.listdir(tmp_path)) == ["b.txt", "dir_b"]
+        assert (tmp_path / "b.txt").read_text() == "a"
+
+    @pytest.mark.parametrize("atomic", [True, False])
+    def test_rename_collision(self, executor, tmp_path, atomic):
+        """Test that an existing destination is never replaced, with or without renameat2()"""
+
+        executor.atomic = atomic and executor.atomic
+        (tmp_path / "a.txt").write_text("a")
+        (tmp_path / "b.txt").write_text("b")
+
+        with pytest.raises(FileExistsError):
+            executor.rename(f"{tmp_path}/a.txt", f"{tmp_path}/b.txt")
+
+        assert (tmp_path / "a.txt").read_text() == "a"
+        assert (tmp_path / "b.txt").read_text() == "b"
+
+    def test_rename_fallback(self, monkeypatch, tmp_path):
+        """Test that renames still work when renameat2() isn't available"""
+
+        monkeypatch.setattr(rename, "_renameat2", None)
+        executor = RenameExecutor()
+        (tmp_path / "a.txt").write_text("a")
+
+        executor.rename(f"{tmp_path}/a.txt", f"{tmp_path}/b.txt")
+        executor.close()
+
+        assert not executor.atomic
+        assert os.listdir(tmp_path) == ["b.txt"]
+
+    def test_rename_missing_src(self, executor, tmp_path):
+        """Test that renaming a missing file raises the underlying error"""
+
+        with pytest.raises(FileNotFoundError):
+            executor.rename(f"{tmp_path}/missing.txt", f"{tmp_path}/b.txt")
+
+    def test_dir_fds(self, executor, tmp_path):
+        """Test that parent directory descriptors are shared by siblings and evicted least recently used first"""
+
+        for dir_name in ("x", "y", "z"):
+            (tmp_path / dir_name).mkdir()
+            (tmp_path / dir_name / "1.txt").write_text("1")
+            (tmp_path / dir_name / "2.txt").write_text("2")
+
+        executor.rename(f"{tmp_path}/x/1.txt", f"{tmp_path}/x/3.txt")
+        x_fd = executor._dir_fds[f"{tmp_path}/x"]
+        executor.rename(f"{tmp_path}/x/2.txt", f"{tmp_path}/x/4.txt")
+        assert executor._dir_fds[f"{tmp_path}/x"] == x_fd
+
+        executor.rename(f"{tmp_path}/y/1.txt", f"{tmp_path}/y/3.txt")
+        executor.rename(f"{tmp_path}/z/1.txt", f"{tmp_path}/z/3.txt")
+        assert list(executor._dir_fds) == [f"{tmp_path}/y", f"{tmp_path}/z"]
+
+    def test_renamed_dir_forgotten(self, executor, tmp_path):
+        """Test that descriptors held for a renamed directory, or anything below it, are closed"""
+
+        (tmp_path / "a" / "sub").mkdir(parents=True)
+        (tmp_path / "a" / "sub" / "1.txt").write_text("1")
+
+        executor.rename(f"{tmp_path}/a/sub/1.txt", f"{tmp_path}/a/sub/2.txt")
+        executor.rename(f"{tmp_path}/a", f"{tmp_path}/b")
+
+        assert f"{tmp_path}/a/sub" not in executor._dir_fds
+        assert f"{tmp_path}/a" not in executor._dir_fds
+
+    def test_close(self, executor, tmp_path):
+        """Test that closing the executor releases all descriptors"""
+
+        (tmp_path / "a.txt").write_text("a")
+        executor.rename(f"{tmp_path}/a.txt", f"{tmp_path}/b.txt")
+
+        executor.close()
+
+        assert not executor._dir_fds
+
+    def test_rename_plan(self):
+        """Test recording rename outcomes and listing collisions"""
+
+        rename_plan = RenamePlan()
+        rename_plan.add("/a", "/b", "renamed")
+        rename_plan.add("/c", "/d", "collision")
+        rename_plan.add("/e", "/f", "dry_run")
+
+        assert len(rename_plan.entries) == 3
+        assert rename_plan.collisions == [("/c", "/d")]
@@ -0,0 +1,228 @@
+"""
+Plexer Unit Tests - Shard.py
+"""
+
+import multiprocessing
+import os
+import time
+
+from collections import Counter
+
+import pytest
+
+from plexer_cli.file_manager import FileManager
+from plexer_cli.shard import HashRing, LeaseManager, Shard
+
+TEST_TITLE_WORDS = (
+    "alpha bravo charlie delta echo foxtrot golf hotel india juliet".split()
+)
+
+
+def run_shard_worker(
+    src_dir: str, lease_dir: str, shard_index: int, shard_count: int
+) -> None:
+    """Process the given source directory as a single worker of a sharded run"""
+
+    lease_manager = LeaseManager(lease_dir=lease_dir)
+    lease_manager.start()
+    file_mgr = FileManager(
+        src_dir=src_dir,
+        dst_dir=src_dir,
+        shard=Shard(
+            root_dir=src_dir,
+            shard_index=shard_index,
+            shard_count=shard_count,
+            lease_manager=lease_manager,
+        ),
+    )
+
+    try:
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.get_artifacts(), prompt_behavior="none"
+        )
+    finally:
+        lease_manager.stop()
+
+
+class TestShard:
+    """
+    Unit Tests - Sharding and Leases
+    """
+
+    @pytest.fixture
+    def lease_dir(self, tmp_path) -> str:
+        """Generate the path of a lease directory for tests"""
+
+        return f"{tmp_path}/leases"
+
+    def test_hash_ring_distribution(self):
+        """Test that names are spread across all shards, roughly evenly"""
+
+        hash_ring = HashRing(num_shards=4)
+        shard_counts = Counter(
+            hash_ring.get_shard(f"Movie {idx}") for idx in range(4000)
+        )
+
+        assert sorted(shard_counts) == [0, 1, 2, 3]
+        assert min(shard_counts.values()) > 500
+
+    def test_hash_ring_stability(self):
+        """Test that adding a shard only moves names to the new shard"""
+
+        names = [f"Movie {idx}" for idx in range(2000)]
+        old_ring = HashRing(num_shards=4)
+        new_ring = HashRing(num_shards=5)
+
+        moved_names = [
+            name
+            for name in names
+            if old_ring.get_shard(name) != new_ring.get_shard(name)
+        ]
+
+        assert all(new_ring.get_shard(name) == 4 for name in moved_names)
+        assert len(moved_names) < len(names) / 3
+
+    def test_hash_ring_invalid(self):
+        """Test that a ring can't be created without any shards"""
+
+        with pytest.raises(ValueError):
+            HashRing(num_shards=0)
+
+    def test_lease_exclusive(self, lease_dir):
+        """Test that a lease can only be held by one worker at a time"""
+
+        lease_mgr_a = LeaseManager(lease_dir=lease_dir, owner="a")
+        lease_mgr_b = LeaseManager(lease_dir=lease_dir, owner="b")
+
+        assert lease_mgr_a.acquire("/src/movie")
+        assert lease_mgr_a.acquire("/src/movie")
+        assert not lease_mgr_b.acquire("/src/movie")
+        assert lease_mgr_b.acquire("/src/other")
+
+        lease_mgr_a.release("/src/movie")
+
+        assert lease_mgr_b.acquire("/src/movie")
+        assert lease_mgr_b.held_leases.keys() == {"/src/movie", "/src/other"}
+
+    def test_lease_expiry(self, lease_dir):
+        """Test that expired leases can be taken over, and that the previous holder notices on renewal"""
+
+        lease_mgr_a = LeaseManager(lease_dir=lease_dir, owner="a", ttl=0.05)
+        lease_mgr_b = LeaseManager(lease_dir=lease_dir, owner="b", ttl=60)
+
+        assert lease_mgr_a.acquire("/src/movie")
+        assert not lease_mgr_b.acquire("/src/movie")
+
+        time.sleep(0.1)
+
+        assert lease_mgr_b.acquire("/src/movie")
+
+        lease_mgr_a.renew()
+
+        assert lease_mgr_a.held_leases == {}
+        assert (
+            lease_mgr_b.read_lease(lease_mgr_b.generate_lease_path("/src/movie"))[
+                "owner"
+            ]
+            == "b"
+        )
+
+    def test_lease_renewal(self, lease_dir):
+        """Test that leases renewed in the background don't expire"""
+
+        lease_mgr_a = LeaseManager(lease_dir=lease_dir, owner="a", ttl=0.3)
+        lease_mgr_b = LeaseManager(lease_dir=lease_dir, owner="b")
+
+        lease_mgr_a.acquire("/src/movie")
+        lease_mgr_a.start()
+        time.sleep(0.5)
+
+        assert not lease_mgr_b.acquire("/src/movie")
+
+        lease_mgr_a.stop()
+
+        assert lease_mgr_a.held_leases == {}
+        assert lease_mgr_b.acquire("/src/movie")
+
+    def test_shard_claim(self, tmp_path, lease_dir):
+        """Test which subtrees a shard claims"""
+
+        src_dir = f"{tmp_path}/src"
+        os.makedirs(f"{src_dir}/nested")
+        os.makedirs(lease_dir)
+        shard = Shard(
+            root_dir=src_dir,
+            shard_index=0,
+            shard_count=2,
+            lease_manager=LeaseManager(lease_dir=lease_dir),
+        )
+
+        names = [f"Movie {idx}" for idx in range(20)]
+        for name in names:
+            os.makedirs(f"{src_dir}/{name}")
+        claimed_names = [name for name in names if shard.claim(f"{src_dir}/{name}")]
+
+        assert claimed_names == [name for name in names if shard.owns(name)]
+        assert 0 < len(claimed_names) < len(names)
+        # nested subtrees are covered by the lease on their top-level subtree
+        assert shard.claim(f"{src_dir}/nested/Movie 1")
+        assert not shard.claim(f"{src_dir}/{names[0]}.missing")
+
+    def test_shard_claim_lease_dir(self, tmp_path):
+        """Test that the lease directory is never claimed when it's inside the root directory"""
+
+        lease_dir = f"{tmp_path}/.plexer-leases"
+        os.makedirs(lease_dir)
+
+        for shard_index in range(2):
+            shard = Shard(
+                root_dir=str(tmp_path),
+                shard_index=shard_index,
+                shard_count=2,
+                lease_manager=LeaseManager(lease_dir=lease_dir),
+            )
+
+            assert not shard.claim(lease_dir)
+
+    def test_shard_invalid_index(self, lease_dir):
+        """Test that shard indexes outside of the shard count are rejected"""
+
+        with pytest.raises(ValueError):
+            Shard(
+                root_dir="/src",
+                shard_index=2,
+                shard_count=2,
+                lease_manager=LeaseManager(lease_dir=lease_dir),
+            )
+
+    def test_sharded_run(self, tmp_path, lease_dir):
+        """Process one source directory with multiple worker processes, including two workers for the same shard"""
+
+        src_dir = f"{tmp_path}/src"
+        titles = [
+            f"{first_word.title()} {second_word.title()}"
+            for first_word in TEST_TITLE_WORDS
+            for second_word in TEST_TITLE_WORDS[:4]
+        ]
+        for idx, title in enumerate(titles):
+            os.makedirs(
+                f"{src_dir}/{title.replace(' ', '.')}.{1990 + idx}.1080p.BluRay"
+            )
+
+        mp_context = multiprocessing.get_context("spawn")
+        workers = [
+            mp_context.Process(
+                target=run_shard_worker, args=(src_dir, lease_dir, shard_index, 3)
+            )
+            for shard_index in (0, 1, 2, 0)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+
+        assert [worker.exitcode for worker in workers] == [0, 0, 0, 0]
+        assert sorted(os.listdir(src_dir)) == sorted(
+            [f"{title} ({1990 + idx})" for idx, title in enumerate(titles)]
+        )
+        assert os.listdir(lease_dir) == []
@@ -0,0 +1,167 @@
+"""
+Plexer Unit Tests - Snapshot.py
+"""
+
+import gzip
+import json
+import os
+
+import pytest
+
+from plexer_cli import metrics
+from plexer_cli.const import METADATA_FILE_NAME
+from plexer_cli.file_manager import FileManager
+from plexer_cli.filesystem import VirtualFilesystem
+from plexer_cli.snapshot import Snapshot
+
+
+class TestSnapshot:
+    """
+    Unit Tests - Snapshot
+    """
+
+    @pytest.fixture
+    def src_dir(self, tmp_path) -> str:
+        """Create a small source tree with nested movie directories"""
+
+        src_dir = f"{tmp_path}/src"
+        for movie_dir in (
+            "The.Matrix.1999.1080p",
+            "Heat.1995.720p/Heat.1995.720p.Extras",
+        ):
+            os.makedirs(f"{src_dir}/{movie_dir}")
+        with open(
+            f"{src_dir}/The.Matrix.1999.1080p/notes.txt", "w", encoding="utf-8"
+        ) as f:
+            f.write("a" * 100)
+        with open(
+            f"{src_dir}/Heat.1995.720p/Heat.1995.720p.Extras/trailer.txt",
+            "w",
+            encoding="utf-8",
+        ) as f:
+            f.write("b" * 10)
+
+        return src_dir
+
+    @pytest.fixture
+    def snapshot(self, src_dir) -> Snapshot:
+        """Capture a snapshot of the source tree"""
+
+        return Snapshot.capture(root_dir=src_dir)
+
+    def test_capture(self, snapshot, src_dir):
+        """Test that every entry is captured, with parents ahead of their children"""
+
+        assert snapshot.root_dir == src_dir
+        assert len(snapshot.entries) == 5
+
+        for parent_idx, name, is_dir, size, mime_type in snapshot.entries:
+            if name == "notes.txt":
+                assert (is_dir, size, mime_type) == (False, 100, "text/plain")
+                assert snapshot.entries[parent_idx][1] == "The.Matrix.1999.1080p"
+            elif name == "Heat.1995.720p.Extras":
+                assert is_dir
+                assert snapshot.entries[parent_idx][1] == "Heat.1995.720p"
+
+    def test_capture_symlinked_dir(self, snapshot, src_dir):
+        """Test that symlinked directories are recorded, but not descended into"""
+
+        os.symlink(src_dir, f"{src_dir}/loop")
+        snapshot = Snapshot.capture(root_dir=src_dir)
+
+        assert len(snapshot.entries) == 6
+        assert (-1, "loop", True, 0, "directory") in snapshot.entries
+
+    def test_save_and_load(self, snapshot, tmp_path):
+        """Test that snapshots survive a round trip through a file, with MIME types stored once"""
+
+        snapshot_file = f"{tmp_path}/snapshot.json.gz"
+        snapshot.save(snapshot_file)
+
+        with gzip.open(snapshot_file, mode="rt", encoding="utf-8") as f:
+            assert sorted(json.load(f)["mime_types"]) == ["directory", "text/plain"]
+
+        loaded_snapshot = Snapshot.load(snapshot_file)
+        assert loaded_snapshot.root_dir == snapshot.root_dir
+        assert loaded_snapshot.entries == snapshot.entries
+
+    def test_load_unsupported_version(self, tmp_path):
+        """Test that snapshots in an unknown format are rejected"""
+
+        snapshot_file = f"{tmp_path}/snapshot.json.gz"
+        with gzip.open(snapshot_file, mode="wt", encoding="utf-8") as f:
+            json.dump({"version": 999}, f)
+
+        with pytest.raises(ValueError):
+            Snapshot.load(snapshot_file)
+
+    def test_mount(self, snapshot):
+        """Test that snapshots can be mounted anywhere in a virtual filesystem"""
+
+        virtual_fs = VirtualFilesystem()
+        snapshot.mount(virtual_fs, root_dir="/library")
+
+        assert sorted(virtual_fs.walk("/library")) == [
+            "/library/Heat.1995.720p",
+            "/library/Heat.1995.720p/Heat.1995.720p.Extras",
+            "/library/Heat.1995.720p/Heat.1995.720p.Extras/trailer.txt",
+            "/library/The.Matrix.1999.1080p",
+            "/library/The.Matrix.1999.1080p/notes.txt",
+        ]
+        assert (
+            virtual_fs.get_mime_type("/library/The.Matrix.1999.1080p/notes.txt")
+            == "text/plain"
+        )
+
+    def test_replay(self, snapshot, src_dir, tmp_path):
+        """Test that a run replayed against a snapshot renames the virtual tree only, without calling libmagic"""
+
+        virtual_fs = VirtualFilesystem()
+        snapshot.mount(virtual_fs)
+        file_mgr = FileManager(
+            src_dir=src_dir, dst_dir=f"{tmp_path}/dst", filesystem=virtual_fs
+        )
+
+        magic_calls = metrics.MAGIC_CALLS.get()
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.prep_artifacts(file_mgr.get_artifacts()),
+            prompt_behavior="none",
+        )
+
+        assert metrics.MAGIC_CALLS.get() == magic_calls
+        assert sorted(os.listdir(src_dir)) == [
+            "Heat.1995.720p",
+            "The.Matrix.1999.1080p",
+        ]
+        assert (
+            "rename",
+            f"{src_dir}/Heat.1995.720p",
+            f"{src_dir}/Heat (1995)",
+        ) in virtual_fs.operations
+        assert virtual_fs.exists(f"{src_dir}/Heat (1995)/Heat (1995)/trailer.txt")
+        assert virtual_fs.exists(f"{src_dir}/The Matrix (1999)/notes.txt")
+
+    def test_replay_metadata_file(self, src_dir, tmp_path):
+        """Test that metadata files are captured along with the tree, and used on replay rather than the live files"""
+
+        os.makedirs(f"{src_dir}/Another.Thing")
+        metadata_file_path = f"{src_dir}/Another.Thing/{METADATA_FILE_NAME}"
+        with open(metadata_file_path, "w", encoding="utf-8") as mf:
+            mf.write('{"name": "Another Thing", "release_year": 2012}')
+
+        snapshot_file = f"{tmp_path}/snapshot.json.gz"
+        Snapshot.capture(root_dir=src_dir).save(snapshot_file)
+        os.remove(metadata_file_path)
+
+        virtual_fs = VirtualFilesystem()
+        Snapshot.load(snapshot_file).mount(virtual_fs)
+        file_mgr = FileManager(
+            src_dir=src_dir, dst_dir=f"{tmp_path}/dst", filesystem=virtual_fs
+        )
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.prep_artifacts(file_mgr.get_artifacts()),
+            prompt_behavior="none",
+        )
+
+        assert virtual_fs.exists(f"{src_dir}/Another Thing (2012)")
+        assert os.path.isdir(f"{src_dir}/Another.Thing")
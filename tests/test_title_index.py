@@ -0,0 +1,242 @@
+"""
+Plexer Unit Tests - Title_Index.py
+"""
+
+import os
+
+import pytest
+
+from plexer_cli.metadata import Metadata
+from plexer_cli.title_index import TitleIndex, normalize_title
+
+TEST_TITLE_DB = """title\tyear\talt_titles
+The Matrix\t1999\t
+The Matrix Reloaded\t2003\t
+Movie 2: Electric Boogaloo\t1990\tMovie Two|Movie II
+Dune\t1984\t
+Alien\t1979\t
+Dune\t2021\tDune: Part One
+Amélie\t2001\tLe Fabuleux Destin d'Amélie Poulain
+No Year Here\tunknown\t
+"""
+
+
+class TestTitleIndex:
+    """
+    Unit Tests - TitleIndex
+    """
+
+    @pytest.fixture
+    def title_db(self, tmp_path) -> str:
+        """Generate a TSV title database for tests"""
+
+        title_db_path = f"{tmp_path}/titles.tsv"
+        with open(title_db_path, "w", encoding="utf-8") as f:
+            f.write(TEST_TITLE_DB)
+
+        return title_db_path
+
+    @pytest.fixture
+    def title_index(self, title_db):
+        """Generate a TitleIndex() obj for tests"""
+
+        title_index = TitleIndex.open(title_db)
+        yield title_index
+        title_index.close()
+
+    def test_normalize_title(self):
+        """Test title normalization"""
+
+        assert (
+            normalize_title("Movie 2: Electric_Boogaloo!")
+            == "movie 2 electric boogaloo"
+        )
+        assert normalize_title("  Amélie.") == "amélie"
+
+    def test_open_builds_index(self, title_db, title_index):
+        """Test that opening the title DB builds the index file next to it, skipping invalid rows"""
+
+        assert os.path.exists(f"{title_db}.idx")
+        assert title_index.num_records == 7
+
+    def test_open_reuses_index(self, title_db, title_index):
+        """Test that an up-to-date index is reused rather than rebuilt"""
+
+        index_mtime = os.path.getmtime(title_index.index_path)
+        reopened_title_index = TitleIndex.open(title_db)
+
+        assert os.path.getmtime(reopened_title_index.index_path) == index_mtime
+        assert reopened_title_index.num_records == title_index.num_records
+
+        reopened_title_index.close()
+
+    def test_open_bad_index(self, title_db):
+        """Test that a corrupt index file is rebuilt"""
+
+        with open(f"{title_db}.idx", "wb") as f:
+            f.write(b"\0" * 512)
+
+        title_index = TitleIndex.open(title_db)
+
+        assert title_index.num_records == 7
+
+        title_index.close()
+
+    def test_find_exact(self, title_index):
+        """Test exact lookups, including alternate titles"""
+
+        assert [
+            title_index.get_record(record_id)
+            for record_id in title_index.find_exact("the.matrix")
+        ] == [("The Matrix", 1999)]
+        assert title_index.get_record(title_index.find_exact("Movie II")[0]) == (
+            "Movie 2: Electric Boogaloo",
+            1990,
+        )
+        assert title_index.find_exact("The Matri") == []
+
+    def test_find_fuzzy(self, title_index):
+        """Test fuzzy lookups rank the closest titles first"""
+
+        matches = title_index.find_fuzzy("The Matrx Reloded")
+
+        assert title_index.get_record(matches[0][1]) == ("The Matrix Reloaded", 2003)
+        assert title_index.find_fuzzy("Something Else Entirely") == []
+
+    def test_lookup_release_years(self, title_index):
+        """Test that candidate release years are used to pick between titles with the same name"""
+
+        assert title_index.lookup("Dune", [2021]) == ("Dune", 2021)
+        assert title_index.lookup("Dune", [1984, 2020]) == ("Dune", 1984)
+        # closest year wins if none match
+        assert title_index.lookup("Dune", [1986]) == ("Dune", 1984)
+
+    def test_find_fuzzy_typos(self, title_index):
+        """Test fuzzy lookups of titles with a missing, extra, different or swapped character in a word"""
+
+        for title in (
+            "The Matrx Reloaded",
+            "The Matrix Relaoded",
+            "Teh Matrix Reloaded",
+            "The Matrix Reloadedd",
+        ):
+            matches = title_index.find_fuzzy(title)
+
+            assert title_index.get_record(matches[0][1]) == (
+                "The Matrix Reloaded",
+                2003,
+            )
+
+    def test_lookup_no_match(self, title_index):
+        """Test looking up an unknown title"""
+
+        assert title_index.lookup("Unknown Title") is None
+        assert title_index.lookup("The Matrx", fuzzy=False) is None
+
+    def test_metadata_verification_partial_name(self, title_index):
+        """Test that names from partial captures are corrected via the title index"""
+
+        metadata = Metadata()
+        file_name = "Movie.2.Electric.Boogaloo.1990.1080p"
+        metadata.do_heuristic_analysis(file_name=file_name)
+
+        assert metadata.name == "Movie"
+
+        assert metadata.do_title_index_verification(file_name, title_index) is True
+        assert metadata.name == "Movie 2: Electric Boogaloo"
+        assert metadata.release_year == 1990
+
+    def test_metadata_verification_wrong_year(self, title_index):
+        """Test that years picked up from unrelated numbers are corrected via the title index"""
+
+        metadata = Metadata()
+        file_name = "The.Matrix.1999.REMASTERED.2021"
+        metadata.do_heuristic_analysis(file_name=file_name)
+
+        assert metadata.release_year == 2021
+
+        assert metadata.do_title_index_verification(file_name, title_index) is True
+        assert metadata.name == "The Matrix"
+        assert metadata.release_year == 1999
+
+    def test_metadata_verification_unknown_title(self, title_index):
+        """Test that heuristic results are left alone for titles that aren't in the index"""
+
+        metadata = Metadata()
+        file_name = "Some.Unknown.Movie.2011.720p"
+        metadata.do_heuristic_analysis(file_name=file_name)
+
+        assert metadata.do_title_index_verification(file_name, title_index) is True
+        assert metadata.name == "Some Unknown Movie"
+        assert metadata.release_year == 2011
+
+    def test_metadata_verification_sequel(self, title_index):
+        """Test that a fuzzy match released in another year doesn't replace the heuristic results"""
+
+        metadata = Metadata()
+        file_name = "Aliens.1986.1080p.BluRay"
+        metadata.do_heuristic_analysis(file_name=file_name)
+
+        assert metadata.do_title_index_verification(file_name, title_index) is True
+        assert metadata.name == "Aliens"
+        assert metadata.release_year == 1986
+
+    @pytest.mark.parametrize(
+        "file_name", ["Her.Wedding.Photos", "Up.North.Trip", "Dune.Buggy.Races.720p"]
+    )
+    def test_metadata_verification_yearless_partial_title(self, tmp_path, file_name):
+        """Test that a short known title at the start of a name without a year isn't matched"""
+
+        with open(f"{tmp_path}/titles.tsv", "w", encoding="utf-8") as f:
+            f.write("Her\t2013\t\nUp\t2009\t\nDune\t2021\t\n")
+        title_index = TitleIndex.open(f"{tmp_path}/titles.tsv")
+
+        metadata = Metadata()
+        metadata.do_heuristic_analysis(file_name=file_name)
+
+        assert metadata.do_title_index_verification(file_name, title_index) is False
+        assert metadata.release_year == 1900
+
+        title_index.close()
+
+    @pytest.mark.parametrize(
+        "file_name, name, release_year",
+        [
+            ("The.Matrix.2160p", "The Matrix", 1999),
+            ("Alien.1920x1080", "Alien", 1979),
+            (
+                "Movie.2.Electric.Boogaloo.Extended.Cut",
+                "Movie 2: Electric Boogaloo",
+                1990,
+            ),
+        ],
+    )
+    def test_metadata_verification_yearless(
+        self, title_index, file_name, name, release_year
+    ):
+        """Test that names without a year are matched if the whole title, or enough of it, is known, and that
+        resolutions aren't taken for years"""
+
+        metadata = Metadata()
+        metadata.do_heuristic_analysis(file_name=file_name)
+
+        assert metadata.do_title_index_verification(file_name, title_index) is True
+        assert metadata.name == name
+        assert metadata.release_year == release_year
+
+    def test_metadata_verification_unknown_sequel(self, tmp_path):
+        """Test that a title missing from the index isn't corrected to a similar one from another year"""
+
+        with open(f"{tmp_path}/titles.tsv", "w", encoding="utf-8") as f:
+            f.write("The Matrix\t1999\t\n")
+        title_index = TitleIndex.open(f"{tmp_path}/titles.tsv")
+
+        metadata = Metadata()
+        file_name = "The.Matrix.Reloaded.2003.1080p"
+        metadata.do_heuristic_analysis(file_name=file_name)
+
+        assert metadata.do_title_index_verification(file_name, title_index) is True
+        assert metadata.name == "The Matrix Reloaded"
+        assert metadata.release_year == 2003
+
+        title_index.close()
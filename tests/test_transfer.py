@@ -0,0 +1,253 @@
+"""
+Plexer Unit Tests - Transfer.py
+"""
+
+import errno
+import hashlib
+import os
+
+import pytest
+
+from plexer_cli import transfer
+from plexer_cli.transfer import DigestManifest, TransferManager
+
+TEST_CHUNK_SIZE = 4096
+
+
+class TestTransfer:
+    """
+    Unit Tests - TransferManager and DigestManifest
+    """
+
+    @pytest.fixture
+    def cross_device(self, monkeypatch):
+        """Make all renames fail as if the destination was on a different filesystem"""
+
+        real_rename = transfer.RenameExecutor.rename
+
+        def fake_rename(self, src, dst):
+            if str(src).endswith(transfer.TRANSFER_PARTIAL_FILE_EXTENSION):
+                return real_rename(self, src, dst)
+
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+        monkeypatch.setattr(transfer.RenameExecutor, "rename", fake_rename)
+
+    @pytest.fixture
+    def src_file(self, tmp_path) -> tuple:
+        """Create a source file spanning multiple chunks, returning its path and data"""
+
+        data = os.urandom(TEST_CHUNK_SIZE * 5 + 123)
+        src_file_path = f"{tmp_path}/src.mkv"
+        with open(src_file_path, "wb") as f:
+            f.write(data)
+
+        return src_file_path, data
+
+    @pytest.fixture
+    def manifest(self, tmp_path) -> DigestManifest:
+        """Generate a DigestManifest() obj for tests"""
+
+        return DigestManifest(file_path=f"{tmp_path}/dst/.plexer-digests.json")
+
+    def test_invalid_verify_mode(self):
+        """Test that unknown verification modes are rejected"""
+
+        with pytest.raises(ValueError):
+            TransferManager(verify="maybe")
+
+    def test_move_same_filesystem(self, tmp_path, src_file, manifest):
+        """Test that files on the same filesystem are renamed without being hashed"""
+
+        src_file_path, data = src_file
+        os.makedirs(f"{tmp_path}/dst")
+        transfer_mgr = TransferManager(manifest=manifest, chunk_size=TEST_CHUNK_SIZE)
+
+        assert transfer_mgr.move(src_file_path, f"{tmp_path}/dst/movie.mkv")
+
+        with open(f"{tmp_path}/dst/movie.mkv", "rb") as f:
+            assert f.read() == data
+        assert manifest.entries == {}
+        assert transfer_mgr._hash_pool is None
+
+    def test_move_existing_dst(self, tmp_path, src_file):
+        """Test that an existing destination is never replaced by a rename"""
+
+        src_file_path, data = src_file
+        dst_file_path = f"{tmp_path}/movie.mkv"
+        with open(dst_file_path, "wb") as f:
+            f.write(b"existing")
+        transfer_mgr = TransferManager()
+
+        with pytest.raises(FileExistsError):
+            transfer_mgr.move(src_file_path, dst_file_path)
+        transfer_mgr.close()
+
+        with open(src_file_path, "rb") as f:
+            assert f.read() == data
+        with open(dst_file_path, "rb") as f:
+            assert f.read() == b"existing"
+
+    def test_move_dst_appeared_during_copy(
+        self, tmp_path, src_file, cross_device, monkeypatch
+    ):
+        """Test that a destination created while copying is kept, along with the source"""
+
+        src_file_path, data = src_file
+        dst_file_path = f"{tmp_path}/movie.mkv"
+        transfer_mgr = TransferManager(verify="full", chunk_size=TEST_CHUNK_SIZE)
+
+        real_copy_file = transfer_mgr.copy_file
+
+        def racing_copy_file(src, dst):
+            digest = real_copy_file(src, dst)
+            with open(dst_file_path, "wb") as f:
+                f.write(b"existing")
+
+            return digest
+
+        monkeypatch.setattr(transfer_mgr, "copy_file", racing_copy_file)
+
+        with pytest.raises(FileExistsError):
+            transfer_mgr.move(src_file_path, dst_file_path)
+        transfer_mgr.close()
+
+        assert sorted(os.listdir(tmp_path)) == ["movie.mkv", "src.mkv"]
+        with open(src_file_path, "rb") as f:
+            assert f.read() == data
+        with open(dst_file_path, "rb") as f:
+            assert f.read() == b"existing"
+
+    @pytest.mark.parametrize("verify", ["none", "sample", "full"])
+    def test_move_cross_filesystem(
+        self, tmp_path, src_file, manifest, cross_device, verify
+    ):
+        """Test that files on a different filesystem are copied, verified, and recorded in the manifest"""
+
+        src_file_path, data = src_file
+        dst_file_path = f"{tmp_path}/dst/Show/movie.mkv"
+        os.makedirs(f"{tmp_path}/dst/Show")
+        transfer_mgr = TransferManager(
+            verify=verify, manifest=manifest, chunk_size=TEST_CHUNK_SIZE
+        )
+
+        assert transfer_mgr.move(src_file_path, dst_file_path)
+        transfer_mgr.close()
+
+        assert not os.path.exists(src_file_path)
+        assert os.listdir(f"{tmp_path}/dst/Show") == ["movie.mkv"]
+        with open(dst_file_path, "rb") as f:
+            assert f.read() == data
+        assert manifest.get(dst_file_path) == {
+            "digest": hashlib.blake2b(data).hexdigest(),
+            "size": len(data),
+            "mtime_ns": os.stat(dst_file_path).st_mtime_ns,
+        }
+        assert list(manifest.entries) == ["Show/movie.mkv"]
+
+    @pytest.mark.parametrize("verify", ["sample", "full"])
+    def test_move_failed_verification(
+        self, tmp_path, src_file, cross_device, monkeypatch, verify
+    ):
+        """Test that a corrupted copy is discarded and the source is left in place"""
+
+        src_file_path, data = src_file
+        dst_file_path = f"{tmp_path}/movie.mkv"
+        transfer_mgr = TransferManager(verify=verify, chunk_size=TEST_CHUNK_SIZE)
+
+        real_copy_file = transfer_mgr.copy_file
+
+        def corrupt_copy_file(src, dst):
+            digest = real_copy_file(src, dst)
+            with open(dst, "r+b") as f:
+                f.seek(len(data) - 1)
+                f.write(bytes([data[-1] ^ 0xFF]))
+
+            return digest
+
+        monkeypatch.setattr(transfer_mgr, "copy_file", corrupt_copy_file)
+
+        assert not transfer_mgr.move(src_file_path, dst_file_path)
+        assert os.path.exists(src_file_path)
+        assert sorted(os.listdir(tmp_path)) == ["src.mkv"]
+
+    def test_verify_sample_size_mismatch(self, tmp_path, src_file):
+        """Test that sampled verification catches truncated copies"""
+
+        src_file_path, data = src_file
+        with open(f"{tmp_path}/copy.mkv", "wb") as f:
+            f.write(data[:-1])
+
+        assert not TransferManager(chunk_size=TEST_CHUNK_SIZE).verify_sample(
+            src_file_path, f"{tmp_path}/copy.mkv"
+        )
+
+    def test_copy_empty_file(self, tmp_path):
+        """Test copying and verifying an empty file"""
+
+        open(f"{tmp_path}/empty.mkv", "wb").close()
+        transfer_mgr = TransferManager(verify="sample")
+
+        digest = transfer_mgr.copy_file(f"{tmp_path}/empty.mkv", f"{tmp_path}/copy.mkv")
+
+        assert digest == hashlib.blake2b(b"").hexdigest()
+        assert transfer_mgr.verify_copy(
+            f"{tmp_path}/empty.mkv", f"{tmp_path}/copy.mkv", digest
+        )
+
+    def test_manifest_save_load(self, tmp_path, manifest):
+        """Test that manifests survive a save and load"""
+
+        os.makedirs(f"{tmp_path}/dst")
+        with open(f"{tmp_path}/dst/movie.mkv", "wb") as f:
+            f.write(b"data")
+
+        manifest.save()
+        assert not os.path.exists(manifest.file_path)
+
+        manifest.record(f"{tmp_path}/dst/movie.mkv", "abc123")
+        manifest.save()
+
+        loaded_manifest = DigestManifest(file_path=manifest.file_path)
+        loaded_manifest.load()
+
+        assert loaded_manifest.entries == manifest.entries
+        assert loaded_manifest.get(f"{tmp_path}/dst/movie.mkv")["digest"] == "abc123"
+
+    def test_manifest_root_dir(self, tmp_path):
+        """Test that manifests kept outside of the directory they describe key files relative to it"""
+
+        os.makedirs(f"{tmp_path}/dst/Show")
+        with open(f"{tmp_path}/dst/Show/episode.mkv", "wb") as f:
+            f.write(b"data")
+
+        manifest = DigestManifest(
+            file_path=f"{tmp_path}/cache/digests.json", root_dir=f"{tmp_path}/dst"
+        )
+        manifest.record(f"{tmp_path}/dst/Show/episode.mkv", "abc123")
+        manifest.save()
+
+        assert list(manifest.entries) == [os.path.join("Show", "episode.mkv")]
+        assert os.listdir(f"{tmp_path}/cache") == ["digests.json"]
+        assert os.path.dirname(
+            DigestManifest.generate_file_path(f"{tmp_path}/dst")
+        ) == os.path.dirname(DigestManifest.generate_file_path(f"{tmp_path}/dst2"))
+        assert DigestManifest.generate_file_path(
+            f"{tmp_path}/dst"
+        ) != DigestManifest.generate_file_path(f"{tmp_path}/dst2")
+
+    def test_manifest_other_algorithm(self, tmp_path, manifest):
+        """Test that manifests made with a different hash algorithm are ignored"""
+
+        os.makedirs(f"{tmp_path}/dst")
+        with open(f"{tmp_path}/dst/movie.mkv", "wb") as f:
+            f.write(b"data")
+        manifest.record(f"{tmp_path}/dst/movie.mkv", "abc123")
+        manifest.save()
+
+        loaded_manifest = DigestManifest(
+            file_path=manifest.file_path, algorithm="sha256"
+        )
+        loaded_manifest.load()
+
+        assert loaded_manifest.entries == {}
@@ -0,0 +1,263 @@
+"""
+Plexer Unit Tests - TV.py
+"""
+
+import os
+import shutil
+
+from os import makedirs
+
+import pytest
+
+from plexer_cli import file_manager
+from plexer_cli.file_manager import FileManager
+from plexer_cli.tv import Episode, EpisodeParser, ShowGrouper, is_season_dir
+
+BLANK_VIDEO_FILE = os.path.join(os.path.dirname(__file__), "bootstrap", "blank.mp4")
+
+
+class TestTV:
+    """
+    Unit Tests - TV Episode Parsing and Grouping
+    """
+
+    @pytest.fixture
+    def episode_parser(self) -> EpisodeParser:
+        """Generate an EpisodeParser() obj for tests"""
+
+        return EpisodeParser()
+
+    def test_parse(self, episode_parser):
+        """Test parsing of the supported episode naming formats"""
+
+        test_cases = [
+            ("Show.Name.S01E02.720p.mkv", ("Show Name", 0, 1, (2,), "s01e02")),
+            ("show_name_s1e2.mkv", ("show name", 0, 1, (2,), "s01e02")),
+            ("Show Name - 1x02 - Pilot.mp4", ("Show Name", 0, 1, (2,), "s01e02")),
+            ("Show.Name.2019.S03E10.mkv", ("Show Name", 2019, 3, (10,), "s03e10")),
+            ("Show Name (2019) S03E10.mkv", ("Show Name", 2019, 3, (10,), "s03e10")),
+            ("Show.Name.S01E01E02.mkv", ("Show Name", 0, 1, (1, 2), "s01e01-e02")),
+            ("Show.Name.S01E01-E03.mkv", ("Show Name", 0, 1, (1, 3), "s01e01-e03")),
+            ("Show.Name.S01E01-02.mkv", ("Show Name", 0, 1, (1, 2), "s01e01-e02")),
+            ("Show Name 1x01-1x02.mkv", ("Show Name", 0, 1, (1, 2), "s01e01-e02")),
+            (
+                "Daily.Show.2020.01.31.Guest.mkv",
+                ("Daily Show", 0, 0, (), "2020-01-31"),
+            ),
+            (
+                "Show.Name.720p.HDTV.x264.S01E02.mkv",
+                ("Show Name", 0, 1, (2,), "s01e02"),
+            ),
+            (
+                "Show.Name.2019.1080p.WEB.S03E10.mkv",
+                ("Show Name", 2019, 3, (10,), "s03e10"),
+            ),
+            ("HDTV.Show.S01E02.mkv", ("HDTV Show", 0, 1, (2,), "s01e02")),
+        ]
+
+        for file_name, expected in test_cases:
+            episode = episode_parser.parse(f"/src/{file_name}")
+
+            assert (
+                episode.show_name,
+                episode.show_year,
+                episode.season,
+                episode.episodes,
+                episode.episode_key,
+            ) == expected, file_name
+
+    def test_parse_show_name_fallback(self, episode_parser):
+        """Test that the given show name is used when the file name starts with the episode marker"""
+
+        episode = episode_parser.parse(
+            "/src/Show Name/S01E02.mkv", show_name="Show Name"
+        )
+
+        assert episode.show_name == "Show Name"
+        assert episode.file_ext == ".mkv"
+
+    def test_parse_not_an_episode(self, episode_parser):
+        """Test that non-episode file names are rejected"""
+
+        assert episode_parser.parse("/src/The.Matrix.1999.1080p.mkv") is None
+        assert episode_parser.parse("/src/S01E02.mkv") is None
+        assert episode_parser.parse("/src/Show.Seasons.E02.mkv") is None
+
+    def test_is_season_dir(self):
+        """Test season directory detection"""
+
+        assert is_season_dir("Season 1")
+        assert is_season_dir("season.02")
+        assert is_season_dir("S03")
+        assert is_season_dir("Specials")
+        assert not is_season_dir("Show Name")
+
+    def test_show_grouper(self):
+        """Test grouping episodes across formats, including duplicates and show years found later on"""
+
+        show_grouper = ShowGrouper()
+        episodes = [
+            Episode(show_name="Show Name", path="/src/a.mkv", season=1, episodes=[1]),
+            Episode(show_name="show name", path="/src/b.mkv", season=1, episodes=[2]),
+            Episode(
+                show_name="Show Name",
+                show_year=2019,
+                path="/src/c.mp4",
+                season=2,
+                episodes=[1],
+            ),
+            Episode(show_name="Show Name", path="/src/d.mkv", season=1, episodes=[1]),
+        ]
+
+        results = [show_grouper.add(episode) for episode in episodes]
+
+        assert results == [True, True, True, False]
+        assert show_grouper.num_episodes == 3
+        assert show_grouper.duplicates == [episodes[3]]
+        assert sorted(show_grouper.generate_targets(dst_dir="/dst")) == [
+            (
+                "/src/a.mkv",
+                "/dst/Show Name (2019)/Season 01/Show Name (2019) - s01e01.mkv",
+            ),
+            (
+                "/src/b.mkv",
+                "/dst/Show Name (2019)/Season 01/Show Name (2019) - s01e02.mkv",
+            ),
+            (
+                "/src/c.mp4",
+                "/dst/Show Name (2019)/Season 02/Show Name (2019) - s02e01.mp4",
+            ),
+        ]
+
+    def test_show_grouper_date_based(self):
+        """Test that date-based episodes are filed under the season counted from the show's year, or set aside for
+        review without one"""
+
+        show_grouper = ShowGrouper()
+        for episode in (
+            Episode(
+                show_name="Daily Show",
+                show_year=2019,
+                path="/src/a.mkv",
+                air_date="2020-01-31",
+            ),
+            Episode(show_name="Daily Show", path="/src/b.mkv", air_date="2019-05-01"),
+            Episode(show_name="Daily Show", path="/src/c.mkv", air_date="2019-05-01"),
+            Episode(show_name="Nightly Show", path="/src/d.mkv", air_date="2020-01-31"),
+        ):
+            show_grouper.add(episode)
+
+        assert [episode.absolute_path for episode in show_grouper.duplicates] == [
+            "/src/c.mkv"
+        ]
+        assert sorted(show_grouper.generate_targets(dst_dir="/dst")) == [
+            (
+                "/src/a.mkv",
+                "/dst/Daily Show (2019)/Season 02/Daily Show (2019) - 2020-01-31.mkv",
+            ),
+            (
+                "/src/b.mkv",
+                "/dst/Daily Show (2019)/Season 01/Daily Show (2019) - 2019-05-01.mkv",
+            ),
+        ]
+        assert [episode.absolute_path for episode in show_grouper.needs_review] == [
+            "/src/d.mkv"
+        ]
+
+    def test_process_tv_directory_late_show_year(self, tmp_path, monkeypatch):
+        """Test that a show's year found after other episodes were batched still applies to all of its episodes"""
+
+        monkeypatch.setattr(file_manager, "TV_BATCH_SIZE", 1)
+        src_dir = f"{tmp_path}/src"
+        dst_dir = f"{tmp_path}/dst"
+        makedirs(f"{src_dir}/Later")
+        makedirs(dst_dir)
+
+        shutil.copy(BLANK_VIDEO_FILE, f"{src_dir}/Show.Name.S01E01.mp4")
+        # subdirectories are processed after the files of their parent
+        shutil.copy(BLANK_VIDEO_FILE, f"{src_dir}/Later/Show.Name.2019.S01E02.mp4")
+
+        file_mgr = FileManager(src_dir=src_dir, dst_dir=dst_dir)
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.get_artifacts(), media_type="tv"
+        )
+
+        assert os.listdir(dst_dir) == ["Show Name (2019)"]
+        assert sorted(os.listdir(f"{dst_dir}/Show Name (2019)/Season 01")) == [
+            "Show Name (2019) - s01e01.mp4",
+            "Show Name (2019) - s01e02.mp4",
+        ]
+
+    def test_process_tv_directory(self, tmp_path):
+        """Process a source tree of episode files into the destination directory"""
+
+        src_dir = f"{tmp_path}/src"
+        dst_dir = f"{tmp_path}/dst"
+        makedirs(f"{src_dir}/Show Name/Season 1")
+        makedirs(dst_dir)
+
+        shutil.copy(BLANK_VIDEO_FILE, f"{src_dir}/Show Name/Season 1/S01E01.mp4")
+        shutil.copy(BLANK_VIDEO_FILE, f"{src_dir}/Show.Name.S01E02.1080p.mp4")
+        shutil.copy(BLANK_VIDEO_FILE, f"{src_dir}/Other.Show.2001.2x03.mp4")
+        with open(f"{src_dir}/Show.Name.S01E03.nfo", "w", encoding="utf-8") as f:
+            f.write("not a video")
+
+        file_mgr = FileManager(src_dir=src_dir, dst_dir=dst_dir)
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.get_artifacts(), media_type="tv"
+        )
+
+        assert sorted(
+            os.path.relpath(os.path.join(root, file_name), dst_dir)
+            for root, _, file_names in os.walk(dst_dir)
+            for file_name in file_names
+        ) == [
+            "Other Show (2001)/Season 02/Other Show (2001) - s02e03.mp4",
+            "Show Name/Season 01/Show Name - s01e01.mp4",
+            "Show Name/Season 01/Show Name - s01e02.mp4",
+        ]
+        assert os.path.exists(f"{src_dir}/Show.Name.S01E03.nfo")
+
+    def test_process_tv_directory_multiple_roots(self, tmp_path):
+        """Process episodes of the same show spread across source directories into one destination"""
+
+        src_dirs = [f"{tmp_path}/src1", f"{tmp_path}/src2"]
+        dst_dir = f"{tmp_path}/dst"
+        for src_dir in src_dirs:
+            makedirs(src_dir)
+        makedirs(dst_dir)
+
+        shutil.copy(BLANK_VIDEO_FILE, f"{src_dirs[0]}/Show.Name.S01E01.mp4")
+        shutil.copy(BLANK_VIDEO_FILE, f"{src_dirs[1]}/Show.Name.S01E02.mp4")
+        shutil.copy(BLANK_VIDEO_FILE, f"{src_dirs[1]}/Show Name - 1x01.mp4")
+
+        file_mgr = FileManager(src_dir=src_dirs[0], dst_dir=dst_dir)
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.get_root_artifacts(src_dirs=src_dirs),
+            media_type="tv",
+        )
+
+        assert sorted(os.listdir(f"{dst_dir}/Show Name/Season 01")) == [
+            "Show Name - s01e01.mp4",
+            "Show Name - s01e02.mp4",
+        ]
+        # the copy of the first episode on the second source directory is a duplicate,
+        # and is left alone
+        assert os.listdir(src_dirs[1]) == ["Show Name - 1x01.mp4"]
+
+    def test_process_tv_directory_dry_run(self, tmp_path):
+        """Process a source tree of episode files in dry run mode"""
+
+        src_dir = f"{tmp_path}/src"
+        dst_dir = f"{tmp_path}/dst"
+        makedirs(src_dir)
+        makedirs(dst_dir)
+        shutil.copy(BLANK_VIDEO_FILE, f"{src_dir}/Show.Name.S01E02.mp4")
+
+        file_mgr = FileManager(src_dir=src_dir, dst_dir=dst_dir)
+        file_mgr.process_directory(
+            dir_artifacts=file_mgr.get_artifacts(), media_type="tv", dry_run=True
+        )
+
+        assert os.listdir(src_dir) == ["Show.Name.S01E02.mp4"]
+        assert os.listdir(dst_dir) == []